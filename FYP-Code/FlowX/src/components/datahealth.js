@@ -1,6 +1,10 @@
 import { useState, useEffect } from "react";
 import axios from "axios";
 import { toast, Bounce } from 'react-toastify';
+import { useTrafficStream } from './trafficStream';
+
+// Number of entries the live logs panel keeps, matching /live-traffic-logs
+const LIVE_LOG_LIMIT = 50;
 
 const useDataHealthController = () => {
   // Toast configuration
@@ -219,11 +223,16 @@ const useDataHealthController = () => {
 
   useEffect(() => {
     fetchTrafficLogs();
-
-    const interval = setInterval(fetchTrafficLogs, 300000); 
-    return () => clearInterval(interval);
   }, []);
 
+  // New log entries are pushed as they are stored; newest first in the panel
+  useTrafficStream({
+    logs: (entries) => setTrafficLogs(previous =>
+      [...entries].reverse().concat(previous).slice(0, LIVE_LOG_LIMIT)
+    ),
+    reset: () => fetchTrafficLogs()
+  });
+
   return {
     file,
     uploadProgress, 
@@ -16,6 +16,10 @@ const toastConfig = {
     transition: Bounce,
 };
 
+// How often and for how long to poll a background report job
+const REPORT_POLL_INTERVAL_MS = 2000;
+const REPORT_POLL_TIMEOUT_MS = 10 * 60 * 1000;
+
 export const useReportsController = () => {
     const [selectedReport, setSelectedReport] = useState(null);
     const [isMenuExpanded, setIsMenuExpanded] = useState(false);
@@ -94,6 +98,7 @@ export const useStandardReportController = () => {
     const [timeRange, setTimeRange] = useState({ start: '', end: '' });
     const [selectedRoads, setSelectedRoads] = useState([]);
     const [dataType, setDataType] = useState('traffic');
+    const [granularity, setGranularity] = useState('raw');
     const [showRoadSelector, setShowRoadSelector] = useState(false);
     const [availableRoads, setAvailableRoads] = useState([]);
     const [searchTerm, setSearchTerm] = useState('');
@@ -224,6 +229,7 @@ export const useStandardReportController = () => {
         try {
             const reportData = {
                 dataType,
+                granularity,
                 dateRange: dateRange.start && dateRange.end ? dateRange : null,
                 timeRange: timeRange.start && timeRange.end ? timeRange : null,
                 selectedRoads: selectedRoads.length > 0 ? selectedRoads : null,
@@ -238,7 +244,6 @@ export const useStandardReportController = () => {
                 `${process.env.REACT_APP_API_URL}/reports`, 
                 reportData,
                 {
-                    responseType: 'blob',
                     headers: {
                         'Content-Type': 'application/json'
                     },
@@ -246,8 +251,37 @@ export const useStandardReportController = () => {
                 }
             );
 
-            if (response.status === 200) {
-                const blob = new Blob([response.data], { type: 'application/pdf' });
+            // Reports are built in the background; poll the job until the PDF is stored
+            let job = response.data;
+            const pollDeadline = Date.now() + REPORT_POLL_TIMEOUT_MS;
+            while (job.status !== 'done' && job.status !== 'failed') {
+                if (Date.now() >= pollDeadline) {
+                    toast.error('Report is taking too long to generate. Please try again later.', toastConfig);
+                    return false;
+                }
+                await new Promise(resolve => setTimeout(resolve, REPORT_POLL_INTERVAL_MS));
+                const jobResponse = await axios.get(
+                    `${process.env.REACT_APP_API_URL}/reports/jobs/${job.jobId}`,
+                    { withCredentials: true }
+                );
+                job = jobResponse.data;
+            }
+
+            if (job.status === 'failed') {
+                toast.error(job.error || 'Error generating report. Please try again.', toastConfig);
+                return false;
+            }
+
+            const pdfResponse = await axios.get(
+                `${process.env.REACT_APP_API_URL}/reports/${job.reportId}/download`,
+                {
+                    responseType: 'blob',
+                    withCredentials: true
+                }
+            );
+
+            if (pdfResponse.status === 200) {
+                const blob = new Blob([pdfResponse.data], { type: 'application/pdf' });
                 const url = window.URL.createObjectURL(blob);
                 const link = document.createElement('a');
                 link.href = url;
@@ -275,6 +309,7 @@ export const useStandardReportController = () => {
                 `${process.env.REACT_APP_API_URL}/reports/preview`, 
                 {
                     dataType,
+                    granularity,
                     dateRange: dateRange.start && dateRange.end ? dateRange : null,
                     timeRange: timeRange.start && timeRange.end ? timeRange : null,
                     selectedRoads: selectedRoads.length > 0 ? selectedRoads : null,
@@ -302,7 +337,7 @@ export const useStandardReportController = () => {
         }, 500);
 
         return () => clearTimeout(debounceTimer);
-    }, [dateRange, timeRange, selectedRoads, dataType]);
+    }, [dateRange, timeRange, selectedRoads, dataType, granularity]);
 
     const getFilteredRoads = () => {
         console.log('Available roads:', availableRoads);
@@ -328,6 +363,14 @@ export const useStandardReportController = () => {
                 return 'Congestion Events';
             case 'intensity':
                 return 'Traffic Condition';
+            case 'avgSpeed':
+                return 'Average Speed (km/h)';
+            case 'p50Speed':
+                return 'Median Speed (km/h)';
+            case 'p85Speed':
+                return '85th Percentile Speed (km/h)';
+            case 'congestionHours':
+                return 'Congested Hours';
             default:
                 return column.charAt(0).toUpperCase() + 
                        column.slice(1).replace(/([A-Z])/g, ' $1');
@@ -359,6 +402,8 @@ export const useStandardReportController = () => {
         setSelectedRoads,
         dataType,
         setDataType,
+        granularity,
+        setGranularity,
         showRoadSelector,
         setShowRoadSelector,
         availableRoads,
@@ -0,0 +1,55 @@
+import { useEffect, useRef } from 'react';
+
+const API_URL = process.env.REACT_APP_API_URL;
+
+// Subscribe to the server's live updates instead of polling.
+// handlers maps an event type ('traffic', 'logs', 'reset') to a callback that
+// receives the parsed event data. The browser reconnects on its own and resumes
+// from the last event id, and the server sends 'reset' when it cannot.
+export const useTrafficStream = (handlers) => {
+    const handlersRef = useRef(handlers);
+    handlersRef.current = handlers;
+
+    useEffect(() => {
+        if (typeof EventSource === 'undefined') {
+            return undefined;
+        }
+
+        const source = new EventSource(`${API_URL}/traffic/stream`);
+        const listeners = ['traffic', 'logs', 'reset'].map(type => {
+            const listener = (event) => {
+                const handler = handlersRef.current[type];
+                if (!handler) return;
+                try {
+                    handler(JSON.parse(event.data));
+                } catch (error) {
+                    console.error(`[STREAM] Bad ${type} event:`, error);
+                }
+            };
+            source.addEventListener(type, listener);
+            return [type, listener];
+        });
+
+        return () => {
+            listeners.forEach(([type, listener]) => source.removeEventListener(type, listener));
+            source.close();
+        };
+    }, []);
+};
+
+// Apply a 'traffic' event to a list of roads from /api/traffic/data: changed roads
+// replace theirs by road_id, roads not in the list yet are appended and removed
+// roads are dropped. Callers re-apply their own filters to the result.
+export const mergeTrafficRoads = (roads, event) => {
+    const removed = new Set(event.removed || []);
+    const changed = new Map((event.roads || []).map(road => [road.road_id, road]));
+    const known = new Set(roads.map(road => road.road_id));
+
+    const merged = roads
+        .filter(road => !removed.has(road.road_id))
+        .map(road => changed.get(road.road_id) || road);
+    changed.forEach((road, roadId) => {
+        if (!known.has(roadId)) merged.push(road);
+    });
+    return merged;
+};
@@ -1,17 +1,52 @@
-import { useState, useEffect, useCallback } from 'react';
+import { useState, useEffect, useCallback, useRef } from 'react';
 import axios from 'axios';
+import { useTrafficStream, mergeTrafficRoads } from './trafficStream';
 
 const API_URL = process.env.REACT_APP_API_URL;
 
+// Road dates are DD-MM-YYYY (or YYYY-MM-DD); filters use YYYY-MM-DD
+const toIsoDate = (value) => {
+    const match = /^(\d{2})-(\d{2})-(\d{4})$/.exec(value || '');
+    return match ? `${match[3]}-${match[2]}-${match[1]}` : value;
+};
+
+// The same checks /api/traffic/data applies, for roads pushed by the stream
+const matchesTrafficFilters = (road, searchTerm, filters) => {
+    const search = searchTerm.trim().toLowerCase();
+    if (search && !(road.streetName || '').toLowerCase().includes(search)) return false;
+    if (filters.startDate || filters.endDate) {
+        const date = toIsoDate(road.date);
+        if (!date) return false;
+        if ((filters.startDate && date < filters.startDate) || (filters.endDate && date > filters.endDate)) return false;
+    }
+    if (filters.startTime || filters.endTime) {
+        if (!road.time) return false;
+        if ((filters.startTime && road.time < filters.startTime) || (filters.endTime && road.time > filters.endTime)) return false;
+    }
+    if (filters.conditions && filters.conditions.length > 0 && !filters.conditions.includes(road.intensity)) return false;
+    return true;
+};
+
+// Sort alphabetically by street name and add incident warning flags
+const toTrafficRows = (roads) => [...roads].sort((a, b) =>
+    a.streetName.localeCompare(b.streetName)
+).map(item => ({
+    ...item,
+    hasAccidents: item.accidentCount > 0,
+    hasCongestion: item.congestionCount > 0
+}));
+
 const useTrafficData = () => {
     const [trafficData, setTrafficData] = useState([]);
     const [searchTerm, setSearchTerm] = useState('');
     const [loading, setLoading] = useState(true);
     const [error, setError] = useState(null);
+    const lastFiltersRef = useRef({});
 
-    const fetchTrafficData = useCallback(async (filters = {}) => {
+    const fetchTrafficData = useCallback(async (filters = {}, { quiet = false } = {}) => {
+        lastFiltersRef.current = filters;
         try {
-            setLoading(true);
+            if (!quiet) setLoading(true);
             const params = new URLSearchParams();
             if (searchTerm.trim()) {
                 params.append('search', searchTerm.trim());
@@ -36,16 +71,7 @@ const useTrafficData = () => {
             const response = await axios.get(url);
             console.log('[SEARCH] Received data:', response.data);
 
-            // Sort data alphabetically by street name and add incident warning flags
-            const sortedData = [...response.data].sort((a, b) => 
-                a.streetName.localeCompare(b.streetName)
-            ).map(item => ({
-                ...item,
-                hasAccidents: item.accidentCount > 0,
-                hasCongestion: item.congestionCount > 0
-            }));
-
-            setTrafficData(sortedData);
+            setTrafficData(toTrafficRows(response.data));
             setError(null);
         } catch (err) {
             console.error('[SEARCH] Error fetching traffic data:', err);
@@ -64,6 +90,15 @@ const useTrafficData = () => {
         return () => clearTimeout(delayDebounce);
     }, [searchTerm, fetchTrafficData]);
 
+    // Merge the roads each ingestion cycle changed; refetch only when the stream lost events
+    useTrafficStream({
+        traffic: (event) => setTrafficData(previous => toTrafficRows(
+            mergeTrafficRoads(previous, event)
+                .filter(road => matchesTrafficFilters(road, searchTerm, lastFiltersRef.current))
+        )),
+        reset: () => fetchTrafficData(lastFiltersRef.current, { quiet: true })
+    });
+
     const fetchHistoricalDataForRoad = useCallback(async (roadId, filters = {}) => {
         try {
             console.log(`Fetching historical data for road: ${roadId}`);
@@ -674,6 +674,8 @@ const StandardReport = () => {
         setSelectedRoads,
         dataType,
         setDataType,
+        granularity,
+        setGranularity,
         showRoadSelector,
         setShowRoadSelector,
         searchTerm,
@@ -828,6 +830,19 @@ const StandardReport = () => {
                         </select>
                     </div>
 
+                    <div className={styles.filterGroup}>
+                        <label>Granularity</label>
+                        <select 
+                            value={granularity}
+                            onChange={(e) => setGranularity(e.target.value)}
+                            className={styles.filterSelect}
+                        >
+                            <option value="raw">Hourly Records</option>
+                            <option value="daily">Daily Summary per Road</option>
+                            <option value="hourly">Hour-of-Day Summary per Road</option>
+                        </select>
+                    </div>
+
                     <div className={styles.filterGroup}>
                         <label>Selected Roads ({selectedRoads.length})</label>
                         <button 
@@ -1,11 +1,12 @@
-import React, { useState, useEffect, useCallback } from 'react';
+import React, { useState, useEffect, useCallback, useMemo } from 'react';
 import styles from '../css/livemap.module.css';
 import axios from 'axios';
+import { useTrafficStream, mergeTrafficRoads } from '../components/trafficStream';
 
 const API_URL = process.env.REACT_APP_API_URL;
 
 const SingaporeTrafficHotspots = ({ trafficService, mapInstance }) => {
-    const [hotspots, setHotspots] = useState([]);
+    const [roads, setRoads] = useState([]);
     const [loading, setLoading] = useState(true);
     const [displayCount, setDisplayCount] = useState(10);
     
@@ -22,26 +23,11 @@ const SingaporeTrafficHotspots = ({ trafficService, mapInstance }) => {
         }
     }, [mapInstance]);
 
-    const fetchTrafficHotspots = async () => {
-        setLoading(true);
+    const fetchTrafficHotspots = async ({ quiet = false } = {}) => {
+        if (!quiet) setLoading(true);
         try {
             const response = await axios.get(`${API_URL}/traffic/data`);
-            const allTrafficData = response.data;
-
-            // Sort roads by congestion level
-            const sortedHotspots = allTrafficData
-                .map(road => {
-                    const speedRatio = road.currentSpeed / road.freeFlowSpeed;
-                    const congestion = Math.round((1 - speedRatio) * 100);
-                    return {
-                        ...road,
-                        congestion
-                    };
-                })
-                .sort((a, b) => b.congestion - a.congestion) // Sort by congestion level descending
-                .slice(0, displayCount); // Take only the top N congested roads
-
-            setHotspots(sortedHotspots);
+            setRoads(response.data);
         } catch (error) {
             console.error('Error fetching traffic hotspots:', error);
         }
@@ -50,9 +36,27 @@ const SingaporeTrafficHotspots = ({ trafficService, mapInstance }) => {
 
     useEffect(() => {
         fetchTrafficHotspots();
-        const interval = setInterval(fetchTrafficHotspots, 300000); // Update every 5 minutes
-        return () => clearInterval(interval);
-    }, [displayCount]); // Re-fetch when displayCount changes
+    }, []);
+
+    // Merge the roads each ingestion cycle changed; refetch only when the stream lost events
+    useTrafficStream({
+        traffic: (event) => setRoads(previous => mergeTrafficRoads(previous, event)),
+        reset: () => fetchTrafficHotspots({ quiet: true })
+    });
+
+    // Sort roads by congestion level
+    const hotspots = useMemo(() => roads
+        .map(road => {
+            const speedRatio = road.currentSpeed / road.freeFlowSpeed;
+            const congestion = Math.round((1 - speedRatio) * 100);
+            return {
+                ...road,
+                congestion
+            };
+        })
+        .sort((a, b) => b.congestion - a.congestion) // Sort by congestion level descending
+        .slice(0, displayCount), // Take only the top N congested roads
+    [roads, displayCount]);
 
     const getStatusColor = (congestion) => {
         if (congestion < 30) return '#4CAF50';
@@ -1,5 +1,6 @@
-from flask import Flask, request, session, jsonify, make_response, send_file
-from pymongo import MongoClient, UpdateOne
+from flask import Flask, request, session, jsonify, make_response, send_file, Response
+from pymongo import MongoClient, UpdateOne, ReturnDocument
+from pymongo.errors import BulkWriteError, DuplicateKeyError
 import gridfs
 from flask_cors import CORS
 import bcrypt
@@ -11,8 +12,14 @@ from xml.etree import ElementTree as ET
 from datetime import datetime, timedelta
 import pytz
 import requests
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import multiprocessing
 from apscheduler.schedulers.background import BackgroundScheduler
 import pandas as pd
+import numpy as np
+from scipy.spatial import cKDTree
 from io import BytesIO
 from reportlab.lib import colors
 from reportlab.lib.pagesizes import letter, landscape
@@ -23,12 +30,25 @@ from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import inch
 from reportlab.lib.pagesizes import letter, landscape
 from reportlab.lib.enums import TA_CENTER, TA_RIGHT
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, Image
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, Image, Flowable
 from reportlab.graphics.shapes import Drawing, Line
 from datetime import datetime,timezone
 import zipfile
 import threading
 import time
+import queue
+import atexit
+import gzip
+import tempfile
+import hashlib
+import json
+import heapq
+from functools import wraps
+from collections import deque, OrderedDict
+try:
+    import brotli
+except ImportError:
+    brotli = None
 import tensorflow as tf
 import shutil
 from tensorflow.keras.models import load_model
@@ -42,9 +62,1984 @@ from math import sqrt
 import traceback
 import re 
 from bs4 import BeautifulSoup
+from routing_graph import (EARTH_RADIUS_M, haversine_m, CSRGraph, route_overlap, run_route_searches,
+                           init_route_worker, route_search_worker)
 
 load_dotenv()
 
+TOMTOM_FLOW_URL = "https://api.tomtom.com/traffic/services/4/flowSegmentData/absolute/10/json"
+
+def create_tomtom_session(pool_size):
+    """Create a keep-alive session whose connection pool fits the fetch workers"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+    session.mount('https://', adapter)
+    return session
+
+class TomTomQuotaExceeded(Exception):
+    """Raised instead of calling TomTom when the rate limiter refuses the call"""
+
+class TomTomRateLimiter:
+    """Token bucket and daily quota ledger shared by every TomTom call.
+
+    Calls are paced to max_per_second, counted against daily_quota and
+    held back with an exponential backoff after 429 responses. A 403 quota
+    error blocks calls until the next day; any other 403 (bad key) blocks
+    them for forbidden_cooldown seconds.
+    """
+
+    def __init__(self, max_per_second=5, daily_quota=2500, today=None,
+                 forbidden_cooldown=900, max_backoff=60, clock=time.monotonic):
+        self.max_per_second = max_per_second
+        self.daily_quota = daily_quota
+        self.forbidden_cooldown = forbidden_cooldown
+        self.max_backoff = max_backoff
+        self.clock = clock
+        self.today = today or (lambda: datetime.now(pytz.timezone('Asia/Singapore')).date())
+        self.lock = threading.Lock()
+
+        self.tokens = float(max_per_second)
+        self.last_refill = clock()
+        self.recent_calls = deque()
+        self.day = self.today()
+        self.calls_today = 0
+        self.backoff_seconds = 0
+        self.blocked_until = 0
+        self.quota_exceeded_day = None
+        self.last_error = None
+
+    def _roll_day(self):
+        today = self.today()
+        if today != self.day:
+            self.day = today
+            self.calls_today = 0
+            self.quota_exceeded_day = None
+
+    def _refill(self, now):
+        elapsed = now - self.last_refill
+        self.tokens = min(float(self.max_per_second), self.tokens + elapsed * self.max_per_second)
+        self.last_refill = now
+
+    def quota_exhausted(self):
+        """True when no more calls may be made today"""
+        with self.lock:
+            self._roll_day()
+            return self.quota_exceeded_day == self.day or self.calls_today >= self.daily_quota
+
+    def is_blocked(self):
+        """True when calls are refused because of the daily quota or a 403"""
+        with self.lock:
+            self._roll_day()
+            if self.quota_exceeded_day == self.day or self.calls_today >= self.daily_quota:
+                return True
+            return self.blocked_until > self.clock() and self.last_error == 'forbidden'
+
+    def acquire(self, timeout=None):
+        """Wait for a call slot; returns False if the call must not be made"""
+        deadline = None if timeout is None else self.clock() + timeout
+        while True:
+            with self.lock:
+                self._roll_day()
+                now = self.clock()
+                if self.quota_exceeded_day == self.day or self.calls_today >= self.daily_quota:
+                    return False
+                if self.last_error == 'forbidden' and self.blocked_until > now:
+                    return False
+
+                self._refill(now)
+                wait = self.blocked_until - now
+                if wait <= 0:
+                    if self.tokens >= 1:
+                        self.tokens -= 1
+                        self.calls_today += 1
+                        self.recent_calls.append(now)
+                        return True
+                    wait = (1 - self.tokens) / self.max_per_second
+
+            if deadline is not None and self.clock() + wait > deadline:
+                return False
+            time.sleep(wait)
+
+    def record_response(self, response):
+        """Adapt to a TomTom response: back off on 429, block on 403"""
+        with self.lock:
+            now = self.clock()
+            if response.status_code == 429:
+                self.backoff_seconds = min(max(self.backoff_seconds * 2, 1), self.max_backoff)
+                self.blocked_until = now + self.backoff_seconds
+                self.last_error = 'throttled'
+                print(f"[API RATE LIMIT] Throttled by TomTom, backing off {self.backoff_seconds}s")
+            elif response.status_code == 403:
+                try:
+                    error_msg = response.json().get('error', {}).get('description', '')
+                except Exception:
+                    error_msg = response.text or ''
+                if any(word in error_msg.lower() for word in ('quota', 'exceeded', 'limit')):
+                    self.quota_exceeded_day = self.today()
+                    self.last_error = 'quota'
+                    print(f"[API QUOTA ERROR] {error_msg}")
+                else:
+                    self.blocked_until = now + self.forbidden_cooldown
+                    self.last_error = 'forbidden'
+                    print(f"[API ERROR] Invalid or expired API key: {error_msg}")
+            elif response.status_code < 400:
+                self.backoff_seconds = 0
+                if self.last_error == 'throttled':
+                    self.last_error = None
+
+    def stats(self):
+        """Snapshot of call counts for the metrics endpoint"""
+        with self.lock:
+            self._roll_day()
+            now = self.clock()
+            while self.recent_calls and now - self.recent_calls[0] > 1:
+                self.recent_calls.popleft()
+            return {
+                'callsLastSecond': len(self.recent_calls),
+                'maxPerSecond': self.max_per_second,
+                'callsToday': self.calls_today,
+                'dailyQuota': self.daily_quota,
+                'remainingToday': max(self.daily_quota - self.calls_today, 0),
+                'quotaExceeded': self.quota_exceeded_day == self.day,
+                'backoffSeconds': max(self.blocked_until - now, 0),
+                'lastError': self.last_error
+            }
+
+def request_flow_segment(session, road, api_key, timeout=10, rate_limiter=None, max_attempts=2):
+    """Request flow segment data for one road, honouring the rate limiter.
+
+    A 429 response is retried once the limiter's backoff has passed.
+    """
+    for attempt in range(max_attempts):
+        if rate_limiter and not rate_limiter.acquire():
+            raise TomTomQuotaExceeded(f"TomTom call refused for {road['name']}")
+
+        response = session.get(
+            TOMTOM_FLOW_URL,
+            params={'point': f"{road['lat']},{road['lng']}", 'key': api_key},
+            timeout=timeout
+        )
+        if rate_limiter:
+            rate_limiter.record_response(response)
+        if response.status_code != 429:
+            break
+    return response
+
+def fetch_flow_segments(session, roads, api_key, max_workers=16, timeout=10, rate_limiter=None):
+    """Fetch TomTom flow segment data for many roads concurrently.
+
+    Returns a list of (road, response, error) tuples in the same order as roads,
+    where exactly one of response and error is set.
+    """
+    def fetch_one(road):
+        try:
+            return road, request_flow_segment(session, road, api_key, timeout, rate_limiter), None
+        except Exception as e:
+            return road, None, e
+
+    if not roads:
+        return []
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(roads))) as executor:
+        return list(executor.map(fetch_one, roads))
+
+def to_naive_utc(timestamp):
+    """Convert an aware timestamp to the naive UTC form pymongo returns"""
+    if timestamp.tzinfo is not None:
+        return timestamp.astimezone(pytz.utc).replace(tzinfo=None)
+    return timestamp
+
+def count_events_in_windows(event_times, window_starts, window_ends, include_end=True):
+    """Count sorted event_times falling inside each [start, end] window using binary search.
+
+    All arguments are numpy datetime64 arrays; with include_end=False the
+    windows are half-open [start, end).
+    """
+    lower = np.searchsorted(event_times, window_starts, side='left')
+    upper = np.searchsorted(event_times, window_ends, side='right' if include_end else 'left')
+    return np.maximum(upper - lower, 0)
+
+def floor_to_hour(timestamp):
+    return timestamp.replace(minute=0, second=0, microsecond=0)
+
+def backfill_key(road_id, timestamp):
+    """Comparable (road_id, hour) key for aware or Mongo-returned naive UTC timestamps"""
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.astimezone(pytz.utc).replace(tzinfo=None)
+    return road_id, floor_to_hour(timestamp)
+
+def plan_historical_backfill(roads, existing_keys, start_time, end_time, step=timedelta(hours=1)):
+    """Work out which hourly samples are missing from a backfill window.
+
+    The window is [start_time, end_time) aligned to whole hours, and
+    existing_keys is a set of backfill_key() tuples already stored. Returns
+    the missing work as a list of (road_id, road, timestamp) tuples.
+    """
+    road_ids = [(f"road_{index + 1}", road) for index, road in enumerate(roads)]
+    missing = []
+
+    timestamp = floor_to_hour(start_time)
+    if timestamp < start_time:
+        timestamp += step
+    while timestamp < end_time:
+        for road_id, road in road_ids:
+            if backfill_key(road_id, timestamp) not in existing_keys:
+                missing.append((road_id, road, timestamp))
+        timestamp += step
+
+    return missing
+
+def parse_query_date(value):
+    """Parse a YYYY-MM-DD (or legacy DD-MM-YYYY) date string, returning None if invalid"""
+    for date_format in ('%Y-%m-%d', '%d-%m-%Y'):
+        try:
+            return datetime.strptime(value, date_format)
+        except (ValueError, TypeError):
+            continue
+    return None
+
+def build_timestamp_range(start_date, end_date, tz):
+    """Timestamp range covering whole days from start_date to end_date inclusive, in tz"""
+    timestamp_range = {}
+    if start_date:
+        start = parse_query_date(start_date)
+        if start is None:
+            raise ValueError(f"Invalid start date format: {start_date}")
+        timestamp_range['$gte'] = tz.localize(start)
+    if end_date:
+        end = parse_query_date(end_date)
+        if end is None:
+            raise ValueError(f"Invalid end date format: {end_date}")
+        timestamp_range['$lt'] = tz.localize(end + timedelta(days=1))
+    return timestamp_range
+
+# Indexes each collection needs for its hot lookups, keyed by (database, collection).
+# Entries marked 'timeseries': False are skipped on time-series collections.
+REQUIRED_INDEXES = {
+    ('traffic-data', 'current_traffic_data'): [
+        {'name': 'road_id_unique', 'keys': [('road_id', 1)], 'unique': True},
+    ],
+    ('traffic-data', 'historical_traffic_data'): [
+        {'name': 'road_id_timestamp_unique', 'keys': [('road_id', 1), ('timestamp', 1)], 'unique': True, 'timeseries': False},
+        {'name': 'streetName_timestamp', 'keys': [('streetName', 1), ('timestamp', 1)]},
+    ],
+    ('traffic-data', 'traffic_incidents'): [
+        {'name': 'road_id_start_time_type', 'keys': [('road_id', 1), ('start_time', 1), ('type', 1)]},
+    ],
+    ('traffic-data', 'traffic_logs'): [
+        {'name': 'status_timestamp', 'keys': [('status', 1), ('timestamp', -1)]},
+        {'name': 'timestamp', 'keys': [('timestamp', -1)]},
+    ],
+    ('traffic-data', 'road_networks'): [
+        {'name': 'file_id', 'keys': [('file_id', 1)]},
+    ],
+    ('traffic-data', 'reports'): [
+        {'name': 'metadata_generatedAt', 'keys': [('metadata.generatedAt', -1)]},
+        {'name': 'cacheKey', 'keys': [('cacheKey', 1)]},
+    ],
+    ('traffic-users', 'users'): [
+        {'name': 'username_unique', 'keys': [('username', 1)], 'unique': True},
+        {'name': 'email', 'keys': [('email', 1)]},
+        {'name': 'id', 'keys': [('id', 1)]},
+    ],
+}
+
+def _index_keys(keys):
+    return tuple((field, direction) for field, direction in keys)
+
+def ensure_indexes(client, required_indexes, timeseries_collections=()):
+    """Create any declared index that does not exist yet.
+
+    An existing index with the same keys counts as present whatever its
+    name, so this is safe to run on every startup. Returns
+    {"db.collection": {"created": [...], "errors": {name: message}}}.
+    """
+    results = {}
+    for (db_name, collection_name), specs in required_indexes.items():
+        collection = client[db_name][collection_name]
+        result = {'created': [], 'errors': {}}
+        results[f"{db_name}.{collection_name}"] = result
+
+        try:
+            existing = {_index_keys(index['key'].items()) for index in collection.list_indexes()}
+        except Exception as e:
+            result['errors']['*'] = str(e)
+            continue
+
+        for spec in specs:
+            if spec.get('timeseries') is False and (db_name, collection_name) in timeseries_collections:
+                continue
+            if _index_keys(spec['keys']) in existing:
+                continue
+            try:
+                collection.create_index(spec['keys'], name=spec['name'], unique=spec.get('unique', False))
+                result['created'].append(spec['name'])
+            except Exception as e:
+                result['errors'][spec['name']] = str(e)
+                print(f"[INDEX ERROR] {db_name}.{collection_name}.{spec['name']}: {e}")
+
+    return results
+
+def index_report(client, required_indexes, timeseries_collections=()):
+    """Compare declared indexes with what exists and how often each is used.
+
+    Usage comes from $indexStats and is counted since the server last
+    restarted; it is reported as None when the server does not allow it.
+    """
+    report = {}
+    for (db_name, collection_name), specs in required_indexes.items():
+        collection = client[db_name][collection_name]
+        declared = {
+            _index_keys(spec['keys']): spec['name'] for spec in specs
+            if not (spec.get('timeseries') is False and (db_name, collection_name) in timeseries_collections)
+        }
+
+        existing = {index['name']: _index_keys(index['key'].items()) for index in collection.list_indexes()}
+
+        try:
+            usage = {
+                stats['name']: stats['accesses']['ops']
+                for stats in collection.aggregate([{'$indexStats': {}}])
+            }
+        except Exception:
+            usage = None
+
+        existing_keys = set(existing.values())
+        report[f"{db_name}.{collection_name}"] = {
+            'missing': [name for keys, name in declared.items() if keys not in existing_keys],
+            'undeclared': [name for name, keys in existing.items() if name != '_id_' and keys not in declared],
+            'unused': [] if usage is None else [
+                name for name in existing if name != '_id_' and usage.get(name, 0) == 0
+            ],
+            'usage': usage
+        }
+
+    return report
+
+class BufferedLogSink:
+    """Buffers log documents in memory and writes them with insert_many in the background.
+
+    A flush happens once batch_size entries are waiting or every
+    flush_interval seconds, and once more at interpreter shutdown. The
+    flush thread starts with the first write, so idle sinks cost nothing. When the
+    buffer is full because Mongo is slow, the 'drop' policy discards new
+    entries and the 'block' policy waits up to put_timeout for space first.
+    """
+
+    def __init__(self, collection, batch_size=200, flush_interval=2.0, max_buffer=10000,
+                 policy='drop', put_timeout=0.5, on_flush=None):
+        self.collection = collection
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.policy = policy
+        self.put_timeout = put_timeout
+        self.on_flush = on_flush
+        self.buffer = queue.Queue(maxsize=max_buffer)
+        self.flush_lock = threading.Lock()
+        self.start_lock = threading.Lock()
+        self.wake = threading.Event()
+        self.stopped = threading.Event()
+        self.thread = None
+        self.written_count = 0
+        self.dropped_count = 0
+        self.failed_count = 0
+
+    def _start(self):
+        """Start the flush thread and shutdown hook on first use"""
+        if self.thread is not None or self.stopped.is_set():
+            return
+        with self.start_lock:
+            if self.thread is None and not self.stopped.is_set():
+                self.thread = threading.Thread(target=self._run, name='traffic-log-sink', daemon=True)
+                self.thread.start()
+                atexit.register(self.close)
+
+    def write(self, entry):
+        """Queue one log document without touching Mongo"""
+        self._start()
+        try:
+            if self.policy == 'block':
+                self.buffer.put(entry, timeout=self.put_timeout)
+            else:
+                self.buffer.put_nowait(entry)
+        except queue.Full:
+            self.dropped_count += 1
+            return False
+
+        if self.buffer.qsize() >= self.batch_size:
+            self.wake.set()
+        return True
+
+    def request_flush(self):
+        """Ask the background thread to flush now without waiting for it"""
+        self.wake.set()
+
+    def flush(self):
+        """Write everything currently buffered; returns the number of documents written"""
+        written = 0
+        with self.flush_lock:
+            while True:
+                batch = []
+                while len(batch) < self.batch_size:
+                    try:
+                        batch.append(self.buffer.get_nowait())
+                    except queue.Empty:
+                        break
+                if not batch:
+                    return written
+
+                try:
+                    self.collection.insert_many(batch, ordered=False)
+                    written += len(batch)
+                    self.written_count += len(batch)
+                except Exception as e:
+                    self.failed_count += len(batch)
+                    print(f"[LOGGING ERROR] Failed to write {len(batch)} traffic logs: {str(e)}")
+                    continue
+
+                if self.on_flush:
+                    try:
+                        self.on_flush(batch)
+                    except Exception as e:
+                        print(f"[LOGGING ERROR] Log flush hook failed: {str(e)}")
+
+    def _run(self):
+        while not self.stopped.is_set():
+            self.wake.wait(self.flush_interval)
+            self.wake.clear()
+            self.flush()
+
+    def close(self):
+        """Stop the background thread and flush what is left"""
+        with self.start_lock:
+            if self.stopped.is_set():
+                return
+            self.stopped.set()
+        self.wake.set()
+        if self.thread is not None:
+            self.thread.join(timeout=self.flush_interval + 5)
+            atexit.unregister(self.close)
+        self.flush()
+
+    def stats(self):
+        return {
+            'buffered': self.buffer.qsize(),
+            'written': self.written_count,
+            'dropped': self.dropped_count,
+            'failed': self.failed_count
+        }
+
+def read_data_version(meta_collection, name):
+    """Current (version, updatedAt) of a data set tracked in the meta collection"""
+    meta = meta_collection.find_one({'_id': name}) or {}
+    return meta.get('version', 0), meta.get('updatedAt')
+
+def bump_data_version(meta_collection, name):
+    """Mark a data set as changed, returning its new (version, updatedAt)"""
+    meta = meta_collection.find_one_and_update(
+        {'_id': name},
+        {'$inc': {'version': 1}, '$set': {'updatedAt': datetime.now(pytz.utc)}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+    return meta['version'], meta['updatedAt']
+
+def rollup_day(date):
+    """YYYY-MM-DD for a DD-MM-YYYY date, so rollup days sort chronologically"""
+    return datetime.strptime(date, '%d-%m-%Y').strftime('%Y-%m-%d')
+
+def whole_hour_bounds(start_time, end_time):
+    """'HH:MM' bounds of the whole hours whose HH:00 lies within [start_time, end_time]"""
+    first_hour = int(start_time[:2]) + (1 if start_time[3:5] > '00' else 0)
+    return f"{first_hour:02d}:00", f"{end_time[:2]}:59"
+
+def hourly_series(points):
+    """Average (time, value) points per hour. Returns (times, values) labelled HH:00 in time order."""
+    hours = {}
+    for time_label, value in points:
+        hours.setdefault(time_label[:2], []).append(value)
+    times = [f"{hour}:00" for hour in sorted(hours)]
+    values = [sum(hours[hour]) / len(hours[hour]) for hour in sorted(hours)]
+    return times, values
+
+def traffic_rollup_updates(records):
+    """Upserts folding historical traffic records into per road/day rollups.
+
+    Each rollup holds the day's totals and extremes plus per-hour stats under
+    hours.<HH>, keyed on the records' local date and time strings. Counters
+    use $inc and extremes $min/$max, so records can be folded in any order
+    or batch split. Records of the same road and day are combined first.
+    """
+    rollups = {}
+    for record in records:
+        if not record.get('road_id') or not record.get('date') or not record.get('time'):
+            continue
+        day = rollup_day(record['date'])
+        hour = record['time'][:2]
+        speed = record.get('currentSpeed') or 0
+        intensity = record.get('intensity')
+
+        rollup = rollups.get((record['road_id'], day))
+        if rollup is None:
+            rollup = rollups[(record['road_id'], day)] = {
+                '$setOnInsert': {'road_id': record['road_id'], 'day': day, 'date': record['date']},
+                '$set': {},
+                '$inc': {},
+                '$min': {'minSpeed': speed, 'firstTime': record['time']},
+                '$max': {'maxSpeed': speed, 'lastTime': record['time']}
+            }
+        rollup['$set']['streetName'] = record.get('streetName')
+        rollup['$min']['minSpeed'] = min(rollup['$min']['minSpeed'], speed)
+        rollup['$min']['firstTime'] = min(rollup['$min']['firstTime'], record['time'])
+        rollup['$max']['maxSpeed'] = max(rollup['$max']['maxSpeed'], speed)
+        rollup['$max']['lastTime'] = max(rollup['$max']['lastTime'], record['time'])
+
+        increments = {
+            'samples': 1,
+            'speedSum': speed,
+            'freeFlowSpeedSum': record.get('freeFlowSpeed') or 0,
+            'congestionHours': 1 if intensity == 'high' else 0,
+            f'hours.{hour}.samples': 1,
+            f'hours.{hour}.speedSum': speed
+        }
+        if intensity in ('low', 'medium', 'high'):
+            increments[f'hours.{hour}.{intensity}'] = 1
+        for field, value in increments.items():
+            rollup['$inc'][field] = rollup['$inc'].get(field, 0) + value
+
+    return [
+        UpdateOne({'_id': f"{road_id}:{day}"}, update, upsert=True)
+        for (road_id, day), update in rollups.items()
+    ]
+
+INGESTION_ROLLUP_COUNTERS = {'success': 'successful', 'failure': 'failed', 'duplicate': 'duplicates'}
+
+def ingestion_rollup_updates(log_entries, tz):
+    """Upserts adding traffic log entries to per-day success, failure and duplicate counts.
+
+    Entries are counted on their 'date' (DD-MM-YYYY) or, without one, on the
+    local date of their timestamp; naive timestamps are taken as UTC.
+    """
+    counts = {}
+    for entry in log_entries:
+        counter = INGESTION_ROLLUP_COUNTERS.get(entry.get('status'))
+        if counter is None:
+            continue
+        date = entry.get('date')
+        if not date:
+            timestamp = entry.get('timestamp')
+            if not isinstance(timestamp, datetime):
+                continue
+            if timestamp.tzinfo is None:
+                timestamp = pytz.utc.localize(timestamp)
+            date = timestamp.astimezone(tz).strftime('%d-%m-%Y')
+        day_counts = counts.setdefault(date, {})
+        day_counts[counter] = day_counts.get(counter, 0) + 1
+
+    return [
+        UpdateOne(
+            {'_id': rollup_day(date)},
+            {'$setOnInsert': {'date': date}, '$inc': day_counts},
+            upsert=True
+        )
+        for date, day_counts in counts.items()
+    ]
+
+# Rollup kinds and the base name of the collections holding them. Each rebuild
+# writes fresh '<base>_<run>' collections; traffic_meta 'rollups' points at the live ones.
+ROLLUP_COLLECTIONS = {'traffic': 'traffic_rollup_daily', 'ingestion': 'ingestion_rollup_daily'}
+
+ROLLUP_INDEXES = {
+    'traffic': [
+        {'name': 'streetName_day', 'keys': [('streetName', 1), ('day', 1)]},
+        {'name': 'day', 'keys': [('day', 1)]},
+    ],
+    'ingestion': [],
+}
+
+def rollup_targets(state, kind, documents):
+    """Rollup collections a batch of freshly stored documents of one kind should be folded into.
+
+    Returns [(collection name, documents)]: the live rollup gets every
+    document, and while a rebuild runs its new collection also gets the
+    documents at or after the rebuild's cutoff, which the rebuild itself
+    does not read.
+    """
+    state = state or {}
+    targets = []
+    live = (state.get('collections') or {}).get(kind)
+    if live:
+        targets.append((live, documents))
+    rebuild = state.get('rebuild') or {}
+    if rebuild.get('collections'):
+        later = [document for document in documents
+                 if document.get('_id') is not None and document['_id'] >= rebuild['cutoff']]
+        if later:
+            targets.append((rebuild['collections'][kind], later))
+    return targets
+
+def fold_rollup(source, target, query, projection, make_updates, batch_size=1000, heartbeat=None):
+    """Fold the source documents matching query into a rollup collection in batches.
+
+    heartbeat, if given, is called after every batch. Returns the number of
+    source documents read.
+    """
+    read_count = 0
+    batch = []
+    for document in source.find(query, projection).batch_size(batch_size):
+        batch.append(document)
+        if len(batch) < batch_size:
+            continue
+        updates = make_updates(batch)
+        if updates:
+            target.bulk_write(updates, ordered=False)
+        read_count += len(batch)
+        batch = []
+        if heartbeat:
+            heartbeat()
+
+    if batch:
+        updates = make_updates(batch)
+        if updates:
+            target.bulk_write(updates, ordered=False)
+        read_count += len(batch)
+    return read_count
+
+def rebuild_rollups(database, meta_collection, sources, batch_size=1000, lock_seconds=600, settle_seconds=5):
+    """Regenerate every rollup from raw data into new collections and switch to them.
+
+    sources maps each rollup kind to (source collection, projection,
+    make_updates). A lock in meta_collection lets one rebuild run at a time;
+    None is returned when another holds it. The rebuild reads source
+    documents with an _id before a cutoff a second after the lock was
+    taken, after waiting settle_seconds for writes already in flight.
+    Writers fold documents from the cutoff on into the new collections
+    themselves (see rollup_targets), so nothing ingested during the rebuild
+    is lost or counted twice. Previous rollup collections are dropped by
+    the next rebuild rather than while writers may still hold their names.
+    Returns {kind: documents read}.
+    """
+    run = str(ObjectId())
+    # Naive UTC, as Mongo returns datetimes
+    started_at = datetime.now(timezone.utc).replace(tzinfo=None)
+    cutoff = ObjectId.from_datetime(started_at + timedelta(seconds=1))
+    collections = {kind: f"{base}_{run}" for kind, base in ROLLUP_COLLECTIONS.items()}
+
+    try:
+        state = meta_collection.find_one_and_update(
+            {'_id': 'rollups', '$or': [
+                {'rebuild': None},
+                {'rebuild.lockedUntil': {'$lt': started_at}}
+            ]},
+            {'$set': {'rebuild': {
+                'run': run,
+                'cutoff': cutoff,
+                'collections': collections,
+                'startedAt': started_at,
+                'lockedUntil': started_at + timedelta(seconds=lock_seconds)
+            }}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+    except DuplicateKeyError:
+        state = None
+    if state is None:
+        print("[ROLLUPS] Another rebuild is already running")
+        return None
+
+    def heartbeat():
+        meta_collection.update_one(
+            {'_id': 'rollups', 'rebuild.run': run},
+            {'$set': {'rebuild.lockedUntil': datetime.now(timezone.utc).replace(tzinfo=None)
+                                              + timedelta(seconds=lock_seconds)}}
+        )
+
+    # Leftovers of earlier rebuilds; the live rollups and this run's collections stay
+    keep = set((state.get('collections') or {}).values()) | set(collections.values())
+    for name in database.list_collection_names():
+        for base in ROLLUP_COLLECTIONS.values():
+            if (name == base or name.startswith(f"{base}_")) and name not in keep:
+                database[name].drop()
+
+    wait = (cutoff.generation_time - datetime.now(timezone.utc)).total_seconds() + settle_seconds
+    if wait > 0:
+        time.sleep(wait)
+
+    counts = {}
+    for kind, (source, projection, make_updates) in sources.items():
+        target = database[collections[kind]]
+        for spec in ROLLUP_INDEXES[kind]:
+            target.create_index(spec['keys'], name=spec['name'])
+        counts[kind] = fold_rollup(source, target, {'_id': {'$lt': cutoff}}, projection,
+                                   make_updates, batch_size, heartbeat)
+
+    switched = meta_collection.update_one(
+        {'_id': 'rollups', 'rebuild.run': run},
+        {
+            '$set': {'collections': collections, 'updatedAt': datetime.now(timezone.utc)},
+            '$inc': {'version': 1},
+            '$unset': {'rebuild': ''}
+        }
+    )
+    if not switched.modified_count:
+        print(f"[ROLLUPS] Rebuild {run} lost its lock and was discarded")
+        return None
+    return counts
+
+def compress_body(data, accept_encodings, min_size=1024):
+    """Compress a response body with the best encoding the client accepts.
+
+    Returns (body, encoding), with encoding None when the body is left as is.
+    """
+    if len(data) < min_size:
+        return data, None
+    if brotli is not None and accept_encodings['br']:
+        return brotli.compress(data, quality=5), 'br'
+    if accept_encodings['gzip']:
+        return gzip.compress(data, compresslevel=6), 'gzip'
+    return data, None
+
+class TrafficSnapshot:
+    """Read-only copy of current_traffic_data for one ingestion version"""
+
+    def __init__(self, records, version, updated_at, built_at):
+        self.records = tuple(records)
+        self.version = version
+        self.updated_at = updated_at
+        self.built_at = built_at
+        self.etag = f'"traffic-{version}"'
+        self._memo = {}
+
+    def memo(self, key, compute):
+        """Compute a value derived from this snapshot once and reuse it"""
+        if key not in self._memo:
+            self._memo[key] = compute()
+        return self._memo[key]
+
+    def filter(self, search_term=None, start_date=None, end_date=None,
+               start_time=None, end_time=None, conditions=None):
+        """Filter records like the /api/traffic/data Mongo query, returning copies"""
+        search = re.compile(search_term, re.IGNORECASE) if search_term else None
+        start_day = datetime.strptime(start_date, '%Y-%m-%d').date() if start_date else None
+        end_day = datetime.strptime(end_date, '%Y-%m-%d').date() if end_date else None
+
+        results = []
+        for record in self.records:
+            if search and not search.search(record.get('streetName') or ''):
+                continue
+            if start_day or end_day:
+                record_day = parse_query_date(record.get('date'))
+                if record_day is None:
+                    continue
+                if (start_day and record_day.date() < start_day) or (end_day and record_day.date() > end_day):
+                    continue
+            if start_time or end_time:
+                record_time = record.get('time')
+                if record_time is None:
+                    continue
+                if (start_time and record_time < start_time) or (end_time and record_time > end_time):
+                    continue
+            if conditions and record.get('intensity') not in conditions:
+                continue
+            results.append(dict(record))
+        return results
+
+class TrafficSnapshotCache:
+    """Process-local snapshot of current traffic, rebuilt once per ingestion cycle.
+
+    The ingestion version lives in a meta document that publish() bumps after
+    every successful fetch. Other workers notice the bump by polling that
+    document at most every poll_interval seconds, and a cold cache loads
+    straight from Mongo.
+    """
+
+    META_ID = 'current_traffic'
+
+    def __init__(self, collection, meta_collection, poll_interval=5, clock=time.monotonic):
+        self.collection = collection
+        self.meta_collection = meta_collection
+        self.poll_interval = poll_interval
+        self.clock = clock
+        self.snapshot = None
+        self.last_checked = 0
+        self.load_lock = threading.Lock()
+
+    def _load(self, version, updated_at):
+        records = list(self.collection.find({}, {'_id': 0}))
+        self.snapshot = TrafficSnapshot(records, version, updated_at, datetime.now(pytz.utc))
+        self.last_checked = self.clock()
+        return self.snapshot
+
+    def get(self):
+        """Return the current snapshot, reloading it if another worker published a newer one"""
+        snapshot = self.snapshot
+        if snapshot is not None and self.clock() - self.last_checked < self.poll_interval:
+            return snapshot
+
+        with self.load_lock:
+            snapshot = self.snapshot
+            if snapshot is not None and self.clock() - self.last_checked < self.poll_interval:
+                return snapshot
+
+            version, updated_at = read_data_version(self.meta_collection, self.META_ID)
+            if snapshot is None or snapshot.version != version:
+                return self._load(version, updated_at)
+
+            self.last_checked = self.clock()
+            return snapshot
+
+    def publish(self):
+        """Record a new ingestion version and rebuild the local snapshot from it"""
+        version, updated_at = bump_data_version(self.meta_collection, self.META_ID)
+        with self.load_lock:
+            return self._load(version, updated_at)
+
+TRAFFIC_DELTA_FIELDS = ('currentSpeed', 'freeFlowSpeed', 'intensity')
+
+def diff_traffic_records(old_records, new_records, fields=TRAFFIC_DELTA_FIELDS):
+    """Roads whose tracked fields changed between two snapshots, plus removed road ids"""
+    old_by_road = {record['road_id']: record for record in old_records}
+    changed = []
+    for record in new_records:
+        previous = old_by_road.pop(record['road_id'], None)
+        if previous is None or any(previous.get(field) != record.get(field) for field in fields):
+            changed.append(record)
+    return changed, sorted(old_by_road)
+
+def format_traffic_log(log):
+    """Shape a traffic_logs document for the live logs panel"""
+    return {
+        "timestamp": log["timestamp"].strftime('%Y-%m-%d %H:%M:%S'),
+        "roadName": log.get("roadName", "Unknown"),
+        "status": log["status"],
+        "message": log["message"]
+    }
+
+class EventBroker:
+    """In-process publisher that fans events out to any number of stream subscribers.
+
+    Events get increasing sequence numbers and the most recent ones are kept in
+    a ring buffer, so a reconnecting client can resume from the last id it saw.
+    """
+
+    def __init__(self, capacity=1000):
+        self.events = deque(maxlen=capacity)
+        self.seq = 0
+        self.condition = threading.Condition()
+        self.subscribers = 0
+        self.published_count = 0
+
+    def publish(self, event_type, data):
+        with self.condition:
+            self.seq += 1
+            self.events.append((self.seq, event_type, data))
+            self.published_count += 1
+            self.condition.notify_all()
+            return self.seq
+
+    def events_since(self, last_seq, timeout=None):
+        """Events after last_seq, waiting up to timeout for one to arrive.
+
+        Returns (events, complete), where complete is False when events after
+        last_seq have already been dropped from the buffer or last_seq comes
+        from before a restart.
+        """
+        with self.condition:
+            if last_seq > self.seq:
+                return [], False
+            if self.seq == last_seq:
+                self.condition.wait_for(lambda: self.seq > last_seq, timeout)
+            oldest = self.events[0][0] if self.events else self.seq + 1
+            events = [event for event in self.events if event[0] > last_seq]
+            return events, last_seq >= oldest - 1
+
+    def stream(self, last_seq=None, heartbeat=15, stop=None):
+        """Yield Server-Sent Events messages, starting after last_seq or from now"""
+        with self.condition:
+            self.subscribers += 1
+        try:
+            if last_seq is None:
+                last_seq = self.seq
+            while not (stop and stop.is_set()):
+                events, complete = self.events_since(last_seq, heartbeat)
+                if not complete:
+                    yield f"id: {self.seq}\nevent: reset\ndata: {{}}\n\n"
+                    last_seq = self.seq
+                    continue
+                if not events:
+                    yield ": heartbeat\n\n"
+                    continue
+                for seq, event_type, data in events:
+                    yield f"id: {seq}\nevent: {event_type}\ndata: {json.dumps(data, default=str)}\n\n"
+                    last_seq = seq
+        finally:
+            with self.condition:
+                self.subscribers -= 1
+
+    def stats(self):
+        return {
+            'seq': self.seq,
+            'buffered': len(self.events),
+            'subscribers': self.subscribers,
+            'published': self.published_count
+        }
+
+REPORT_FILTER_FIELDS = ('dataType', 'dateRange', 'timeRange', 'selectedRoads')
+
+REPORT_GRANULARITIES = ('raw', 'daily', 'hourly')
+
+def report_cache_key(filters, data_version):
+    """Identity of a report: its filters plus the version of the data it was built from"""
+    identity = {field: filters.get(field) or None for field in REPORT_FILTER_FIELDS}
+    if identity['selectedRoads']:
+        identity['selectedRoads'] = sorted(identity['selectedRoads'])
+    # Raw reports keep the keys they had before summaries existed
+    if (filters.get('granularity') or 'raw') != 'raw':
+        identity['granularity'] = filters['granularity']
+    identity['reportType'] = (filters.get('metadata') or {}).get('reportType', 'standard')
+    identity['dataVersion'] = data_version
+    return hashlib.sha256(json.dumps(identity, sort_keys=True, default=str).encode()).hexdigest()
+
+SUMMARY_PERCENTILES = (50, 85)
+
+def summary_report_columns(data_type, granularity):
+    """Columns of a daily or hour-of-day summary report for a data type"""
+    period = 'date' if granularity == 'daily' else 'hour'
+    if data_type == 'traffic':
+        return ['streetName', period, 'samples', 'avgSpeed', 'minSpeed', 'p50Speed', 'p85Speed',
+                'maxSpeed', 'avgFreeFlowSpeed']
+    elif data_type == 'incidents':
+        return ['streetName', period, 'samples', 'accidentCount', 'congestionCount', 'incidentCount']
+    elif data_type == 'congestion':
+        return ['streetName', period, 'samples', 'congestionHours', 'avgSpeed', 'p50Speed', 'congestionCount']
+    return ['streetName', period, 'avgSpeed', 'p50Speed', 'p85Speed', 'congestionHours',
+            'accidentCount', 'congestionCount', 'incidentCount']
+
+def report_summary_pipeline(query, granularity):
+    """Aggregation reducing matching historical rows to one row per road and day or hour of day.
+
+    Groups on the stored local 'date' (DD-MM-YYYY) or the hour of the local
+    'time' (HH:MM). Speeds are pushed in ascending order so percentiles can be
+    read by position, which works on servers without $percentile.
+    """
+    if granularity == 'daily':
+        # YYYY-MM-DD so periods sort chronologically
+        period = {'$concat': [
+            {'$substr': ['$date', 6, 4]}, '-', {'$substr': ['$date', 3, 2]}, '-', {'$substr': ['$date', 0, 2]}
+        ]}
+    else:
+        period = {'$concat': [{'$substr': ['$time', 0, 2]}, ':00']}
+
+    percentiles = {
+        f'p{percentile}Speed': {'$arrayElemAt': ['$speeds', {
+            '$floor': {'$multiply': [percentile / 100, {'$subtract': ['$samples', 1]}]}
+        }]}
+        for percentile in SUMMARY_PERCENTILES
+    }
+
+    return [
+        {'$match': query},
+        {'$project': {
+            'road_id': 1,
+            'streetName': 1,
+            'date': 1,
+            'period': period,
+            'currentSpeed': 1,
+            'freeFlowSpeed': 1,
+            'congested': {'$cond': [{'$eq': ['$intensity', 'high']}, 1, 0]}
+        }},
+        {'$sort': {'currentSpeed': 1}},
+        {'$group': {
+            '_id': {'road_id': '$road_id', 'period': '$period'},
+            'streetName': {'$first': '$streetName'},
+            'date': {'$first': '$date'},
+            'samples': {'$sum': 1},
+            'avgSpeed': {'$avg': '$currentSpeed'},
+            'minSpeed': {'$min': '$currentSpeed'},
+            'maxSpeed': {'$max': '$currentSpeed'},
+            'avgFreeFlowSpeed': {'$avg': '$freeFlowSpeed'},
+            'congestionHours': {'$sum': '$congested'},
+            'speeds': {'$push': '$currentSpeed'}
+        }},
+        {'$project': {
+            '_id': 0,
+            'road_id': '$_id.road_id',
+            'period': '$_id.period',
+            'streetName': 1,
+            'date': 1,
+            'samples': 1,
+            'avgSpeed': 1,
+            'minSpeed': 1,
+            'maxSpeed': 1,
+            'avgFreeFlowSpeed': 1,
+            'congestionHours': 1,
+            **percentiles
+        }},
+        {'$sort': {'streetName': 1, 'period': 1}}
+    ]
+
+def incident_summary_pipeline(road_ids, timestamp_range, granularity, time_range=None, tz='Asia/Singapore'):
+    """Aggregation counting ACCIDENT and CONGESTION incidents per road, type and local day or hour.
+
+    An optional time_range ({'start': 'HH:MM', 'end': 'HH:MM'}) keeps only
+    incidents whose local hour falls inside it.
+    """
+    match = {'road_id': {'$in': list(road_ids)}, 'type': {'$in': ['ACCIDENT', 'CONGESTION']}}
+    if timestamp_range:
+        match['start_time'] = {op: to_naive_utc(bound) for op, bound in timestamp_range.items()}
+
+    local = {'date': '$start_time', 'timezone': tz}
+    pipeline = [
+        {'$match': match},
+        {'$project': {
+            'road_id': 1,
+            'type': 1,
+            'year': {'$year': local},
+            'month': {'$month': local},
+            'day': {'$dayOfMonth': local},
+            'hour': {'$hour': local}
+        }}
+    ]
+
+    time_range = time_range or {}
+    hours = {}
+    if time_range.get('start'):
+        hours['$gte'] = int(time_range['start'][:2])
+    if time_range.get('end'):
+        hours['$lte'] = int(time_range['end'][:2])
+    if hours:
+        pipeline.append({'$match': {'hour': hours}})
+
+    period = ({'year': '$year', 'month': '$month', 'day': '$day'} if granularity == 'daily'
+              else {'hour': '$hour'})
+    pipeline.append({'$group': {
+        '_id': {'road_id': '$road_id', 'type': '$type', **period},
+        'count': {'$sum': 1}
+    }})
+    return pipeline
+
+def incident_summary_period(bucket_id, granularity):
+    """Summary period key (YYYY-MM-DD or HH:00) of an incident_summary_pipeline bucket"""
+    if granularity == 'daily':
+        return f"{bucket_id['year']:04d}-{bucket_id['month']:02d}-{bucket_id['day']:02d}"
+    return f"{bucket_id['hour']:02d}:00"
+
+class ReportQueueFull(Exception):
+    """Raised when the report job queue has no room for another job"""
+
+class ReportJobQueue:
+    """Runs report builds on a bounded thread pool and tracks their progress in Mongo.
+
+    Job state lives in a collection so any worker process can answer a poll.
+    Jobs are deduplicated by key: submitting a key that is already queued or
+    running returns that job and adds the caller to its owners. A job whose
+    process stops heartbeating for stale_seconds is marked failed, and
+    finished jobs expire after history_seconds.
+    """
+
+    def __init__(self, collection, max_workers=2, max_pending=20, stale_seconds=600, history_seconds=86400):
+        self.collection = collection
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='report')
+        self.max_pending = max_pending
+        self.stale_seconds = stale_seconds
+        self.local = set()
+        self.heartbeat_at = 0.0
+        self.lock = threading.Lock()
+        # Only one queued or running job per key; finished jobs drop 'active'
+        self.collection.create_index([('key', 1)], name='key_active_unique', unique=True,
+                                     partialFilterExpression={'active': True})
+        self.collection.create_index([('finishedAt', 1)], name='finishedAt_ttl',
+                                     expireAfterSeconds=history_seconds)
+        atexit.register(self.shutdown)
+
+    @staticmethod
+    def _now():
+        return datetime.now(timezone.utc).replace(tzinfo=None)
+
+    @staticmethod
+    def _format(job):
+        job = dict(job)
+        job['id'] = job.pop('_id')
+        for field in ('createdAt', 'startedAt', 'finishedAt'):
+            if job.get(field) is not None and job[field].tzinfo is None:
+                job[field] = job[field].replace(tzinfo=pytz.utc)
+        job.pop('active', None)
+        job.pop('heartbeatAt', None)
+        return job
+
+    def _expire_stale(self):
+        now = self._now()
+        self.collection.update_many(
+            {'active': True, 'heartbeatAt': {'$lt': now - timedelta(seconds=self.stale_seconds)}},
+            {'$set': {'status': 'failed', 'message': 'Report generation failed',
+                      'error': 'Report worker stopped before finishing', 'finishedAt': now},
+             '$unset': {'active': ''}}
+        )
+
+    def submit(self, key, build, owner=None):
+        """Queue build(progress) under key. Returns (job, created)"""
+        self._expire_stale()
+        owners = [owner] if owner is not None else []
+        while True:
+            existing = self.collection.find_one_and_update(
+                {'key': key, 'active': True},
+                {'$addToSet': {'owners': {'$each': owners}}},
+                return_document=ReturnDocument.AFTER
+            )
+            if existing is not None:
+                return self._format(existing), False
+
+            if self.collection.count_documents({'active': True}) >= self.max_pending:
+                raise ReportQueueFull(f"{self.max_pending} report jobs already pending")
+
+            now = self._now()
+            job = {
+                '_id': str(ObjectId()),
+                'key': key,
+                'owners': owners,
+                'active': True,
+                'status': 'queued',
+                'progress': 0.0,
+                'message': 'Waiting for a report worker',
+                'result': None,
+                'error': None,
+                'createdAt': now,
+                'startedAt': None,
+                'finishedAt': None,
+                'heartbeatAt': now
+            }
+            try:
+                self.collection.insert_one(job)
+                break
+            except DuplicateKeyError:
+                # Another process queued the same key first; join that job
+                continue
+
+        with self.lock:
+            self.local.add(job['_id'])
+        self.executor.submit(self._run, job['_id'], build)
+        return self._format(job), True
+
+    def _heartbeat(self):
+        """Keep this process's queued and running jobs from being expired as stale"""
+        with self.lock:
+            if time.time() - self.heartbeat_at < self.stale_seconds / 4:
+                return
+            self.heartbeat_at = time.time()
+            job_ids = list(self.local)
+        if job_ids:
+            self.collection.update_many({'_id': {'$in': job_ids}, 'active': True},
+                                        {'$set': {'heartbeatAt': self._now()}})
+
+    def _update(self, job_id, **fields):
+        update = {'$set': dict(fields, heartbeatAt=self._now())}
+        if fields.get('status') in ('done', 'failed'):
+            update['$unset'] = {'active': ''}
+            with self.lock:
+                self.local.discard(job_id)
+        try:
+            self.collection.update_one({'_id': job_id}, update)
+            self._heartbeat()
+        except Exception as e:
+            print(f"[REPORTS] Failed to update job {job_id}: {e}")
+
+    def _run(self, job_id, build):
+        self._update(job_id, status='running', startedAt=self._now(), message='Starting')
+
+        def progress(fraction, message=None):
+            fields = {'progress': round(min(max(fraction, 0.0), 1.0), 3)}
+            if message:
+                fields['message'] = message
+            self._update(job_id, **fields)
+
+        try:
+            result = build(progress)
+            self._update(job_id, status='done', progress=1.0, message='Report ready',
+                         result=result, finishedAt=self._now())
+        except Exception as e:
+            print(f"[REPORTS] Job {job_id} failed: {e}")
+            self._update(job_id, status='failed', message='Report generation failed',
+                         error=str(e), finishedAt=self._now())
+
+    def get(self, job_id):
+        self._expire_stale()
+        job = self.collection.find_one({'_id': job_id})
+        return self._format(job) if job is not None else None
+
+    def stats(self):
+        counts = {'queued': 0, 'running': 0, 'done': 0, 'failed': 0}
+        for bucket in self.collection.aggregate([{'$group': {'_id': '$status', 'count': {'$sum': 1}}}]):
+            counts[bucket['_id']] = bucket['count']
+        return counts
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        with self.lock:
+            job_ids = list(self.local)
+        if not job_ids:
+            return
+        try:
+            # Cancelled jobs would otherwise look queued until they go stale
+            self.collection.update_many(
+                {'_id': {'$in': job_ids}, 'status': 'queued'},
+                {'$set': {'status': 'failed', 'message': 'Report generation failed',
+                          'error': 'Server stopped before the report started', 'finishedAt': self._now()},
+                 '$unset': {'active': ''}}
+            )
+        except Exception as e:
+            print(f"[REPORTS] Failed to release queued jobs: {e}")
+
+class StreamingTable(Flowable):
+    """Report table whose rows are pulled from an iterator one page at a time.
+
+    When laid out it takes as many rows as fit in the space left on the page,
+    splits them off as an ordinary Table with the header row, and returns the
+    rest as another StreamingTable, so only one page of rows is ever held in
+    memory. Rows have a fixed height so the fit is known before drawing.
+    """
+
+    def __init__(self, header, rows, style, col_widths, row_height=28, header_height=36, buffered=None):
+        super().__init__()
+        self.header = header
+        self.rows = rows
+        self.style = style
+        self.col_widths = col_widths
+        self.row_height = row_height
+        self.header_height = header_height
+        self.buffered = buffered or []
+        self.exhausted = False
+
+    def _fill(self, count):
+        while len(self.buffered) < count and not self.exhausted:
+            try:
+                self.buffered.append(next(self.rows))
+            except StopIteration:
+                self.exhausted = True
+
+    def _rows_fitting(self, height):
+        return max(int((height - self.header_height) // self.row_height), 0)
+
+    def wrap(self, availWidth, availHeight):
+        fitting = self._rows_fitting(availHeight)
+        self._fill(fitting + 1)
+        self.width = availWidth
+        if not self.buffered:
+            self.height = 0
+        elif len(self.buffered) > fitting:
+            # More rows than space: report as too tall so the frame splits us
+            self.height = availHeight + self.row_height
+        else:
+            self.height = self.header_height + len(self.buffered) * self.row_height
+        return self.width, self.height
+
+    def split(self, availWidth, availHeight):
+        fitting = self._rows_fitting(availHeight)
+        self._fill(fitting + 1)
+        if fitting == 0:
+            return []
+        page_rows = self.buffered[:fitting]
+        remainder = StreamingTable(self.header, self.rows, self.style, self.col_widths,
+                                   self.row_height, self.header_height, self.buffered[fitting:])
+        remainder.exhausted = self.exhausted
+        self.buffered = []
+        return [self._table(page_rows), remainder]
+
+    def draw(self):
+        if self.buffered:
+            table = self._table(self.buffered)
+            table.wrapOn(self.canv, self.width, self.height)
+            table.drawOn(self.canv, 0, 0)
+
+    def _table(self, rows):
+        table = Table([self.header] + rows, colWidths=self.col_widths,
+                      rowHeights=[self.header_height] + [self.row_height] * len(rows), repeatRows=1)
+        table.setStyle(self.style)
+        return table
+
+def congestion_factors(current_speeds, free_flow_speeds):
+    """Congestion factor per road from current vs free flow speed: 1 (free), 2 (slow) or 3 (congested)"""
+    current_speeds = np.asarray(current_speeds, dtype=float)
+    free_flow_speeds = np.asarray(free_flow_speeds, dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ratios = np.where(free_flow_speeds == 0, 1.0, current_speeds / free_flow_speeds)
+    return np.select([ratios >= 0.8, ratios >= 0.5], [1.0, 2.0], default=3.0)
+
+class EdgeSensorIndex:
+    """Maps routing graph edges to their nearest traffic sensor.
+
+    Built once per graph load from a KD-tree over the midpoints of a CSRGraph's
+    edges, in eid order. The mapping is cached per set of sensor coordinates,
+    so a weight update is a NumPy gather and multiply over the edge array.
+    """
+
+    def __init__(self, csr, max_distance=0.01):
+        self.max_distance = max_distance
+        self.lengths = np.asarray(csr.lengths, dtype=float)
+        self.midpoints = np.column_stack([
+            (csr.lat[csr.edge_sources] + csr.lat[csr.edge_targets]) / 2,
+            (csr.lng[csr.edge_sources] + csr.lng[csr.edge_targets]) / 2
+        ]).reshape(-1, 2)
+        self.tree = cKDTree(self.midpoints)
+        self._sensor_coords = None
+        self._assignment = None
+
+    def assign(self, sensor_coords):
+        """Index of the nearest sensor within max_distance for every edge, or -1"""
+        sensor_coords = tuple(sensor_coords)
+        if sensor_coords != self._sensor_coords:
+            self._assignment = self.nearest_sensors(sensor_coords)
+            self._sensor_coords = sensor_coords
+        return self._assignment
+
+    def nearest_sensors(self, sensor_coords):
+        """Uncached assignment, for sensor sets other than the live one"""
+        sensor_coords = tuple(sensor_coords)
+        assignment = np.full(len(self.lengths), -1, dtype=np.int64)
+        best_distance = np.full(len(self.lengths), np.inf)
+        nearby_edges = self.tree.query_ball_point(sensor_coords, r=self.max_distance) if sensor_coords else []
+        for sensor_index, (edge_ids, coords) in enumerate(zip(nearby_edges, sensor_coords)):
+            edge_ids = np.asarray(edge_ids, dtype=np.int64)
+            if not len(edge_ids):
+                continue
+            distances = np.hypot(*(self.midpoints[edge_ids] - coords).T)
+            closer = (distances < best_distance[edge_ids]) & (distances < self.max_distance)
+            assignment[edge_ids[closer]] = sensor_index
+            best_distance[edge_ids[closer]] = distances[closer]
+        return assignment
+
+    def weights(self, sensor_coords, sensor_factors):
+        """Edge weights: length scaled by the congestion factor of the nearest sensor"""
+        assignment = self.assign(sensor_coords)
+        factors = np.append(np.asarray(sensor_factors, dtype=float), 1.0)
+        return self.lengths * factors[assignment]
+
+class RoutingWeights:
+    """Read-only congestion weights for every routing edge, indexed by the edge's 'eid'"""
+
+    def __init__(self, version, weights, cch_metric=None):
+        self.version = version
+        self.weights = np.array(weights, dtype=float)
+        self.weights.setflags(write=False)
+        self.cch_metric = cch_metric
+        self.built_at = datetime.now(pytz.utc)
+
+    def weight_function(self):
+        """Edge weight callable for networkx path searches"""
+        weights = self.weights
+        return lambda u, v, data: weights[data['eid']]
+
+class RouteCache:
+    """Thread-safe LRU cache of computed routes with a time-to-live.
+
+    Keys carry the routing weights version, so results computed under older
+    congestion are never served; clear() drops them once new weights are in.
+    """
+
+    def __init__(self, capacity=1000, ttl=300, clock=time.monotonic):
+        self.capacity = capacity
+        self.ttl = ttl
+        self.clock = clock
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and self.clock() - entry[0] > self.ttl:
+                del self.entries[key]
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, value):
+        if self.capacity <= 0:
+            return
+        with self.lock:
+            self.entries[key] = (self.clock(), value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.capacity:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self.lock:
+            if self.entries:
+                self.invalidations += 1
+            self.entries.clear()
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self.entries),
+                'capacity': self.capacity,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hitRate': round(self.hits / lookups, 4) if lookups else None,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'invalidations': self.invalidations
+            }
+
+class CCHMetric:
+    """Customized weights of a ContractionHierarchy for one RoutingWeights version.
+
+    Arc (low, high) has an 'up' weight for low -> high and a 'down' weight for
+    high -> low. A *_mid of -1 means the arc is the original edge *_eid,
+    otherwise the arc is a shortcut through that middle node.
+    """
+
+    def __init__(self, up, down, up_mid, down_mid, up_eid, down_eid):
+        self.up, self.down = up, down
+        self.up_mid, self.down_mid = up_mid, down_mid
+        self.up_eid, self.down_eid = up_eid, down_eid
+        for array in (up, down, up_mid, down_mid, up_eid, down_eid):
+            array.setflags(write=False)
+        self.up_list = up.tolist()
+        self.down_list = down.tolist()
+
+class ContractionHierarchy:
+    """Customizable contraction hierarchy over the nodes and edges of a CSRGraph.
+
+    Preprocessing depends only on the road network: nodes are ordered by
+    geometric nested dissection and eliminated in that order, adding shortcut
+    arcs between the remaining neighbours of each eliminated node. customize() then applies a weights
+    array in one bottom-up pass, batched by level with np.minimum.at, so it can
+    be re-run every ingestion cycle. Queries search upward from both ends.
+    """
+
+    def __init__(self, csr):
+        self.csr = csr
+        n = csr.num_nodes
+        self.eid_source = np.asarray(csr.edge_sources)
+        self.eid_target = np.asarray(csr.edge_targets)
+
+        self.rank, upward = self._eliminate(n)
+        self._build_arcs(n, upward)
+        self._build_triangles(n, upward)
+
+    def _dissection_order(self, n, leaf_size=32):
+        """Nested dissection order: both halves of a median split first, the separator last"""
+        sources, targets = self.eid_source, self.eid_target
+        coords = np.column_stack([self.csr.lat, self.csr.lng])
+        side = np.zeros(n, dtype=np.int8)
+        in_part = np.zeros(n, dtype=bool)
+        order = []
+
+        stack = [(np.arange(n), False)]
+        while stack:
+            nodes, emit = stack.pop()
+            if emit:
+                order.extend(nodes.tolist())
+                continue
+            if len(nodes) <= leaf_size:
+                order.extend(nodes.tolist())
+                continue
+
+            spread = coords[nodes].max(axis=0) - coords[nodes].min(axis=0)
+            axis = int(np.argmax(spread))
+            median = np.median(coords[nodes, axis])
+            left = coords[nodes, axis] <= median
+            if left.all() or not left.any():
+                order.extend(nodes.tolist())
+                continue
+
+            in_part[nodes] = True
+            side[nodes[left]] = 1
+            side[nodes[~left]] = 2
+            crossing = in_part[sources] & in_part[targets] & (side[sources] != side[targets])
+            ends = np.concatenate([sources[crossing], targets[crossing]])
+            separator = np.unique(ends[side[ends] == 1])
+            in_part[nodes] = False
+            side[nodes] = 0
+
+            is_separator = np.zeros(n, dtype=bool)
+            is_separator[separator] = True
+            # Popped last-in first-out: left half, right half, then the separator
+            stack.append((separator, True))
+            stack.append((nodes[~left], False))
+            stack.append((nodes[left & ~is_separator[nodes]], False))
+
+        return order
+
+    def _eliminate(self, n):
+        """Ranks from the dissection order and the upward neighbours its elimination produces"""
+        neighbours = [set() for _ in range(n)]
+        for u, v in zip(self.eid_source.tolist(), self.eid_target.tolist()):
+            if u != v:
+                neighbours[u].add(v)
+                neighbours[v].add(u)
+
+        rank = np.full(n, -1, dtype=np.int64)
+        upward = [None] * n
+        for next_rank, node in enumerate(self._dissection_order(n)):
+            rank[node] = next_rank
+            adjacent = neighbours[node]
+            upward[node] = adjacent
+            for other in adjacent:
+                other_neighbours = neighbours[other]
+                other_neighbours.discard(node)
+                other_neighbours.update(adjacent)
+                other_neighbours.discard(other)
+            neighbours[node] = set()
+
+        return rank, upward
+
+    def _build_arcs(self, n, upward):
+        counts = np.array([len(upward[node]) for node in range(n)], dtype=np.int64)
+        self.up_indptr = np.concatenate([[0], np.cumsum(counts)])
+        self.up_targets = np.array([target for node in range(n) for target in sorted(upward[node])],
+                                   dtype=np.int64)
+        self.num_arcs = len(self.up_targets)
+        self._up_indptr_list = self.up_indptr.tolist()
+        self._up_targets_list = self.up_targets.tolist()
+
+        # Arcs are sorted by (low, high), so low * n + high is a sorted key for searchsorted
+        arc_low = np.repeat(np.arange(n), counts)
+        self._arc_low_list = arc_low.tolist()
+        self._arc_keys = arc_low * n + self.up_targets
+
+        # Original edges seed the arc weights in one direction or the other
+        sources, targets = self.eid_source, self.eid_target
+        keep = sources != targets
+        self.edge_eids = np.nonzero(keep)[0]
+        low = np.where(self.rank[sources] < self.rank[targets], sources, targets)[keep]
+        high = np.where(self.rank[sources] < self.rank[targets], targets, sources)[keep]
+        self.edge_arcs = self.arc_ids(low, high)
+        self.edge_is_up = (sources[keep] == low)
+
+        # Elimination tree parent: the lowest ranked upward neighbour
+        parents = np.full(n, -1, dtype=np.int64)
+        for node in range(n):
+            if upward[node]:
+                parents[node] = min(upward[node], key=lambda other: self.rank[other])
+        self._parent_list = parents.tolist()
+
+        levels = np.zeros(n, dtype=np.int64)
+        for node in np.argsort(self.rank).tolist():
+            for target in upward[node]:
+                levels[target] = max(levels[target], levels[node] + 1)
+        self.levels = levels
+
+    def arc_ids(self, low, high):
+        return np.searchsorted(self._arc_keys, np.asarray(low) * self.csr.num_nodes + np.asarray(high))
+
+    def _build_triangles(self, n, upward):
+        """Lower triangles (middle, low, high) of every arc, grouped by the level of low"""
+        middles, lows, highs = [], [], []
+        for middle in range(n):
+            adjacent = sorted(upward[middle], key=lambda node: self.rank[node])
+            if len(adjacent) < 2:
+                continue
+            adjacent = np.array(adjacent, dtype=np.int64)
+            i, j = np.triu_indices(len(adjacent), 1)
+            middles.append(np.full(len(i), middle, dtype=np.int64))
+            lows.append(adjacent[i])
+            highs.append(adjacent[j])
+
+        if middles:
+            middles, lows, highs = np.concatenate(middles), np.concatenate(lows), np.concatenate(highs)
+        else:
+            middles = lows = highs = np.zeros(0, dtype=np.int64)
+
+        target = self.arc_ids(lows, highs)
+        to_low = self.arc_ids(middles, lows)
+        to_high = self.arc_ids(middles, highs)
+        self.num_triangles = len(target)
+
+        order = np.argsort(self.levels[lows], kind='stable')
+        level_of = self.levels[lows][order]
+        bounds = np.flatnonzero(np.diff(level_of)) + 1
+        self.triangle_batches = [
+            (target[batch], to_low[batch], to_high[batch], middles[batch])
+            for batch in np.split(order, bounds) if len(batch)
+        ]
+
+    def customize(self, weights):
+        """CCHMetric for an eid-indexed weights array"""
+        weights = np.asarray(weights, dtype=float)
+        up = np.full(self.num_arcs, np.inf)
+        down = np.full(self.num_arcs, np.inf)
+        up_eid = np.full(self.num_arcs, -1, dtype=np.int64)
+        down_eid = np.full(self.num_arcs, -1, dtype=np.int64)
+
+        for is_up, metric, metric_eid in ((True, up, up_eid), (False, down, down_eid)):
+            mask = self.edge_is_up == is_up
+            arcs, eids = self.edge_arcs[mask], self.edge_eids[mask]
+            np.minimum.at(metric, arcs, weights[eids])
+            best = weights[eids] == metric[arcs]
+            metric_eid[arcs[best]] = eids[best]
+
+        up_mid = np.full(self.num_arcs, -1, dtype=np.int64)
+        down_mid = np.full(self.num_arcs, -1, dtype=np.int64)
+        for target, to_low, to_high, middle in self.triangle_batches:
+            via_up = down[to_low] + up[to_high]
+            via_down = down[to_high] + up[to_low]
+            np.minimum.at(up, target, via_up)
+            np.minimum.at(down, target, via_down)
+            # All lower triangles of an arc share its low node, so its weight is final here
+            hit = np.isfinite(via_up) & (via_up == up[target])
+            up_mid[target[hit]] = middle[hit]
+            hit = np.isfinite(via_down) & (via_down == down[target])
+            down_mid[target[hit]] = middle[hit]
+
+        return CCHMetric(up, down, up_mid, down_mid, up_eid, down_eid)
+
+    def _ancestors(self, node):
+        """Elimination tree path from node to the root, which is its whole upward search space"""
+        parents = self._parent_list
+        chain = []
+        while node >= 0:
+            chain.append(node)
+            node = parents[node]
+        return chain
+
+    def _upward_search(self, source, arc_weights):
+        """Distances from source over upward arcs, scanning its ancestors in rank order"""
+        indptr, targets = self._up_indptr_list, self._up_targets_list
+        inf = float('inf')
+        dist = {source: 0.0}
+        pred = {source: None}
+        for u in self._ancestors(source):
+            d = dist.get(u)
+            if d is None:
+                continue
+            for arc in range(indptr[u], indptr[u + 1]):
+                v = targets[arc]
+                nd = d + arc_weights[arc]
+                if nd < dist.get(v, inf):
+                    dist[v] = nd
+                    pred[v] = (u, arc)
+        return dist, pred
+
+    def _search_spaces(self, source, target, metric):
+        forward = self._upward_search(source, metric.up_list)
+        backward = self._upward_search(target, metric.down_list)
+        return forward, backward
+
+    def _unpack(self, arc, is_up, metric, eids):
+        """Append the original edges of an arc, travelled up or down, to eids"""
+        stack = [(arc, is_up)]
+        while stack:
+            arc, is_up = stack.pop()
+            mid = metric.up_mid[arc] if is_up else metric.down_mid[arc]
+            if mid < 0:
+                eids.append(int(metric.up_eid[arc] if is_up else metric.down_eid[arc]))
+                continue
+            low = self._arc_low_list[arc]
+            high = self._up_targets_list[arc]
+            to_low, to_high = (int(arc_id) for arc_id in self.arc_ids([mid, mid], [low, high]))
+            if is_up:
+                # low -> mid -> high, pushed in reverse so low -> mid comes out first
+                stack.append((to_high, True))
+                stack.append((to_low, False))
+            else:
+                stack.append((to_low, True))
+                stack.append((to_high, False))
+
+    def _path_via(self, meet, forward_pred, backward_pred, metric):
+        eids = []
+        up_arcs = []
+        node = meet
+        while forward_pred[node] is not None:
+            node, arc = forward_pred[node]
+            up_arcs.append(arc)
+        for arc in reversed(up_arcs):
+            self._unpack(arc, True, metric, eids)
+        node = meet
+        while backward_pred[node] is not None:
+            node, arc = backward_pred[node]
+            self._unpack(arc, False, metric, eids)
+        return eids
+
+    def _nodes_of(self, source, eids):
+        return [source] + self.eid_target[eids].tolist()
+
+    def shortest_path(self, source, target, metric):
+        """Shortest path between node indexes as (cost, nodes, eids), or None if unreachable"""
+        if source == target:
+            return 0.0, [source], []
+        (forward_dist, forward_pred), (backward_dist, backward_pred) = self._search_spaces(source, target, metric)
+        best, meet = self._best_meeting(forward_dist, backward_dist)
+        if meet is None:
+            return None
+        eids = self._path_via(meet, forward_pred, backward_pred, metric)
+        return best, self._nodes_of(source, eids), eids
+
+    def _best_meeting(self, forward_dist, backward_dist):
+        best, meet = float('inf'), None
+        for node, distance in forward_dist.items():
+            other = backward_dist.get(node)
+            if other is not None and distance + other < best:
+                best, meet = distance + other, node
+        return best, meet
+
+    def alternative_paths(self, source, target, metric, k=3, max_overlap=0.7, max_stretch=1.5,
+                          max_candidates=50, **_):
+        """Up to k via-node alternatives from one pair of upward searches.
+
+        Every node settled by both searches is a candidate via node. Candidates
+        are tried cheapest first, keeping simple paths within max_stretch of the
+        best and with route_overlap at most max_overlap against kept routes.
+        Returns the same dicts as CSRGraph.alternative_paths.
+        """
+        (forward_dist, forward_pred), (backward_dist, backward_pred) = self._search_spaces(source, target, metric)
+        candidates = sorted(
+            (distance + backward_dist[node], node)
+            for node, distance in forward_dist.items()
+            if node in backward_dist and np.isfinite(distance + backward_dist[node])
+        )
+        if not candidates:
+            return []
+
+        best_cost = candidates[0][0]
+        routes = []
+        for cost, node in candidates[:max_candidates]:
+            if cost > max_stretch * best_cost:
+                break
+            eids = self._path_via(node, forward_pred, backward_pred, metric)
+            nodes = self._nodes_of(source, eids)
+            if len(set(nodes)) != len(nodes):
+                continue
+            if any(route_overlap(self.csr.lengths, eids, route['eids']) > max_overlap for route in routes):
+                continue
+            routes.append({'nodes': self.csr.node_ids[nodes].tolist(), 'eids': eids, 'cost': float(cost)})
+            if len(routes) >= k:
+                break
+        return routes
+
+ROUTE_BASE_SPEED_KMH = 35
+
+def travel_minutes(weights):
+    """Travel time in minutes for route weights, at the base speed slowed by congestion"""
+    return np.asarray(weights, dtype=float) / 1000 / ROUTE_BASE_SPEED_KMH * 60
+
+PROFILE_SLOT_MINUTES = 15
+PROFILE_SLOTS_PER_DAY = 24 * 60 // PROFILE_SLOT_MINUTES
+PROFILE_SLOTS_PER_WEEK = 7 * PROFILE_SLOTS_PER_DAY
+
+def week_seconds(when, tz):
+    """Seconds since Monday 00:00 local time; naive timestamps are UTC, as pymongo returns them"""
+    if when.tzinfo is None:
+        when = pytz.utc.localize(when)
+    local = when.astimezone(tz)
+    return local.weekday() * 86400 + local.hour * 3600 + local.minute * 60 + local.second + local.microsecond / 1e6
+
+def profile_slot(when, tz):
+    """Weekday and 15-minute slot of a timestamp, numbered from Monday 00:00"""
+    return int(week_seconds(when, tz) // (PROFILE_SLOT_MINUTES * 60))
+
+def speed_profile_pipeline(since, tz):
+    """Aggregation summing measured speeds since a time per road, weekday and 15-minute slot"""
+    def local(operator):
+        return {operator: {'date': '$timestamp', 'timezone': tz.zone}}
+
+    return [
+        # Backfilled rows repeat the speed seen at backfill time, not a measurement of their hour
+        {'$match': {'timestamp': {'$gte': since}, 'backfilled': {'$ne': True}, 'currentSpeed': {'$gt': 0}}},
+        {'$group': {
+            '_id': {
+                'lat': '$coordinates.lat',
+                'lng': '$coordinates.lng',
+                'day': local('$dayOfWeek'),
+                'hour': local('$hour'),
+                'quarter': {'$floor': {'$divide': [local('$minute'), PROFILE_SLOT_MINUTES]}}
+            },
+            'samples': {'$sum': 1},
+            'speedSum': {'$sum': '$currentSpeed'},
+            'freeFlowSum': {'$sum': {'$cond': [{'$gt': ['$freeFlowSpeed', 0]}, '$freeFlowSpeed', '$currentSpeed']}}
+        }}
+    ]
+
+class SpeedProfiles:
+    """Typical speed of each road for every weekday and 15-minute slot.
+
+    speeds is a float32 (roads, PROFILE_SLOTS_PER_WEEK) array in km/h, with
+    slots that have no samples interpolated around the week from their
+    neighbours. Roads are identified by their sensor coordinates, as in
+    EdgeSensorIndex.
+    """
+
+    MIN_SPEED_KMH = 1.0
+
+    def __init__(self, road_coords, speeds, free_flow, samples, tz):
+        self.road_coords = [tuple(coords) for coords in road_coords]
+        self.speeds = np.asarray(speeds, dtype=np.float32)
+        self.free_flow = np.asarray(free_flow, dtype=np.float32)
+        self.samples = samples
+        self.tz = tz
+        self.built_at = datetime.now(pytz.utc)
+
+    @classmethod
+    def from_records(cls, records, tz):
+        """Build profiles from historical_traffic_data documents"""
+        road_index = {}
+        rows, slots, speeds, free_flow = [], [], [], []
+        for record in records:
+            speed = record.get('currentSpeed') or 0
+            if speed <= 0 or not record.get('timestamp'):
+                continue
+            coords = (record['coordinates']['lat'], record['coordinates']['lng'])
+            rows.append(road_index.setdefault(coords, len(road_index)))
+            slots.append(profile_slot(record['timestamp'], tz))
+            speeds.append(speed)
+            free_flow.append(record.get('freeFlowSpeed') or speed)
+
+        return cls._from_slot_sums(list(road_index), rows, slots, speeds, np.ones(len(speeds)), free_flow, tz)
+
+    @classmethod
+    def from_slot_totals(cls, totals, tz):
+        """Build profiles from speed_profile_pipeline() groups, one per road and slot"""
+        road_index = {}
+        rows, slots, speed_sums, counts, free_flow_sums = [], [], [], [], []
+        for total in totals:
+            key = total['_id']
+            if key.get('lat') is None or key.get('lng') is None:
+                continue
+            rows.append(road_index.setdefault((key['lat'], key['lng']), len(road_index)))
+            # $dayOfWeek counts from Sunday = 1; slots count from Monday
+            weekday = (key['day'] + 5) % 7
+            slots.append((weekday * 24 + key['hour']) * (60 // PROFILE_SLOT_MINUTES) + int(key['quarter']))
+            speed_sums.append(total['speedSum'])
+            counts.append(total['samples'])
+            free_flow_sums.append(total['freeFlowSum'])
+
+        return cls._from_slot_sums(list(road_index), rows, slots, speed_sums, counts, free_flow_sums, tz)
+
+    @classmethod
+    def _from_slot_sums(cls, road_coords, rows, slots, speed_sums, counts, free_flow_sums, tz):
+        shape = (len(road_coords), PROFILE_SLOTS_PER_WEEK)
+        sums = np.zeros(shape)
+        slot_counts = np.zeros(shape)
+        np.add.at(sums, (rows, slots), speed_sums)
+        np.add.at(slot_counts, (rows, slots), counts)
+        free_flow = np.bincount(rows, weights=free_flow_sums, minlength=len(road_coords))
+        road_samples = slot_counts.sum(axis=1)
+
+        profile = np.empty(shape, dtype=np.float32)
+        positions = np.arange(PROFILE_SLOTS_PER_WEEK)
+        for row in range(len(road_coords)):
+            observed = slot_counts[row] > 0
+            profile[row] = np.interp(positions, positions[observed],
+                                     sums[row, observed] / slot_counts[row, observed],
+                                     period=PROFILE_SLOTS_PER_WEEK)
+
+        return cls(
+            road_coords,
+            np.maximum(profile, cls.MIN_SPEED_KMH),
+            free_flow / np.maximum(road_samples, 1),
+            int(road_samples.sum()),
+            tz
+        )
+
+    def stats(self):
+        return {
+            'roads': len(self.road_coords),
+            'samples': self.samples,
+            'builtAt': self.built_at.isoformat()
+        }
+
+class TimeDependentRouter:
+    """Earliest-arrival routing with edge speeds that follow SpeedProfiles.
+
+    Edges take the profile of their nearest sensor and the base speed
+    otherwise. Speeds are constant within a 15-minute slot and an edge that
+    crosses a slot boundary is driven at each slot's speed in turn, so leaving
+    later never arrives earlier and a label-setting search stays exact.
+    """
+
+    def __init__(self, csr, edge_sensor_index, profiles, default_speed_kmh=ROUTE_BASE_SPEED_KMH, cached_slots=16):
+        self.csr = csr
+        self.profiles = profiles
+        self.edge_sensors = edge_sensor_index.nearest_sensors(profiles.road_coords)
+        default_row = np.full((1, PROFILE_SLOTS_PER_WEEK), default_speed_kmh, dtype=np.float32)
+        # Metres per second; sensor -1 (no nearby sensor) picks the default last row
+        self.speed_table = np.vstack([profiles.speeds, default_row]) / 3.6
+        self.max_speed = float(self.speed_table.max())
+        self._slot_rows = self.edge_sensors[csr.eids]
+        self._slot_lengths = np.asarray(csr.lengths, dtype=float)[csr.eids].tolist()
+        self._cached_slots = cached_slots
+        self._slot_speeds = OrderedDict()
+        self._lock = threading.Lock()
+
+    def slot_speeds(self, slot):
+        """Speed of every adjacency slot in one 15-minute slot of the week, as a list"""
+        with self._lock:
+            speeds = self._slot_speeds.get(slot)
+            if speeds is not None:
+                self._slot_speeds.move_to_end(slot)
+                return speeds
+        speeds = self.speed_table[self._slot_rows, slot].tolist()
+        with self._lock:
+            self._slot_speeds[slot] = speeds
+            while len(self._slot_speeds) > self._cached_slots:
+                self._slot_speeds.popitem(last=False)
+        return speeds
+
+    def earliest_arrival(self, source, target, departure):
+        """Quickest trip leaving source at an aware departure time.
+
+        Returns (seconds, nodes, eids, entry_seconds), where entry_seconds is
+        when each edge is entered, or None when target is unreachable.
+        """
+        (indptr, node_targets), _ = self.csr.adjacency()
+        slot_seconds = PROFILE_SLOT_MINUTES * 60
+        start = week_seconds(departure, self.profiles.tz)
+        bounds = (self.csr.distances_to(target, 0.99) / self.max_speed).tolist()
+        slot_lengths = self._slot_lengths
+        speeds_by_period = {}
+
+        arrival = {source: start}
+        parent = {source: (None, None)}
+        heap = [(bounds[source], start, source)]
+        while heap:
+            _, t, u = heapq.heappop(heap)
+            if u == target:
+                break
+            if t > arrival[u]:
+                continue
+            for slot in range(indptr[u], indptr[u + 1]):
+                remaining, at = slot_lengths[slot], t
+                while True:
+                    period = int(at // slot_seconds)
+                    speeds = speeds_by_period.get(period)
+                    if speeds is None:
+                        speeds = speeds_by_period[period] = self.slot_speeds(period % PROFILE_SLOTS_PER_WEEK)
+                    period_end = (period + 1) * slot_seconds
+                    if at + remaining / speeds[slot] <= period_end:
+                        at += remaining / speeds[slot]
+                        break
+                    remaining -= speeds[slot] * (period_end - at)
+                    at = period_end
+                v = node_targets[slot]
+                if at < arrival.get(v, float('inf')):
+                    arrival[v] = at
+                    parent[v] = (u, slot)
+                    heapq.heappush(heap, (at + bounds[v], at, v))
+        else:
+            return None
+
+        nodes, slots = [target], []
+        while parent[nodes[-1]][0] is not None:
+            u, slot = parent[nodes[-1]]
+            nodes.append(u)
+            slots.append(slot)
+        nodes.reverse()
+        slots.reverse()
+        eids = [int(self.csr.eids[slot]) for slot in slots]
+        entry_seconds = [arrival[u] - start for u in nodes[:-1]]
+        return arrival[target] - start, nodes, eids, entry_seconds
+
 def create_app(db_client=None):
     app = Flask(__name__)
     app.config['SESSION_COOKIE_SAMESITE'] = "None"
@@ -63,6 +2058,9 @@ def create_app(db_client=None):
     client = db_client or MongoClient(os.getenv("MONGODB_URI"))
     app.secret_key = os.getenv('SECRET_KEY', 'fyp_key')
     tomtom_api_key = os.getenv('TOMTOM_API_KEY')
+    tomtom_max_workers = int(os.getenv('TOMTOM_MAX_WORKERS', 16))
+    tomtom_request_timeout = float(os.getenv('TOMTOM_REQUEST_TIMEOUT', 10))
+    tomtom_session = create_tomtom_session(tomtom_max_workers)
 
     db = client['traffic-users']
     users_collection = db['users']
@@ -75,14 +2073,83 @@ def create_app(db_client=None):
     # Add collection for historical traffic data
     historical_traffic_data = client['traffic-data']['historical_traffic_data']
 
+    HISTORICAL_STORAGE_MODE = os.getenv('HISTORICAL_STORAGE_MODE', 'indexed')
+
     traffic_logs = client['traffic-data']['traffic_logs']
 
+    # Versions of the ingested data sets, used for snapshot invalidation and HTTP validators
+    traffic_meta = client['traffic-data']['traffic_meta']
+
+    # Live updates are pushed to /api/traffic/stream subscribers
+    traffic_events = EventBroker(capacity=int(os.getenv('STREAM_BUFFER_SIZE', 1000)))
+
+    # Dashboards read per road/day traffic stats and per-day ingestion counts from
+    # rollups kept up to date as data arrives, instead of rescanning raw collections
+    def rollup_collection(kind):
+        """The live rollup collection of a kind, or None until the rollups are first built"""
+        state = traffic_meta.find_one({'_id': 'rollups'}, {'collections': 1}) or {}
+        name = (state.get('collections') or {}).get(kind)
+        return client['traffic-data'][name] if name else None
+
+    def update_rollups(kind, documents, make_updates):
+        try:
+            state = traffic_meta.find_one({'_id': 'rollups'}, {'collections': 1, 'rebuild': 1})
+            for name, targeted in rollup_targets(state, kind, documents):
+                updates = make_updates(targeted)
+                if updates:
+                    client['traffic-data'][name].bulk_write(updates, ordered=False)
+        except Exception as e:
+            print(f"[ROLLUPS] Failed to update {kind} rollups: {e}")
+
+    def update_traffic_rollups(records):
+        update_rollups('traffic', records, traffic_rollup_updates)
+
+    def update_ingestion_rollups(log_entries):
+        update_rollups('ingestion', log_entries, lambda entries: ingestion_rollup_updates(entries, SGT))
+
+    def on_traffic_logs_flushed(batch):
+        # Counted once the logs are stored, so rollups never run ahead of traffic_logs
+        update_ingestion_rollups(batch)
+        bump_data_version(traffic_meta, 'traffic_logs')
+        traffic_events.publish('logs', [format_traffic_log(log) for log in batch])
+
+    # Traffic logs are written in batches off the ingestion hot path
+    traffic_log_sink = BufferedLogSink(
+        traffic_logs,
+        batch_size=int(os.getenv('TRAFFIC_LOG_BATCH_SIZE', 200)),
+        flush_interval=float(os.getenv('TRAFFIC_LOG_FLUSH_SECONDS', 2)),
+        max_buffer=int(os.getenv('TRAFFIC_LOG_MAX_BUFFER', 10000)),
+        policy=os.getenv('TRAFFIC_LOG_POLICY', 'drop'),
+        on_flush=on_traffic_logs_flushed
+    )
+    app.traffic_log_sink = traffic_log_sink
+
+    def log_traffic_activity(status, road_name, current_time, additional_info=None):
+        
+        log_entry = {
+            "timestamp": current_time,
+            "roadName": road_name,
+            "status": status,
+            "message": f"{status.upper()} for {road_name}",
+        }
+        if additional_info:
+            log_entry.update(additional_info)
+        if not traffic_log_sink.write(log_entry):
+            print(f"[LOGGING ERROR] Log buffer full, dropped activity for {road_name}")
+
         # Add timezone configuration
     SGT = pytz.timezone('Asia/Singapore')
     
     def get_sgt_time():
         return datetime.now(pytz.utc).astimezone(SGT)
 
+    # Shared pacing and quota ledger for every TomTom call
+    tomtom_rate_limiter = TomTomRateLimiter(
+        max_per_second=float(os.getenv('TOMTOM_MAX_QPS', 5)),
+        daily_quota=int(os.getenv('TOMTOM_DAILY_QUOTA', 2500)),
+        today=lambda: get_sgt_time().date()
+    )
+
     # Read roads from file and initialize SINGAPORE_ROADS
     SINGAPORE_ROADS = []
     try:
@@ -106,18 +2173,303 @@ def create_app(db_client=None):
     # Add new collection for traffic incidents
     traffic_incidents = client['traffic-data']['traffic_incidents']
 
+    # Readers share an in-memory copy of current traffic, rebuilt after each ingestion
+    traffic_snapshots = TrafficSnapshotCache(
+        current_traffic_data,
+        traffic_meta,
+        poll_interval=float(os.getenv('TRAFFIC_SNAPSHOT_POLL_SECONDS', 5))
+    )
+
+    # Routing weights are derived from the snapshot once per version and swapped in whole
+    app.routing_weights = None
+    app.routing_cch = None
+    routing_weights_lock = threading.Lock()
+
+    # Routes are cached per snapped node pair until the weights they were computed with change
+    route_cache = RouteCache(
+        capacity=int(os.getenv('ROUTE_CACHE_SIZE', 1000)),
+        ttl=float(os.getenv('ROUTE_CACHE_TTL_SECONDS', 300))
+    )
+
+    def compute_routing_weights(snapshot):
+        """Edge weights for the routing graph under the traffic in a snapshot"""
+        traffic_map = {}
+        for data in snapshot.records:
+            coords = (data['coordinates']['lat'], data['coordinates']['lng'])
+            traffic_map[coords] = data
+
+        factors = congestion_factors(
+            [traffic.get('currentSpeed', 0) for traffic in traffic_map.values()],
+            [traffic.get('freeFlowSpeed', 0) for traffic in traffic_map.values()]
+        )
+        weights = app.edge_sensor_index.weights(list(traffic_map), factors)
+        cch_metric = app.routing_cch.customize(weights) if app.routing_cch is not None else None
+        return RoutingWeights(snapshot.version, weights, cch_metric)
+
+    def get_routing_weights():
+        """Routing weights for the current traffic snapshot, computed at most once per version"""
+        snapshot = traffic_snapshots.get()
+        routing_weights = app.routing_weights
+        if routing_weights is not None and routing_weights.version == snapshot.version:
+            return routing_weights
+
+        with routing_weights_lock:
+            routing_weights = app.routing_weights
+            if routing_weights is None or routing_weights.version != snapshot.version:
+                try:
+                    routing_weights = compute_routing_weights(snapshot)
+                    app.routing_weights = routing_weights
+                    route_cache.clear()
+                    print(f"[ROUTING] Edge weights updated for traffic version {snapshot.version}")
+                except Exception as e:
+                    print(f"Error updating edge weights: {e}")
+                    if routing_weights is None:
+                        lengths = app.edge_sensor_index.lengths
+                        cch_metric = app.routing_cch.customize(lengths) if app.routing_cch is not None else None
+                        routing_weights = RoutingWeights(None, lengths, cch_metric)
+            return routing_weights
+
+    def traffic_data_version():
+        snapshot = traffic_snapshots.get()
+        return snapshot.version, snapshot.updated_at
+
+    def traffic_logs_version():
+        return read_data_version(traffic_meta, 'traffic_logs')
+
+    def conditional_get(*version_sources):
+        """Answer polls with 304 Not Modified while the data behind a view is unchanged.
+
+        With version sources the validator is derived from the ingestion versions
+        and the query string, so unchanged polls skip the view entirely. Without
+        them the ETag is a hash of the rendered body.
+        """
+        def decorator(view):
+            @wraps(view)
+            def wrapped(*args, **kwargs):
+                if not version_sources:
+                    response = make_response(view(*args, **kwargs))
+                    if response.status_code == 200:
+                        response.add_etag(weak=True)
+                        response.cache_control.no_cache = True
+                        response.make_conditional(request)
+                    return response
+
+                versions = [source() for source in version_sources]
+                validator = f"{view.__name__}:{[version for version, _ in versions]}:{request.query_string.decode()}"
+                etag = hashlib.sha1(validator.encode()).hexdigest()[:20]
+                modified_times = [updated_at for _, updated_at in versions if updated_at]
+                last_modified = max(modified_times) if modified_times else None
+
+                probe = make_response('')
+                probe.set_etag(etag, weak=True)
+                probe.last_modified = last_modified
+                probe.cache_control.no_cache = True
+                probe.make_conditional(request)
+                if probe.status_code == 304:
+                    return probe
+
+                response = make_response(view(*args, **kwargs))
+                if response.status_code == 200:
+                    response.set_etag(etag, weak=True)
+                    response.last_modified = last_modified
+                    response.cache_control.no_cache = True
+                return response
+            return wrapped
+        return decorator
+
+    COMPRESS_MIN_BYTES = int(os.getenv('COMPRESS_MIN_BYTES', 1024))
+
+    @app.after_request
+    def compress_json_response(response):
+        if (response.status_code != 200 or response.direct_passthrough or response.is_streamed
+                or response.mimetype != 'application/json' or 'Content-Encoding' in response.headers):
+            return response
+
+        response.vary.add('Accept-Encoding')
+        body, encoding = compress_body(response.get_data(), request.accept_encodings, COMPRESS_MIN_BYTES)
+        if encoding:
+            response.set_data(body)
+            response.headers['Content-Encoding'] = encoding
+        return response
+
+    def migrate_historical_timestamps(batch_size=1000):
+        """Derive a datetime timestamp for historical records that only carry date and time strings"""
+        migrated_count = 0
+        batch = []
+        cursor = historical_traffic_data.find(
+            {'timestamp': {'$not': {'$type': 'date'}}},
+            {'_id': 1, 'date': 1, 'time': 1}
+        )
+        for record in cursor:
+            try:
+                timestamp = SGT.localize(datetime.strptime(f"{record['date']} {record['time']}", '%d-%m-%Y %H:%M'))
+            except (KeyError, ValueError, TypeError):
+                print(f"[MIGRATION WARNING] Cannot derive timestamp for record {record['_id']}")
+                continue
+
+            batch.append(UpdateOne({'_id': record['_id']}, {'$set': {'timestamp': timestamp}}))
+            if len(batch) >= batch_size:
+                migrated_count += historical_traffic_data.bulk_write(batch, ordered=False).modified_count
+                batch = []
+
+        if batch:
+            migrated_count += historical_traffic_data.bulk_write(batch, ordered=False).modified_count
+
+        if migrated_count:
+            print(f"[MIGRATION] Added timestamps to {migrated_count} historical records")
+        return migrated_count
+
+    def setup_historical_storage():
+        """Prepare historical_traffic_data so every query can filter on timestamp ranges"""
+        traffic_db = client['traffic-data']
+
+        def is_timeseries_collection():
+            collection_info = next(iter(traffic_db.list_collections(filter={'name': 'historical_traffic_data'})), None)
+            return bool(collection_info and collection_info.get('type') == 'timeseries')
+
+        if HISTORICAL_STORAGE_MODE == 'timeseries':
+            if 'historical_traffic_data' not in traffic_db.list_collection_names():
+                traffic_db.create_collection(
+                    'historical_traffic_data',
+                    timeseries={'timeField': 'timestamp', 'metaField': 'road_id', 'granularity': 'hours'}
+                )
+                print("[HISTORICAL] Created time-series collection for historical traffic data")
+            elif not is_timeseries_collection():
+                print("[HISTORICAL WARNING] historical_traffic_data already exists as a regular collection; "
+                      "time-series mode only applies to a new collection")
+
+        if is_timeseries_collection():
+            return {('traffic-data', 'historical_traffic_data')}
+
+        # Records must all have a timestamp before the unique (road_id, timestamp) index is built
+        migrate_historical_timestamps()
+        return set()
+
+    try:
+        timeseries_collections = setup_historical_storage()
+    except Exception as e:
+        print(f"[HISTORICAL WARNING] Could not prepare historical storage: {e}")
+        timeseries_collections = set()
+
+    created_indexes = ensure_indexes(client, REQUIRED_INDEXES, timeseries_collections)
+    for collection_name, result in created_indexes.items():
+        if result['created']:
+            print(f"[INDEX] Created {', '.join(result['created'])} on {collection_name}")
+
+    @app.cli.command('migrate-historical')
+    def migrate_historical_command():
+        """Backfill timestamps on historical records and create their indexes"""
+        ensure_indexes(client, REQUIRED_INDEXES, setup_historical_storage())
+        print("[MIGRATION] Historical traffic data is using timestamp-based storage")
+
+    ROLLUP_REBUILD_LOCK_SECONDS = int(os.getenv('ROLLUP_REBUILD_LOCK_SECONDS', 600))
+    ROLLUP_REBUILD_SETTLE_SECONDS = float(os.getenv('ROLLUP_REBUILD_SETTLE_SECONDS', 5))
+
+    def rebuild_all_rollups(batch_size=1000):
+        """Regenerate the traffic and ingestion rollups from raw data"""
+        counts = rebuild_rollups(
+            client['traffic-data'],
+            traffic_meta,
+            {
+                'traffic': (
+                    historical_traffic_data,
+                    {'_id': 1, 'road_id': 1, 'streetName': 1, 'date': 1, 'time': 1,
+                     'currentSpeed': 1, 'freeFlowSpeed': 1, 'intensity': 1},
+                    traffic_rollup_updates
+                ),
+                'ingestion': (
+                    traffic_logs,
+                    {'_id': 1, 'date': 1, 'timestamp': 1, 'status': 1},
+                    lambda log_entries: ingestion_rollup_updates(log_entries, SGT)
+                )
+            },
+            batch_size=batch_size,
+            lock_seconds=ROLLUP_REBUILD_LOCK_SECONDS,
+            settle_seconds=ROLLUP_REBUILD_SETTLE_SECONDS
+        )
+        if counts is not None:
+            print(f"[ROLLUPS] Rebuilt from {counts['traffic']} traffic records and {counts['ingestion']} traffic logs")
+        return counts
+
+    @app.cli.command('rebuild-rollups')
+    def rebuild_rollups_command():
+        """Regenerate the dashboard rollups from historical traffic data and traffic logs"""
+        rebuild_all_rollups()
+
+    def rebuild_rollups_in_background():
+        try:
+            rebuild_all_rollups()
+        except Exception as e:
+            print(f"[ROLLUPS] Rebuild failed: {e}")
+
+    # Until the first build dashboards keep reading raw data. Workers starting together
+    # all try, and the rebuild lock lets only one of them run it.
+    if (os.getenv('ROLLUP_AUTO_REBUILD', 'true' if db_client is None else 'false').lower() == 'true'
+            and rollup_collection('traffic') is None):
+        threading.Thread(target=rebuild_rollups_in_background, daemon=True, name='rollup-rebuild').start()
+
+    @app.route('/api/admin/indexes', methods=['GET', 'POST'])
+    def manage_indexes():
+        try:
+            if 'username' not in session:
+                return jsonify({'message': 'Unauthorized - Please log in'}), 401
+
+            created = None
+            if request.method == 'POST':
+                created = ensure_indexes(client, REQUIRED_INDEXES, timeseries_collections)
+
+            return jsonify({
+                'collections': index_report(client, REQUIRED_INDEXES, timeseries_collections),
+                'created': created
+            }), 200
+
+        except Exception as e:
+            print(f"Error checking indexes: {str(e)}")
+            return jsonify({'message': f'Error checking indexes: {str(e)}'}), 500
+
+    def get_incident_counts(road_ids, time_range=None):
+        """Get accident and congestion counts for many roads with one grouped aggregation"""
+        query = {'road_id': {'$in': list(road_ids)}}
+        
+        if time_range:
+            query['start_time'] = time_range
+        
+        pipeline = [
+            {'$match': query},
+            {'$group': {
+                '_id': {'road_id': '$road_id', 'type': '$type'},
+                'count': {'$sum': 1}
+            }}
+        ]
+        
+        counts = {road_id: {'ACCIDENT': 0, 'CONGESTION': 0} for road_id in road_ids}
+        
+        results = traffic_incidents.aggregate(pipeline)
+        for result in results:
+            counts[result['_id']['road_id']][result['_id']['type']] = result['count']
+        
+        return counts
+
+    def with_incident_counts(snapshot, records):
+        """Copies of snapshot records carrying their accident and congestion counts"""
+        # Ingestion stores incidents before publishing the snapshot that follows them,
+        # so counts are stable per snapshot
+        incident_counts = snapshot.memo(
+            'incident_counts',
+            lambda: get_incident_counts({data['road_id'] for data in snapshot.records})
+        )
+        results = []
+        for record in records:
+            counts = incident_counts[record['road_id']]
+            results.append(dict(record, accidentCount=counts['ACCIDENT'], congestionCount=counts['CONGESTION']))
+        return results
+
     def fetch_current_traffic():
         """Fetch current traffic data for all roads"""
         try:
-            print(f"[DEBUG] Using TomTom API Key: {tomtom_api_key}")
-            
-            # First, verify the API key is valid
-            test_url = f"https://api.tomtom.com/traffic/services/4/flowSegmentData/absolute/10/json?point=1.3521,103.8198&key={tomtom_api_key}"
-            test_response = requests.get(test_url)
-            
-            if (test_response.status_code == 403):
-                print(f"[API ERROR] Invalid or expired API key. Status: {test_response.status_code}")
-                print(f"[API ERROR] Response: {test_response.text}")
+            # The rate limiter remembers quota and key errors from earlier calls
+            if check_api_quota():
+                print(f"[API ERROR] TomTom calls are blocked: {tomtom_rate_limiter.stats()['lastError']}")
                 return False
             
             bulk_updates = []
@@ -135,13 +2487,21 @@ def create_app(db_client=None):
             api_success_count = 0
             api_failed_count = 0
             
-            for road in SINGAPORE_ROADS:
+            print(f"[API DEBUG] Requesting data for {expected_road_count} roads with up to {tomtom_max_workers} workers")
+            flow_results = fetch_flow_segments(
+                tomtom_session,
+                SINGAPORE_ROADS,
+                tomtom_api_key,
+                max_workers=tomtom_max_workers,
+                timeout=tomtom_request_timeout,
+                rate_limiter=tomtom_rate_limiter
+            )
+
+            for road_index, (road, flow_response, fetch_error) in enumerate(flow_results):
                 try:
-                    tomtom_url = f"https://api.tomtom.com/traffic/services/4/flowSegmentData/absolute/10/json?point={road['lat']},{road['lng']}&key={tomtom_api_key}"
-                    
-                    print(f"[API DEBUG] Requesting data for {road['name']}")
-                    flow_response = requests.get(tomtom_url)
-                    
+                    if fetch_error:
+                        raise fetch_error
+
                     if flow_response.status_code == 200:
                         api_success_count += 1
                         print(f"[API SUCCESS] {road['name']} - Status: {flow_response.status_code}")
@@ -159,7 +2519,7 @@ def create_app(db_client=None):
                         else:
                             intensity = 'high'
                         
-                        road_id = f"road_{SINGAPORE_ROADS.index(road) + 1}"
+                        road_id = f"road_{road_index + 1}"
                         
                         update_data = {
                             'streetName': road['name'],
@@ -218,7 +2578,7 @@ def create_app(db_client=None):
                                 },
                                 'date': current_time.strftime('%d-%m-%Y'),
                                 'time': current_time.strftime('%H:%M'),
-                                'timestamp': current_time,
+                                'timestamp': floor_to_hour(current_time),
                                 'currentSpeed': current_speed,
                                 'freeFlowSpeed': free_flow_speed,
                                 'intensity': intensity
@@ -250,15 +2610,47 @@ def create_app(db_client=None):
             if is_hourly:
                 if bulk_historical:
                     try:
-                        result = historical_traffic_data.insert_many(bulk_historical)
-                        print(f"[HISTORICAL] Inserted {len(result.inserted_ids)} records at hourly checkpoint")
+                        # Unordered so a row a backfill already stored only fails on the unique index
+                        failed_indexes = set()
+                        try:
+                            inserted_count = len(historical_traffic_data.insert_many(bulk_historical, ordered=False).inserted_ids)
+                        except BulkWriteError as e:
+                            inserted_count = e.details.get('nInserted', 0)
+                            failed_indexes = {error.get('index') for error in e.details.get('writeErrors', [])}
+                            print(f"[HISTORICAL] Skipped {len(failed_indexes)} records already stored for this hour")
+                        print(f"[HISTORICAL] Inserted {inserted_count} records at hourly checkpoint")
                         
                         if bulk_incidents:
                             traffic_incidents.insert_many(bulk_incidents)
                             print(f"[INCIDENTS] Recorded {len(bulk_incidents)} congestion incidents")
+
+                        if inserted_count:
+                            update_traffic_rollups([
+                                record for index, record in enumerate(bulk_historical) if index not in failed_indexes
+                            ])
+                            bump_data_version(traffic_meta, 'historical_traffic')
                             
                     except Exception as e:
                         print(f"[HISTORICAL ERROR] Failed to insert historical data: {e}")
+
+            # Publish only after this cycle's incidents are stored, so counts memoized
+            # against the new snapshot already include them
+            if bulk_updates:
+                previous_snapshot = traffic_snapshots.snapshot
+                snapshot = traffic_snapshots.publish()
+                changed_roads, removed_roads = diff_traffic_records(
+                    previous_snapshot.records if previous_snapshot else (), snapshot.records)
+                # Changed roads carry the same fields as /api/traffic/data, so clients merge them in place
+                traffic_events.publish('traffic', {
+                    'version': snapshot.version,
+                    'roads': with_incident_counts(snapshot, changed_roads),
+                    'removed': removed_roads
+                })
+                if getattr(app, 'edge_sensor_index', None) is not None:
+                    get_routing_weights()
+
+            # Hand this cycle's logs to the writer thread without waiting for Mongo
+            traffic_log_sink.request_flush()
                 
             return True
             
@@ -269,91 +2661,112 @@ def create_app(db_client=None):
             print(f"[CRITICAL ERROR] Error in fetch_current_traffic: {e}")
             return False
 
-    def fetch_historical_traffic():
-        """Fetch and store historical traffic data with incident tracking"""
+    def fetch_historical_traffic(start_time=None, end_time=None):
+        """Backfill hourly historical traffic data for [start_time, end_time), defaulting to the last 24 hours"""
         try:
-            current_time = get_sgt_time()
-            expected_total_records = len(SINGAPORE_ROADS) * 24
-            print(f"[HISTORICAL] Collecting historical data. Expecting {expected_total_records} records")
-            
+            current_hour = floor_to_hour(get_sgt_time())
+            end_time = end_time or current_hour
+            start_time = start_time or end_time - timedelta(hours=24)
+
+            # One query loads every sample already stored for the window
+            existing_keys = {
+                backfill_key(record['road_id'], record['timestamp'])
+                for record in historical_traffic_data.find(
+                    {'timestamp': {'$gte': start_time, '$lt': end_time}},
+                    {'_id': 0, 'road_id': 1, 'timestamp': 1}
+                )
+            }
+
+            missing = plan_historical_backfill(SINGAPORE_ROADS, existing_keys, start_time, end_time)
+            expected_total_records = len(missing) + len(existing_keys)
+            print(f"[HISTORICAL] Backfilling {start_time} to {end_time}. "
+                  f"{len(existing_keys)} records exist, {len(missing)} missing")
+
+            if not missing:
+                print("[HISTORICAL] No historical data was collected")
+                return False
+
+            # The flow endpoint only serves live data, so one call covers every missing hour of a road
+            missing_by_road = {}
+            for road_id, road, timestamp in missing:
+                missing_by_road.setdefault(road_id, (road, []))[1].append(timestamp)
+
+            flow_results = fetch_flow_segments(
+                tomtom_session,
+                [road for road, _ in missing_by_road.values()],
+                tomtom_api_key,
+                max_workers=tomtom_max_workers,
+                timeout=tomtom_request_timeout,
+                rate_limiter=tomtom_rate_limiter
+            )
+
             bulk_inserts = []
-            bulk_incidents = []
             api_success_count = 0
             api_failed_count = 0
-            duplicate_count = 0
-            
-            for hours_ago in range(24, 0, -1):
-                timestamp = current_time - timedelta(hours=hours_ago)
-                print(f"\n[HISTORICAL] Processing data for: {timestamp}")
-                
-                for road in SINGAPORE_ROADS:
-                    try:
-                        road_id = f"road_{SINGAPORE_ROADS.index(road) + 1}"
-                        
-                        existing_record = historical_traffic_data.find_one({
+
+            for (road_id, (_, timestamps)), (road, flow_response, fetch_error) in zip(missing_by_road.items(), flow_results):
+                if fetch_error or flow_response.status_code != 200:
+                    api_failed_count += 1
+                    reason = fetch_error or f"status: {flow_response.status_code}"
+                    print(f"[HISTORICAL ERROR] {road['name']} - Failed with {reason}")
+                    continue
+
+                try:
+                    api_success_count += 1
+                    traffic_info = flow_response.json()
+
+                    current_speed = traffic_info['flowSegmentData'].get('currentSpeed', 0)
+                    free_flow_speed = traffic_info['flowSegmentData'].get('freeFlowSpeed', 0)
+
+                    speed_ratio = current_speed / free_flow_speed if free_flow_speed > 0 else 0
+                    if speed_ratio > 0.8:
+                        intensity = 'low'
+                    elif speed_ratio > 0.5:
+                        intensity = 'medium'
+                    else:
+                        intensity = 'high'
+
+                    for timestamp in timestamps:
+                        bulk_inserts.append({
                             'road_id': road_id,
-                            'timestamp': timestamp
+                            'streetName': road['name'],
+                            'coordinates': {
+                                'lat': road['lat'],
+                                'lng': road['lng']
+                            },
+                            'date': timestamp.strftime('%d-%m-%Y'),
+                            'time': timestamp.strftime('%H:%M'),
+                            'timestamp': timestamp,
+                            'currentSpeed': current_speed,
+                            'freeFlowSpeed': free_flow_speed,
+                            'intensity': intensity,
+                            # Live speed copied into past hours; profiles and reports leave these out
+                            'backfilled': True
                         })
-                        
-                        if existing_record:
-                            duplicate_count += 1
-                            print(f"[HISTORICAL] Duplicate record found for {road['name']} at {timestamp}")
-                            continue
-                        
-                        tomtom_url = f"https://api.tomtom.com/traffic/services/4/flowSegmentData/absolute/10/json?point={road['lat']},{road['lng']}&key={tomtom_api_key}"
-                        flow_response = requests.get(tomtom_url)
-                        
-                        if flow_response.status_code == 200:
-                            api_success_count += 1
-                            traffic_info = flow_response.json()
-                            
-                            current_speed = traffic_info['flowSegmentData'].get('currentSpeed', 0)
-                            free_flow_speed = traffic_info['flowSegmentData'].get('freeFlowSpeed', 0)
-                            
-                            speed_ratio = current_speed / free_flow_speed if free_flow_speed > 0 else 0
-                            if speed_ratio > 0.8:
-                                intensity = 'low'
-                            elif speed_ratio > 0.5:
-                                intensity = 'medium'
-                            else:
-                                intensity = 'high'
-                            
-                            historical_record = {
-                                'road_id': road_id,
-                                'streetName': road['name'],
-                                'coordinates': {
-                                    'lat': road['lat'],
-                                    'lng': road['lng']
-                                },
-                                'date': timestamp.strftime('%d-%m-%Y'),
-                                'time': timestamp.strftime('%H:%M'),
-                                'timestamp': timestamp,
-                                'currentSpeed': current_speed,
-                                'freeFlowSpeed': free_flow_speed,
-                                'intensity': intensity
-                            }
-                            
-                            bulk_inserts.append(historical_record)
-                            
-                        else:
-                            api_failed_count += 1
-                            print(f"[HISTORICAL ERROR] {road['name']} - Failed with status: {flow_response.status_code}")
 
-                    except Exception as e:
-                        api_failed_count += 1
-                        print(f"[HISTORICAL ERROR] {road['name']} - Exception: {str(e)}")
-                        continue
+                except Exception as e:
+                    api_failed_count += 1
+                    print(f"[HISTORICAL ERROR] {road['name']} - Exception: {str(e)}")
 
             if bulk_inserts:
-                result = historical_traffic_data.insert_many(bulk_inserts)
-                
-                if bulk_incidents:
-                    traffic_incidents.insert_many(bulk_incidents)
-                
+                # Unordered so rows raced in by another worker only fail on the unique index
+                duplicate_count = 0
+                failed_indexes = set()
+                try:
+                    inserted_count = len(historical_traffic_data.insert_many(bulk_inserts, ordered=False).inserted_ids)
+                except BulkWriteError as e:
+                    inserted_count = e.details.get('nInserted', 0)
+                    duplicate_count = sum(1 for error in e.details.get('writeErrors', []) if error.get('code') == 11000)
+                    failed_indexes = {error.get('index') for error in e.details.get('writeErrors', [])}
+                if inserted_count:
+                    update_traffic_rollups([
+                        record for index, record in enumerate(bulk_inserts) if index not in failed_indexes
+                    ])
+                    bump_data_version(traffic_meta, 'historical_traffic')
+
                 print(f"\n[HISTORICAL SUMMARY] Expected Records: {expected_total_records}")
-                print(f"[HISTORICAL SUMMARY] Inserted: {len(result.inserted_ids)}")
-                print(f"[HISTORICAL SUMMARY] Duplicates Skipped: {duplicate_count}")
-                print(f"[HISTORICAL SUMMARY] Incidents Recorded: {len(bulk_incidents)}")
+                print(f"[HISTORICAL SUMMARY] Inserted: {inserted_count}")
+                print(f"[HISTORICAL SUMMARY] Duplicates Skipped: {len(existing_keys) + duplicate_count}")
                 print(f"[HISTORICAL SUMMARY] API Successes: {api_success_count}")
                 print(f"[HISTORICAL SUMMARY] API Failures: {api_failed_count}\n")
 
@@ -367,20 +2780,11 @@ def create_app(db_client=None):
             return False
 
     def check_api_quota():
-        """Check if the TomTom API key has exceeded its quota"""
-        try:
-            test_url = f"https://api.tomtom.com/traffic/services/4/flowSegmentData/absolute/10/json?point=1.3521,103.8198&key={tomtom_api_key}"
-            response = requests.get(test_url)
-            
-            if response.status_code == 403:
-                error_msg = response.json().get('error', {}).get('description', '')
-                if 'quota' in error_msg.lower() or 'exceeded' in error_msg.lower() or 'limit' in error_msg.lower():
-                    print(f"[API QUOTA ERROR] {error_msg}")
-                    return True
-            return False
-        except Exception as e:
-            print(f"[API CHECK ERROR] {str(e)}")
+        """Check if the TomTom API key has exceeded its quota or been rejected"""
+        if tomtom_rate_limiter.is_blocked():
+            print(f"[API QUOTA ERROR] TomTom calls blocked: {tomtom_rate_limiter.stats()}")
             return True
+        return False
 
      # Initialize the scheduler
     scheduler = BackgroundScheduler(timezone="Asia/Singapore")
@@ -432,6 +2836,56 @@ def create_app(db_client=None):
         except Exception as e:
             print(f"[SCHEDULER ERROR] Error in historical fetch: {e}")
 
+    HISTORICAL_BACKFILL_MAX_DAYS = int(os.getenv('HISTORICAL_BACKFILL_MAX_DAYS', 31))
+
+    def parse_backfill_time(value):
+        for time_format in ('%Y-%m-%d %H:%M', '%Y-%m-%dT%H:%M', '%Y-%m-%d'):
+            try:
+                return SGT.localize(datetime.strptime(value, time_format))
+            except (ValueError, TypeError):
+                continue
+        return None
+
+    @app.route('/api/traffic/backfill', methods=['POST'])
+    def backfill_historical_traffic():
+        try:
+            if 'username' not in session:
+                return jsonify({'message': 'Unauthorized - Please log in'}), 401
+
+            data = request.json or {}
+            start_time = parse_backfill_time(data.get('start'))
+            end_time = parse_backfill_time(data.get('end')) if data.get('end') else floor_to_hour(get_sgt_time())
+
+            if not start_time or not end_time:
+                return jsonify({'message': 'Start and end must be YYYY-MM-DD or YYYY-MM-DD HH:MM'}), 400
+            if end_time <= start_time:
+                return jsonify({'message': 'End time must be later than start time'}), 400
+            if end_time - start_time > timedelta(days=HISTORICAL_BACKFILL_MAX_DAYS):
+                return jsonify({'message': f'Backfill window cannot exceed {HISTORICAL_BACKFILL_MAX_DAYS} days'}), 400
+
+            job = scheduler.add_job(
+                func=fetch_historical_traffic,
+                trigger='date',
+                run_date=get_sgt_time(),
+                args=[start_time, end_time],
+                id=f"historical_backfill_{start_time:%Y%m%d%H}_{end_time:%Y%m%d%H}",
+                name='Historical Data Backfill',
+                replace_existing=True,
+                misfire_grace_time=300
+            )
+            print(f"[SCHEDULER] Scheduled historical backfill {start_time} to {end_time}")
+
+            return jsonify({
+                'message': 'Backfill scheduled',
+                'jobId': job.id,
+                'start': start_time.isoformat(),
+                'end': end_time.isoformat()
+            }), 202
+
+        except Exception as e:
+            print(f"[ERROR] Error scheduling backfill: {str(e)}")
+            return jsonify({'message': f'Error scheduling backfill: {str(e)}'}), 500
+
     schedule_one_time_historical_fetch()
     scheduler.print_jobs()
     pending_jobs = len(scheduler.get_jobs())
@@ -1482,33 +3936,8 @@ def create_app(db_client=None):
             print(f"Error deleting map: {e}")
             return jsonify({'message': f'Error deleting map: {str(e)}'}), 500
 
-    def get_incident_counts(road_id, time_range=None):
-        """Get accident and congestion counts for a road"""
-        query = {'road_id': road_id}
-        
-        if time_range:
-            query['recorded_at'] = time_range
-        
-        pipeline = [
-            {'$match': query},
-            {'$group': {
-                '_id': '$type',
-                'count': {'$sum': 1}
-            }}
-        ]
-        
-        counts = {
-            'ACCIDENT': 0,
-            'CONGESTION': 0
-        }
-        
-        results = traffic_incidents.aggregate(pipeline)
-        for result in results:
-            counts[result['_id']] = result['count']
-        
-        return counts['ACCIDENT'], counts['CONGESTION']
-
     @app.route('/api/traffic/data', methods=['GET'])
+    @conditional_get(traffic_data_version)
     def get_traffic_data():
         try:
             search_term = request.args.get('search', '').lower()
@@ -1518,47 +3947,11 @@ def create_app(db_client=None):
             end_time = request.args.get('endTime')
             conditions = request.args.getlist('conditions')
 
-            query = {}
-
-            if search_term:
-                query['streetName'] = {'$regex': search_term, '$options': 'i'}
-
-            if start_date or end_date:
-                if start_date:
-                    date_obj = datetime.strptime(start_date, '%Y-%m-%d')
-                    formatted_start_date = date_obj.strftime('%d-%m-%Y')
-                    query['date'] = {'$gte': formatted_start_date}
-                if end_date:
-                    date_obj = datetime.strptime(end_date, '%Y-%m-%d')
-                    formatted_end_date = date_obj.strftime('%d-%m-%Y')
-                    if 'date' in query:
-                        query['date']['$lte'] = formatted_end_date
-                    else:
-                        query['date'] = {'$lte': formatted_end_date}
-
-            if start_time or end_time:
-                if start_time:
-                    query['time'] = {'$gte': start_time}
-                if end_time:
-                    if 'time' in query:
-                        query['time']['$lte'] = end_time
-                    else:
-                        query['time'] = {'$lte': end_time}
-
-            if conditions:
-                query['intensity'] = {'$in': conditions}
-
-            print(f"[DEBUG] Traffic query: {query}")
+            snapshot = traffic_snapshots.get()
+            current_data = snapshot.filter(search_term, start_date, end_date, start_time, end_time, conditions)
+            print(f"[DEBUG] Found {len(current_data)} records in snapshot version {snapshot.version}")
 
-            current_data = list(current_traffic_data.find(query, {'_id': 0}))
-            print(f"[DEBUG] Found {len(current_data)} records")
-            
-            for data in current_data:
-                accident_count, congestion_count = get_incident_counts(data['road_id'])
-                data['accidentCount'] = accident_count
-                data['congestionCount'] = congestion_count
-            
-            return jsonify(current_data)
+            return jsonify(with_incident_counts(snapshot, current_data))
 
         except Exception as e:
             print(f"Error fetching traffic data: {e}")
@@ -1568,32 +3961,11 @@ def create_app(db_client=None):
         query = {'road_id': road_id}
 
         if start_date or end_date:
-            if start_date:
-                try:
-                    date_obj = datetime.strptime(start_date, '%Y-%m-%d')
-                except ValueError:
-                    try:
-                        date_obj = datetime.strptime(start_date, '%d-%m-%Y')
-                    except ValueError:
-                        print(f"Invalid start date format: {start_date}")
-                        return query
-                formatted_start_date = date_obj.strftime('%d-%m-%Y')
-                query['date'] = {'$gte': formatted_start_date}
-                
-            if end_date:
-                try:
-                    date_obj = datetime.strptime(end_date, '%Y-%m-%d')
-                except ValueError:
-                    try:
-                        date_obj = datetime.strptime(end_date, '%d-%m-%Y')
-                    except ValueError:
-                        print(f"Invalid end date format: {end_date}")
-                        return query
-                formatted_end_date = date_obj.strftime('%d-%m-%Y')
-                if 'date' in query:
-                    query['date']['$lte'] = formatted_end_date
-                else:
-                    query['date'] = {'$lte': formatted_end_date}
+            try:
+                query['timestamp'] = build_timestamp_range(start_date, end_date, SGT)
+            except ValueError as e:
+                print(str(e))
+                return query
 
         if start_time or end_time:
             if start_time:
@@ -1637,8 +4009,8 @@ def create_app(db_client=None):
             print(f"[DEBUG] Found {len(historical_data)} records")
 
             if historical_data:
-                timestamps = [datetime.strptime(f"{record['date']} {record['time']}", '%d-%m-%Y %H:%M') 
-                            for record in historical_data]
+                # Stored timestamps come back as naive UTC, matching incident start_time
+                timestamps = [record['timestamp'] for record in historical_data]
                 min_time = min(timestamps)
                 max_time = max(timestamps)
 
@@ -1646,7 +4018,7 @@ def create_app(db_client=None):
                     'road_id': road_id,
                     'start_time': {
                         '$gte': min_time,
-                        '$lte': max_time
+                        '$lt': max_time + timedelta(hours=1)
                     },
                     'status': 'HISTORICAL'
                 }))
@@ -1659,8 +4031,7 @@ def create_app(db_client=None):
                     incident_counts[hour_key][incident['type']] += 1
 
                 for record in historical_data:
-                    record_time = datetime.strptime(f"{record['date']} {record['time']}", '%d-%m-%Y %H:%M')
-                    hour_key = record_time.replace(minute=0, second=0, microsecond=0)
+                    hour_key = record['timestamp'].replace(minute=0, second=0, microsecond=0)
                     counts = incident_counts.get(hour_key, {'ACCIDENT': 0, 'CONGESTION': 0})
                     record['accidentCount'] = counts['ACCIDENT']
                     record['congestionCount'] = counts['CONGESTION']
@@ -1693,113 +4064,199 @@ def create_app(db_client=None):
 
     reports_fs = gridfs.GridFS(client['traffic-data'], collection='reports-files')
 
-    def add_incident_data(records, query_date_range=None):
-        """Add incident data to traffic records"""
-        enhanced_records = []
-        
-        for record in records:
-            record_date = datetime.strptime(f"{record['date']} {record['time']}", '%d-%m-%Y %H:%M')
-            
-            incident_query = {
-                'road_id': record.get('road_id'),
-                'start_time': {
-                    '$lte': record_date + timedelta(minutes=30),
-                    '$gte': record_date - timedelta(minutes=30)
-                }
-            }
-            
-            if query_date_range:
-                incident_query['start_time'].update(query_date_range)
+    def build_report_query(filters):
+        """Build the historical query and incident time range for a report's date, time and road filters"""
+        # Backfilled rows repeat the speed seen at backfill time, not a measurement of their hour
+        query = {'backfilled': {'$ne': True}}
+        query_date_range = None
+
+        date_range = filters.get('dateRange') or {}
+        if date_range.get('start') or date_range.get('end'):
+            query['timestamp'] = build_timestamp_range(date_range.get('start'), date_range.get('end'), SGT)
+            if date_range.get('start') and date_range.get('end'):
+                query_date_range = dict(query['timestamp'])
+
+        time_range = filters.get('timeRange') or {}
+        if time_range.get('start'):
+            query['time'] = {'$gte': time_range['start']}
+        if time_range.get('end'):
+            if 'time' in query:
+                query['time']['$lte'] = time_range['end']
+            else:
+                query['time'] = {'$lte': time_range['end']}
 
-            accident_count = traffic_incidents.count_documents({
-                **incident_query,
-                'type': 'ACCIDENT'
-            })
-            
-            congestion_count = traffic_incidents.count_documents({
-                **incident_query,
-                'type': 'CONGESTION'
-            })
-            
-            record['accidentCount'] = accident_count
-            record['congestionCount'] = congestion_count
-            record['incidentCount'] = accident_count + congestion_count
-            
-            enhanced_records.append(record)
-        
-        return enhanced_records
+        if filters.get('selectedRoads'):
+            query['streetName'] = {'$in': filters['selectedRoads']}
 
-    @app.route('/api/reports', methods=['POST'])
-    def generate_report():
-        try:
-            if 'username' not in session:
-                return jsonify({'message': 'Unauthorized - Please log in'}), 401
+        return query, query_date_range
 
-            username = session.get('username', 'unknown_user')
+    def count_incidents_near(records, window=timedelta(minutes=30), bounds=None, include_end=True):
+        """Count ACCIDENT and CONGESTION incidents within +/- window of each record's timestamp.
 
-            data = request.json
-            query = {}
-            query_date_range = None
-
-            if data.get('dateRange'):
-                date_range = data['dateRange']
-                if date_range.get('start'):
-                    start_date = datetime.strptime(date_range['start'], '%Y-%m-%d')
-                    query['date'] = {'$gte': start_date.strftime('%d-%m-%Y')}
-                if date_range.get('end'):
-                    end_date = datetime.strptime(date_range['end'], '%Y-%m-%d')
-                    if 'date' in query:
-                        query['date']['$lte'] = end_date.strftime('%d-%m-%Y')
-                    else:
-                        query['date'] = {'$lte': end_date.strftime('%d-%m-%Y')}
-                        
-                if date_range.get('start') and date_range.get('end'):
-                    query_date_range = {
-                        '$gte': start_date,
-                        '$lte': end_date + timedelta(days=1)
-                    }
+        Fetches every candidate incident with one query, buckets them per
+        (road, type) into sorted arrays and counts each record's window by
+        binary search. Windows are clipped to the optional start_time bounds.
+        Returns {type: counts array aligned with records}.
+        """
+        incident_types = ('ACCIDENT', 'CONGESTION')
+        counts = {incident_type: np.zeros(len(records), dtype=np.int64) for incident_type in incident_types}
+        if not records:
+            return counts
 
-            if data.get('timeRange'):
-                time_range = data['timeRange']
-                if time_range.get('start'):
-                    query['time'] = {'$gte': time_range['start']}
-                if time_range.get('end'):
-                    if 'time' in query:
-                        query['time']['$lte'] = time_range['end']
-                    else:
-                        query['time'] = {'$lte': time_range['end']}
-
-            if data.get('selectedRoads'):
-                query['streetName'] = {'$in': data['selectedRoads']}
-
-            traffic_data = list(historical_traffic_data.find(query, {'_id': 0}).sort([
-                ('date', 1),
-                ('time', 1)
-            ]))
-
-            report_entry = {
-                'reportFormat': 'pdf',
-                'dataType': data.get('dataType'),
-                'dateRange': data.get('dateRange'),
-                'timeRange': data.get('timeRange'),
-                'selectedRoads': data.get('selectedRoads'),
-                'metadata': {
-                    'generatedBy': username,
-                    'generatedAt': datetime.now(SGT),
-                    'reportType': data.get('metadata', {}).get('reportType', 'standard')
-                }
-            }
-            
-            report_id = reports_collection.insert_one(report_entry).inserted_id
+        record_times = np.array([
+            to_naive_utc(record.get('timestamp') or SGT.localize(
+                datetime.strptime(f"{record['date']} {record['time']}", '%d-%m-%Y %H:%M')
+            ))
+            for record in records
+        ], dtype='datetime64[ms]')
+        window_starts = record_times - np.timedelta64(window)
+        window_ends = record_times + np.timedelta64(window)
+
+        if bounds:
+            if bounds.get('$gte'):
+                window_starts = np.maximum(window_starts, np.datetime64(to_naive_utc(bounds['$gte']), 'ms'))
+            upper_bound = bounds.get('$lt') or bounds.get('$lte')
+            if upper_bound:
+                window_ends = np.minimum(window_ends, np.datetime64(to_naive_utc(upper_bound), 'ms'))
+
+        road_ids = np.array([record.get('road_id') for record in records], dtype=object)
+        unique_road_ids = set(road_ids)
+
+        incident_times = {}
+        for incident in traffic_incidents.find({
+            'road_id': {'$in': list(unique_road_ids)},
+            'type': {'$in': list(incident_types)},
+            'start_time': {'$gte': window_starts.min().item(), '$lte': window_ends.max().item()}
+        }, {'_id': 0, 'road_id': 1, 'type': 1, 'start_time': 1}):
+            incident_times.setdefault((incident['road_id'], incident['type']), []).append(
+                to_naive_utc(incident['start_time'])
+            )
 
-            if not traffic_data:
-                return jsonify({'message': 'No data found for the selected criteria'}), 404
+        for road_id in unique_road_ids:
+            record_indices = np.flatnonzero(road_ids == road_id)
+            for incident_type in incident_types:
+                times = incident_times.get((road_id, incident_type))
+                if times:
+                    counts[incident_type][record_indices] = count_events_in_windows(
+                        np.sort(np.array(times, dtype='datetime64[ms]')),
+                        window_starts[record_indices],
+                        window_ends[record_indices],
+                        include_end
+                    )
 
-            if data['dataType'] in ['incidents', 'comprehensive', 'congestion']:
-                traffic_data = add_incident_data(traffic_data, query_date_range)
+        return counts
+
+    def add_incident_data(records, query_date_range=None):
+        """Add incident data to traffic records"""
+        counts = count_incidents_near(records, bounds=query_date_range)
+
+        for record, accident_count, congestion_count in zip(records, counts['ACCIDENT'], counts['CONGESTION']):
+            record['accidentCount'] = int(accident_count)
+            record['congestionCount'] = int(congestion_count)
+            record['incidentCount'] = int(accident_count + congestion_count)
+        
+        return records
+
+    def summarise_report(filters, limit=None):
+        """Summary rows for a report's filters, aggregated by the database.
+
+        Returns (columns, rows) with one row per road and day or hour of day;
+        incident totals come from a second aggregation over traffic_incidents.
+        """
+        granularity = filters['granularity']
+        query, _ = build_report_query(filters)
+        pipeline = report_summary_pipeline(query, granularity)
+        if limit:
+            pipeline.append({'$limit': limit})
+        summaries = list(historical_traffic_data.aggregate(pipeline, allowDiskUse=True))
+
+        incident_counts = {}
+        if summaries and filters['dataType'] in ['incidents', 'comprehensive', 'congestion']:
+            for bucket in traffic_incidents.aggregate(incident_summary_pipeline(
+                {summary['road_id'] for summary in summaries},
+                query.get('timestamp'),
+                granularity,
+                filters.get('timeRange')
+            )):
+                key = (bucket['_id']['road_id'], incident_summary_period(bucket['_id'], granularity))
+                incident_counts.setdefault(key, {})[bucket['_id']['type']] = bucket['count']
+
+        columns = summary_report_columns(filters['dataType'], granularity)
+        rows = []
+        for summary in summaries:
+            counts = incident_counts.get((summary['road_id'], summary['period']), {})
+            row = {
+                'streetName': summary.get('streetName'),
+                'date': summary.get('date'),
+                'hour': summary['period'],
+                'samples': summary['samples'],
+                'congestionHours': summary['congestionHours'],
+                'accidentCount': counts.get('ACCIDENT', 0),
+                'congestionCount': counts.get('CONGESTION', 0),
+                'incidentCount': counts.get('ACCIDENT', 0) + counts.get('CONGESTION', 0)
+            }
+            for field in ('avgSpeed', 'minSpeed', 'maxSpeed', 'avgFreeFlowSpeed', 'p50Speed', 'p85Speed'):
+                value = summary.get(field)
+                row[field] = round(value, 1) if value is not None else None
+            rows.append({column: row.get(column) for column in columns})
+
+        return columns, rows
+
+    REPORT_WORKERS = int(os.getenv('REPORT_WORKERS', 2))
+    REPORT_MAX_PENDING = int(os.getenv('REPORT_MAX_PENDING', 20))
+    REPORT_RETRY_AFTER = int(os.getenv('REPORT_RETRY_AFTER', 30))
+
+    # Reports are rendered off the request path; clients poll /api/reports/jobs/<id>
+    report_jobs = ReportJobQueue(
+        client['traffic-data']['report_jobs'],
+        max_workers=REPORT_WORKERS,
+        max_pending=REPORT_MAX_PENDING,
+        stale_seconds=int(os.getenv('REPORT_JOB_STALE_SECONDS', 600))
+    )
+
+    REPORT_BATCH_SIZE = int(os.getenv('REPORT_BATCH_SIZE', 1000))
+    REPORT_SPOOL_MAX_BYTES = int(os.getenv('REPORT_SPOOL_MAX_BYTES', 8 * 1024 * 1024))
+
+    def stream_report_rows(query, query_date_range, columns, with_incidents, total, progress):
+        """Report table rows read from a Mongo cursor, REPORT_BATCH_SIZE records at a time"""
+        cursor = historical_traffic_data.find(query, {'_id': 0}).sort([
+            ('timestamp', 1),
+            ('streetName', 1)
+        ]).batch_size(REPORT_BATCH_SIZE)
+
+        done = 0
+        batch = []
+        for record in cursor:
+            batch.append(record)
+            if len(batch) < REPORT_BATCH_SIZE:
+                continue
+            if with_incidents:
+                add_incident_data(batch, query_date_range)
+            for record in batch:
+                yield [record.get(column) for column in columns]
+            done += len(batch)
+            batch = []
+            progress(0.05 + 0.85 * done / max(total, 1), f'Rendered {done} of {total} rows')
+
+        if batch:
+            if with_incidents:
+                add_incident_data(batch, query_date_range)
+            for record in batch:
+                yield [record.get(column) for column in columns]
+
+    def build_report(data, username, cache_key, data_version, progress):
+        """Render a report PDF, store it in GridFS and record it. Returns the report id.
+
+        Rows stream from the cursor into page-sized tables and the PDF is
+        written to a spooled temporary file that GridFS reads in chunks.
+        """
+        query, query_date_range = build_report_query(data)
+        granularity = data.get('granularity') or 'raw'
+
+        if granularity == 'raw':
+            progress(0.02, 'Counting traffic history')
+            total = historical_traffic_data.count_documents(query)
 
-            df = pd.DataFrame(traffic_data)
-            
             if data['dataType'] == 'traffic':
                 columns = ['streetName', 'date', 'time', 'currentSpeed', 'freeFlowSpeed', 'intensity']
             elif data['dataType'] == 'incidents':
@@ -1809,137 +4266,235 @@ def create_app(db_client=None):
             else:
                 columns = ['streetName', 'date', 'time', 'currentSpeed', 'freeFlowSpeed', 
                           'intensity', 'accidentCount', 'congestionCount', 'incidentCount']
+        else:
+            progress(0.02, f'Summarising traffic history ({granularity})')
+            columns, summary_rows = summarise_report(data)
+            total = len(summary_rows)
+
+        if not total:
+            raise ValueError('No data found for the selected criteria')
+
+        report_file = tempfile.SpooledTemporaryFile(max_size=REPORT_SPOOL_MAX_BYTES)
+        doc = SimpleDocTemplate(
+            report_file,
+            pagesize=landscape(letter),
+            leftMargin=50,
+            rightMargin=50,
+            topMargin=50,
+            bottomMargin=50,
+            pageCompression=1
+        )
+        elements = []
+
+        styles = getSampleStyleSheet()
+        styles.add(ParagraphStyle(
+            name='CustomTitle',
+            parent=styles['Title'],
+            fontSize=24,
+            spaceAfter=30,
+            textColor=colors.HexColor('#2c3e50'),
+            alignment=TA_CENTER
+        ))
+
+        styles.add(ParagraphStyle(
+            name='SubTitle',
+            parent=styles['Normal'],
+            fontSize=12,
+            textColor=colors.HexColor('#7f8c8d'),
+            alignment=TA_CENTER,
+            spaceAfter=20
+        ))
+
+        title = Paragraph(f"Traffic Report", styles['CustomTitle'])
+        subtitle = Paragraph(
+            f"Generated on {datetime.now(SGT).strftime('%B %d, %Y at %H:%M')}",
+            styles['SubTitle']
+        )
+        elements.extend([title, subtitle])
+
+        metadata_style = ParagraphStyle(
+            name='MetadataStyle',
+            parent=styles['Normal'],
+            fontSize=10,
+            textColor=colors.HexColor('#34495e'),
+            spaceAfter=5
+        )
 
-            df = df[columns]
+        details = [
+            f"Report Type: {data['dataType'].title()}",
+            f"Generated By: {username}",
+            f"Total Records: {total}"
+        ]
+        if granularity != 'raw':
+            details.append(f"Granularity: {'Daily' if granularity == 'daily' else 'Hour-of-day'} summary per road")
 
-            buffer = BytesIO()
-            doc = SimpleDocTemplate(
-                buffer,
-                pagesize=landscape(letter),
-                leftMargin=50,
-                rightMargin=50,
-                topMargin=50,
-                bottomMargin=50
-            )
-            elements = []
-
-            styles = getSampleStyleSheet()
-            styles.add(ParagraphStyle(
-                name='CustomTitle',
-                parent=styles['Title'],
-                fontSize=24,
-                spaceAfter=30,
-                textColor=colors.HexColor('#2c3e50'),
-                alignment=TA_CENTER
-            ))
-            
-            styles.add(ParagraphStyle(
-                name='SubTitle',
-                parent=styles['Normal'],
-                fontSize=12,
-                textColor=colors.HexColor('#7f8c8d'),
-                alignment=TA_CENTER,
-                spaceAfter=20
-            ))
+        if data.get('dateRange'):
+            date_range = data['dateRange']
+            if date_range.get('start') and date_range.get('end'):
+                details.append(f"Date Range: {date_range['start']} to {date_range['end']}")
 
-            title = Paragraph(f"Traffic Report", styles['CustomTitle'])
-            subtitle = Paragraph(
-                f"Generated on {datetime.now(SGT).strftime('%B %d, %Y at %H:%M')}",
-                styles['SubTitle']
-            )
-            elements.extend([title, subtitle])
-
-            metadata_style = ParagraphStyle(
-                name='MetadataStyle',
-                parent=styles['Normal'],
-                fontSize=10,
-                textColor=colors.HexColor('#34495e'),
-                spaceAfter=5
-            )
+        if data.get('timeRange'):
+            time_range = data['timeRange']
+            if time_range.get('start') and time_range.get('end'):
+                details.append(f"Time Range: {time_range['start']} to {time_range['end']}")
 
-            details = [
-                f"Report Type: {data['dataType'].title()}",
-                f"Generated By: {username}",
-                f"Total Records: {len(traffic_data)}"
-            ]
-            
-            if data.get('dateRange'):
-                date_range = data['dateRange']
-                if date_range.get('start') and date_range.get('end'):
-                    details.append(f"Date Range: {date_range['start']} to {date_range['end']}")
-            
-            if data.get('timeRange'):
-                time_range = data['timeRange']
-                if time_range.get('start') and time_range.get('end'):
-                    details.append(f"Time Range: {time_range['start']} to {time_range['end']}")
-
-            for detail in details:
-                elements.append(Paragraph(detail, metadata_style))
-
-            elements.append(Spacer(1, 20))
-
-            table_data = [columns] + df.values.tolist()
-            table = Table(table_data, repeatRows=1)
-            table.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#3498db')),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
-                ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, 0), (-1, 0), 11),
-                ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-                ('TOPPADDING', (0, 0), (-1, 0), 12),
-                
-                ('BACKGROUND', (0, 1), (-1, -1), colors.white),
-                ('TEXTCOLOR', (0, 1), (-1, -1), colors.HexColor('#2c3e50')),
-                ('ALIGN', (0, 1), (-1, -1), 'CENTER'),
-                ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-                ('FONTSIZE', (0, 1), (-1, -1), 10),
-                ('BOTTOMPADDING', (0, 1), (-1, -1), 8),
-                ('TOPPADDING', (0, 1), (-1, -1), 8),
-                
-                ('GRID', (0, 0), (-1, -1), 1, colors.HexColor('#ecf0f1')),
-                ('LINEBELOW', (0, 0), (-1, 0), 2, colors.HexColor('#2980b9')),
-                
-                ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#f8f9fa')])
-            ]))
-            
-            elements.append(table)
-
-            footer_style = ParagraphStyle(
-                name='FooterStyle',
-                parent=styles['Normal'],
-                fontSize=8,
-                textColor=colors.HexColor('#95a5a6'),
-                alignment=TA_RIGHT,
-                spaceBefore=20
-            )
-            footer = Paragraph(
-                f"Generated by FlowX Traffic Management System<br/>Page 1",
-                footer_style
-            )
-            elements.append(footer)
+        for detail in details:
+            elements.append(Paragraph(detail, metadata_style))
+
+        elements.append(Spacer(1, 20))
+
+        if granularity == 'raw':
+            rows = stream_report_rows(query, query_date_range, columns,
+                                      data['dataType'] in ['incidents', 'comprehensive', 'congestion'], total, progress)
+        else:
+            rows = ([row[column] for column in columns] for row in summary_rows)
+        # Street names get a double-width column, the rest share the page evenly
+        column_shares = [2 if column == 'streetName' else 1 for column in columns]
+        col_widths = [doc.width * share / sum(column_shares) for share in column_shares]
+        table = StreamingTable(columns, rows, TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#3498db')),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, 0), 11),
+            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+            ('TOPPADDING', (0, 0), (-1, 0), 12),
+
+            ('BACKGROUND', (0, 1), (-1, -1), colors.white),
+            ('TEXTCOLOR', (0, 1), (-1, -1), colors.HexColor('#2c3e50')),
+            ('ALIGN', (0, 1), (-1, -1), 'CENTER'),
+            ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+            ('FONTSIZE', (0, 1), (-1, -1), 10),
+            ('BOTTOMPADDING', (0, 1), (-1, -1), 8),
+            ('TOPPADDING', (0, 1), (-1, -1), 8),
+
+            ('GRID', (0, 0), (-1, -1), 1, colors.HexColor('#ecf0f1')),
+            ('LINEBELOW', (0, 0), (-1, 0), 2, colors.HexColor('#2980b9')),
+
+            ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#f8f9fa')])
+        ]), col_widths)
+
+        elements.append(table)
+
+        footer_style = ParagraphStyle(
+            name='FooterStyle',
+            parent=styles['Normal'],
+            fontSize=8,
+            textColor=colors.HexColor('#95a5a6'),
+            alignment=TA_RIGHT,
+            spaceBefore=20
+        )
+        footer = Paragraph(
+            f"Generated by FlowX Traffic Management System<br/>Page 1",
+            footer_style
+        )
+        elements.append(footer)
 
+        progress(0.05, f'Rendering {total} rows')
+        with report_file:
             doc.build(elements)
-            buffer.seek(0)
-            pdf_data = buffer.getvalue()
 
+            progress(0.95, 'Saving report')
+            report_file.seek(0)
+            report_id = ObjectId()
             file_id = reports_fs.put(
-                pdf_data,
+                report_file,
                 filename=f'traffic-report-{report_id}.pdf',
                 contentType='application/pdf',
                 reportId=report_id
             )
 
-            reports_collection.update_one(
-                {'_id': report_id},
-                {'$set': {'fileId': file_id}}
-            )
+        reports_collection.insert_one({
+            '_id': report_id,
+            'reportFormat': 'pdf',
+            'dataType': data.get('dataType'),
+            'dateRange': data.get('dateRange'),
+            'timeRange': data.get('timeRange'),
+            'selectedRoads': data.get('selectedRoads'),
+            'granularity': granularity,
+            'metadata': {
+                'generatedBy': username,
+                'generatedAt': datetime.now(SGT),
+                'reportType': data.get('metadata', {}).get('reportType', 'standard')
+            },
+            'fileId': file_id,
+            'cacheKey': cache_key,
+            'dataVersion': data_version
+        })
+        return str(report_id)
+
+    def format_report_job(job):
+        formatted = {
+            'jobId': job['id'],
+            'status': job['status'],
+            'progress': job['progress'],
+            'message': job['message'],
+            'error': job['error'],
+            'createdAt': job['createdAt'].isoformat(),
+            'startedAt': job['startedAt'].isoformat() if job['startedAt'] else None,
+            'finishedAt': job['finishedAt'].isoformat() if job['finishedAt'] else None
+        }
+        if job['status'] == 'done':
+            formatted['reportId'] = job['result']
+            formatted['downloadUrl'] = f"/api/reports/{job['result']}/download"
+        return formatted
 
-            return send_file(
-                BytesIO(pdf_data),
-                download_name=f'traffic-report-{datetime.now(SGT).strftime("%Y%m%d-%H%M")}.pdf',
-                mimetype='application/pdf'
-            )
+    @app.route('/api/reports', methods=['POST'])
+    def generate_report():
+        """Queue a report build, or point at an identical report that already exists.
+
+        Returns 202 with a job to poll at /api/reports/jobs/<jobId>, or 200 with
+        the reportId when the same filters were already rendered from the same
+        data version.
+        """
+        try:
+            if 'username' not in session:
+                return jsonify({'message': 'Unauthorized - Please log in'}), 401
+
+            username = session.get('username', 'unknown_user')
+
+            data = request.json
+            if (data.get('granularity') or 'raw') not in REPORT_GRANULARITIES:
+                return jsonify({'message': f"granularity must be one of {', '.join(REPORT_GRANULARITIES)}"}), 400
+
+            query, _ = build_report_query(data)
+
+            if historical_traffic_data.find_one(query, {'_id': 1}) is None:
+                return jsonify({'message': 'No data found for the selected criteria'}), 404
+
+            data_version, _ = read_data_version(traffic_meta, 'historical_traffic')
+            cache_key = report_cache_key(data, data_version)
+
+            existing = reports_collection.find_one(
+                {'cacheKey': cache_key, 'fileId': {'$exists': True}}, {'_id': 1})
+            if existing:
+                print(f"[REPORTS] Reusing report {existing['_id']} for identical filters")
+                return jsonify({
+                    'status': 'done',
+                    'progress': 1.0,
+                    'reused': True,
+                    'reportId': str(existing['_id']),
+                    'downloadUrl': f"/api/reports/{existing['_id']}/download"
+                }), 200
+
+            try:
+                job, created = report_jobs.submit(
+                    cache_key,
+                    lambda progress: build_report(data, username, cache_key, data_version, progress),
+                    owner=username
+                )
+            except ReportQueueFull as e:
+                print(f"[REPORTS] {e}")
+                response = jsonify({'message': 'Too many reports are being generated, please retry shortly'})
+                response.headers['Retry-After'] = str(REPORT_RETRY_AFTER)
+                return response, 503
+
+            body = format_report_job(job)
+            body['statusUrl'] = f"/api/reports/jobs/{job['id']}"
+            body['deduplicated'] = not created
+            response = jsonify(body)
+            response.headers['Location'] = body['statusUrl']
+            return response, 202
 
         except Exception as e:
             print(f"Error generating report: {str(e)}")
@@ -1948,6 +4503,17 @@ def create_app(db_client=None):
                 error_message = "Session expired. Please log in again."
             return jsonify({'message': error_message}), 500
 
+    @app.route('/api/reports/jobs/<job_id>', methods=['GET'])
+    def get_report_job(job_id):
+        if 'username' not in session:
+            return jsonify({'message': 'Unauthorized - Please log in'}), 401
+
+        job = report_jobs.get(job_id)
+        # Other users' jobs are reported as missing rather than forbidden
+        if not job or session['username'] not in job['owners']:
+            return jsonify({'message': 'Report job not found'}), 404
+        return jsonify(format_report_job(job)), 200
+
     @app.route('/api/reports/<report_id>/download', methods=['GET'])
     def download_report(report_id):
         try:
@@ -1976,24 +4542,51 @@ def create_app(db_client=None):
     @app.route('/api/traffic/available-ranges', methods=['GET'])
     def get_available_ranges():
         try:
-            date_range = historical_traffic_data.aggregate([
+            traffic_rollup_daily = rollup_collection('traffic')
+            if traffic_rollup_daily is not None:
+                oldest = traffic_rollup_daily.find_one({}, {'date': 1}, sort=[('day', 1)])
+                newest = traffic_rollup_daily.find_one({}, {'date': 1}, sort=[('day', -1)])
+                range_data = list(traffic_rollup_daily.aggregate([
+                    {
+                        '$group': {
+                            '_id': None,
+                            'minTime': {'$min': '$firstTime'},
+                            'maxTime': {'$max': '$lastTime'}
+                        }
+                    }
+                ]))[0]
+
+                return jsonify({
+                    'dateRange': {
+                        'start': oldest['date'],
+                        'end': newest['date']
+                    },
+                    'timeRange': {
+                        'start': range_data['minTime'],
+                        'end': range_data['maxTime']
+                    }
+                })
+
+            # The ends of the timestamp index give the date range without a scan
+            oldest = historical_traffic_data.find_one({}, {'timestamp': 1}, sort=[('timestamp', 1)])
+            newest = historical_traffic_data.find_one({}, {'timestamp': 1}, sort=[('timestamp', -1)])
+
+            time_range = historical_traffic_data.aggregate([
                 {
                     '$group': {
                         '_id': None,
-                        'minDate': {'$min': '$date'},
-                        'maxDate': {'$max': '$date'},
                         'minTime': {'$min': '$time'},
                         'maxTime': {'$max': '$time'}
                     }
                 }
             ])
             
-            range_data = list(date_range)[0]
+            range_data = list(time_range)[0]
             
             return jsonify({
                 'dateRange': {
-                    'start': range_data['minDate'],
-                    'end': range_data['maxDate']
+                    'start': pytz.utc.localize(oldest['timestamp']).astimezone(SGT).strftime('%d-%m-%Y'),
+                    'end': pytz.utc.localize(newest['timestamp']).astimezone(SGT).strftime('%d-%m-%Y')
                 },
                 'timeRange': {
                     'start': range_data['minTime'],
@@ -2012,45 +4605,25 @@ def create_app(db_client=None):
                 return jsonify({'message': 'Unauthorized - Please log in'}), 401
 
             data = request.json
-            query = {}
-            date_range = None
-
-            if data.get('dateRange'):
-                date_range = data['dateRange']
-                if date_range.get('start'):
-                    start_date = datetime.strptime(date_range['start'], '%Y-%m-%d')
-                    query['date'] = {'$gte': start_date.strftime('%d-%m-%Y')}
-                if date_range.get('end'):
-                    end_date = datetime.strptime(date_range['end'], '%Y-%m-%d')
-                    if 'date' in query:
-                        query['date']['$lte'] = end_date.strftime('%d-%m-%Y')
-                    else:
-                        query['date'] = {'$lte': end_date.strftime('%d-%m-%Y')}
-                        
-                query_date_range = None
-                if date_range.get('start') and date_range.get('end'):
-                    query_date_range = {
-                        '$gte': start_date,
-                        '$lte': end_date + timedelta(days=1)
-                    }
-
-            if data.get('timeRange'):
-                time_range = data['timeRange']
-                if time_range.get('start'):
-                    query['time'] = {'$gte': time_range['start']}
-                if time_range.get('end'):
-                    if 'time' in query:
-                        query['time']['$lte'] = time_range['end']
-                    else:
-                        query['time'] = {'$lte': time_range['end']}
+            granularity = data.get('granularity') or 'raw'
+            if granularity not in REPORT_GRANULARITIES:
+                return jsonify({'message': f"granularity must be one of {', '.join(REPORT_GRANULARITIES)}"}), 400
+
+            if granularity != 'raw':
+                columns, preview_data = summarise_report(data, limit=10)
+                if not preview_data:
+                    return jsonify({'message': 'No data found for the selected criteria'}), 404
+                return jsonify({
+                    'columns': columns,
+                    'data': preview_data
+                })
 
-            if data.get('selectedRoads'):
-                query['streetName'] = {'$in': data['selectedRoads']}
+            query, query_date_range = build_report_query(data)
 
             traffic_data = list(historical_traffic_data.find(query, {'_id': 0})
                 .sort([
-                    ('date', 1),
-                    ('time', 1)
+                    ('timestamp', 1),
+                    ('streetName', 1)
                 ])
                 .limit(10))
 
@@ -2113,6 +4686,7 @@ def create_app(db_client=None):
                     'dateRange': 1,
                     'timeRange': 1,
                     'selectedRoads': 1,
+                    'granularity': 1,
                     'metadata': 1
                 }
             ).sort('metadata.generatedAt', -1))
@@ -2159,45 +4733,26 @@ def create_app(db_client=None):
             if not report:
                 return jsonify({'message': 'Report not found'}), 404
 
-            query = {}
-
-            if report.get('dateRange'):
-                date_range = report['dateRange']
-                if date_range.get('start'):
-                    query['date'] = {'$gte': date_range['start']}
-                if date_range.get('end'):
-                    if 'date' in query:
-                        query['date']['$lte'] = date_range['end']
-                    else:
-                        query['date'] = {'$lte': date_range['end']}
-
-            if report.get('timeRange'):
-                time_range = report['timeRange']
-                if time_range.get('start'):
-                    query['time'] = {'$gte': time_range['start']}
-                if time_range.get('end'):
-                    if 'time' in query:
-                        query['time']['$lte'] = time_range['end']
-                    else:
-                        query['time'] = {'$lte': time_range['end']}
-
-            if report.get('selectedRoads'):
-                query['streetName'] = {'$in': report['selectedRoads']}
-
-            data = list(historical_traffic_data.find(query, {'_id': 0}).sort([
-                ('date', 1),
-                ('time', 1)
-            ]))
-
-            if report['dataType'] == 'traffic':
-                columns = ['streetName', 'date', 'time', 'currentSpeed', 'freeFlowSpeed', 'intensity']
-            elif report['dataType'] == 'incidents':
-                columns = ['streetName', 'date', 'time', 'accidentCount', 'congestionCount', 'incidentCount']
-            elif report['dataType'] == 'congestion':
-                columns = ['streetName', 'date', 'time', 'intensity', 'currentSpeed', 'congestionCount']
+            granularity = report.get('granularity') or 'raw'
+            if granularity != 'raw':
+                columns, data = summarise_report(report)
             else:
-                columns = ['streetName', 'date', 'time', 'currentSpeed', 'freeFlowSpeed', 
-                          'intensity', 'accidentCount', 'congestionCount', 'incidentCount']
+                query, _ = build_report_query(report)
+
+                data = list(historical_traffic_data.find(query, {'_id': 0}).sort([
+                    ('timestamp', 1),
+                    ('streetName', 1)
+                ]))
+
+                if report['dataType'] == 'traffic':
+                    columns = ['streetName', 'date', 'time', 'currentSpeed', 'freeFlowSpeed', 'intensity']
+                elif report['dataType'] == 'incidents':
+                    columns = ['streetName', 'date', 'time', 'accidentCount', 'congestionCount', 'incidentCount']
+                elif report['dataType'] == 'congestion':
+                    columns = ['streetName', 'date', 'time', 'intensity', 'currentSpeed', 'congestionCount']
+                else:
+                    columns = ['streetName', 'date', 'time', 'currentSpeed', 'freeFlowSpeed', 
+                              'intensity', 'accidentCount', 'congestionCount', 'incidentCount']
 
             filtered_data = []
             for record in data:
@@ -2214,7 +4769,8 @@ def create_app(db_client=None):
                     'dateRange': report.get('dateRange'),
                     'timeRange': report.get('timeRange'),
                     'selectedRoads': report.get('selectedRoads'),
-                    'dataType': report['dataType']
+                    'dataType': report['dataType'],
+                    'granularity': granularity
                 },
                 'columns': columns,
                 'data': filtered_data
@@ -2266,46 +4822,77 @@ def create_app(db_client=None):
             date_obj = datetime.strptime(input_date, '%Y-%m-%d')
             formatted_date = date_obj.strftime('%d-%m-%Y')
 
+            # Both paths chart one point per hour and keep the whole hours whose
+            # HH:00 falls within the time range, so they agree on the same data
+            hour_bounds = whole_hour_bounds(start_time, end_time) if start_time and end_time else None
+
+            # Speed and congestion come from the per-hour stats of each road's daily rollup
+            traffic_rollup_daily = rollup_collection('traffic') if metric != 'incidents' else None
+            if traffic_rollup_daily is not None:
+                rollups = {
+                    rollup['streetName']: rollup
+                    for rollup in traffic_rollup_daily.find(
+                        {'streetName': {'$in': roads}, 'day': date_obj.strftime('%Y-%m-%d')},
+                        {'_id': 0, 'streetName': 1, 'hours': 1}
+                    )
+                }
+
+                analysis_data = {}
+                for road in roads:
+                    hours = (rollups.get(road) or {}).get('hours') or {}
+                    times = []
+                    values = []
+                    for hour in sorted(hours):
+                        time_label = f"{hour}:00"
+                        if hour_bounds and not hour_bounds[0] <= time_label <= hour_bounds[1]:
+                            continue
+                        stats = hours[hour]
+                        times.append(time_label)
+                        if metric == 'speed':
+                            values.append(stats['speedSum'] / stats['samples'])
+                        else:
+                            values.append((stats.get('high', 0) + 0.5 * stats.get('medium', 0)) / stats['samples'])
+                    analysis_data[road] = {'times': times, 'values': values}
+
+                return jsonify({
+                    'data': analysis_data,
+                    'metric': metric,
+                    'date': formatted_date,
+                    'timeRange': {'start': start_time, 'end': end_time}
+                })
+
             query = {
                 'streetName': {'$in': roads},
-                'date': formatted_date
+                'timestamp': build_timestamp_range(input_date, input_date, SGT)
             }
 
-            if start_time and end_time:
+            if hour_bounds:
                 query['time'] = {
-                    '$gte': start_time,
-                    '$lte': end_time
+                    '$gte': hour_bounds[0],
+                    '$lte': hour_bounds[1]
                 }
 
             data = list(historical_traffic_data.find(
                 query,
-                {'_id': 0, 'streetName': 1, 'time': 1, 'currentSpeed': 1, 'intensity': 1, 'road_id': 1}
-            ).sort([('time', 1)]))
+                {'_id': 0, 'streetName': 1, 'time': 1, 'currentSpeed': 1, 'intensity': 1, 'road_id': 1, 'timestamp': 1}
+            ).sort([('timestamp', 1)]))
 
             if metric == 'incidents':
-                for record in data:
-                    record_time = datetime.strptime(f"{formatted_date} {record['time']}", '%d-%m-%Y %H:%M')
-                    incidents = traffic_incidents.count_documents({
-                        'road_id': record.get('road_id'),
-                        'start_time': {
-                            '$gte': record_time - timedelta(minutes=30),
-                            '$lt': record_time + timedelta(minutes=30)
-                        }
-                    })
-                    record['incidents'] = incidents
+                counts = count_incidents_near(data, include_end=False)
+                for record, accident_count, congestion_count in zip(data, counts['ACCIDENT'], counts['CONGESTION']):
+                    record['incidents'] = int(accident_count + congestion_count)
 
             analysis_data = {}
             for road in roads:
                 road_data = [d for d in data if d['streetName'] == road]
-                analysis_data[road] = {
-                    'times': [d['time'] for d in road_data],
-                    'values': [
-                        d['currentSpeed'] if metric == 'speed'
-                        else d.get('incidents', 0) if metric == 'incidents'
-                        else 1 if d['intensity'] == 'high' else 0.5 if d['intensity'] == 'medium' else 0
-                        for d in road_data
-                    ]
-                }
+                times, values = hourly_series(
+                    (d['time'],
+                     d.get('currentSpeed') or 0 if metric == 'speed'
+                     else d.get('incidents', 0) if metric == 'incidents'
+                     else 1 if d.get('intensity') == 'high' else 0.5 if d.get('intensity') == 'medium' else 0)
+                    for d in road_data
+                )
+                analysis_data[road] = {'times': times, 'values': values}
 
             return jsonify({
                 'data': analysis_data,
@@ -2514,10 +5101,12 @@ def create_app(db_client=None):
     
     
     @app.route('/api/metrics', methods=['GET'])
+    @conditional_get(traffic_logs_version, traffic_data_version)
     def get_metrics():
+        """Ingestion totals, which only change when a cycle stores logs or traffic"""
         try:
             
-            total_roads = current_traffic_data.count_documents({})
+            total_roads = len(traffic_snapshots.get().records)
 
             successful_calls = traffic_logs.count_documents({"status": "success"})
 
@@ -2525,30 +5114,21 @@ def create_app(db_client=None):
 
             duplicates = traffic_logs.count_documents({"status": "duplicate"})
             
-            recent_log = traffic_logs.find_one(sort=[("date", -1), ("time", -1)])
-
-            if recent_log and "date" in recent_log and "time" in recent_log:
-                log_date = datetime.strptime(recent_log["date"], "%d-%m-%Y")
-                log_time = datetime.strptime(recent_log["time"], "%H:%M").time()
-                
-                # Combine log date and time in SGT (no conversion to UTC)
-                log_datetime = datetime.combine(log_date, log_time)
-                log_datetime = SGT.localize(log_datetime)  # Mark as Singapore Time
-
-                current_datetime = datetime.now(SGT)
-                # Get current time in Singapore Time
-                current_datetime = get_sgt_time()
-
-                latency = (current_datetime - log_datetime).total_seconds()
-            else:
-                latency = None
+            # The client works out the latency from this, so the response stays cacheable
+            recent_log = traffic_logs.find_one({"timestamp": {"$type": "date"}}, sort=[("timestamp", -1)])
+            latest_log_at = None
+            if recent_log:
+                timestamp = recent_log["timestamp"]
+                if timestamp.tzinfo is None:
+                    timestamp = pytz.utc.localize(timestamp)
+                latest_log_at = timestamp.astimezone(SGT).isoformat()
 
             metrics = {
                 "totalRoads": total_roads,
                 "successfulCalls": successful_calls,
                 "failedCalls": failed_calls,
                 "duplicates": duplicates,
-                "ingestionLatency": latency,
+                "latestLogAt": latest_log_at,
             }
 
             return jsonify(metrics), 200
@@ -2556,45 +5136,55 @@ def create_app(db_client=None):
         except Exception as e:
             return jsonify({"error": f"Failed to fetch metrics: {str(e)}"}), 500
 
+    @app.route('/api/metrics/live', methods=['GET'])
+    def get_live_metrics():
+        """In-process counters of the rate limiter, log sink, stream, route cache and report jobs"""
+        try:
+            response = jsonify({
+                "apiQuota": tomtom_rate_limiter.stats(),
+                "logBuffer": traffic_log_sink.stats(),
+                "stream": traffic_events.stats(),
+                "routeCache": route_cache.stats(),
+                "reportJobs": report_jobs.stats(),
+            })
+            # Counters move on every call, so they are never cached or revalidated
+            response.cache_control.no_store = True
+            return response, 200
+
+        except Exception as e:
+            return jsonify({"error": f"Failed to fetch live metrics: {str(e)}"}), 500
+
+
+    @app.route('/api/traffic/stream', methods=['GET'])
+    def stream_traffic_updates():
+        """Server-Sent Events feed of changed roads ('traffic') and new log entries ('logs')"""
+        last_event_id = request.headers.get('Last-Event-ID') or request.args.get('lastEventId')
+        try:
+            last_seq = int(last_event_id) if last_event_id else None
+        except ValueError:
+            return jsonify({'error': 'Invalid Last-Event-ID'}), 400
+
+        heartbeat = float(os.getenv('STREAM_HEARTBEAT_SECONDS', 15))
+        return Response(
+            traffic_events.stream(last_seq, heartbeat=heartbeat),
+            mimetype='text/event-stream',
+            headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+        )
 
     @app.route('/api/live-traffic-logs', methods=['GET'])
     def get_traffic_logs():
         try:
 
             logs_cursor = traffic_logs.find().sort("timestamp", -1).limit(50)
-            logs = []
-
-            for log in logs_cursor:
-                logs.append({
-                    "timestamp": log["timestamp"].strftime('%Y-%m-%d %H:%M:%S'),
-                    "roadName": log.get("roadName", "Unknown"),
-                    "status": log["status"],
-                    "message": log["message"]
-                })
+            logs = [format_traffic_log(log) for log in logs_cursor]
 
             return jsonify({"logs": logs}), 200
 
         except Exception as e:
             return jsonify({"error": f"Failed to fetch logs: {str(e)}"}), 500
 
-     
-    def log_traffic_activity(status, road_name, current_time, additional_info=None):
-        
-        log_entry = {
-            "timestamp": current_time,
-            "roadName": road_name,
-            "status": status,
-            "message": f"{status.upper()} for {road_name}",
-        }
-        if additional_info:
-            log_entry.update(additional_info)
-        try:
-            traffic_logs.insert_one(log_entry)
-        except Exception as e:
-            print(f"[LOGGING ERROR] Failed to log activity for {road_name}: {str(e)}")
-            
-            
     @app.route('/api/pie-chart-data', methods=['GET'])
+    @conditional_get(traffic_logs_version)
     def get_pie_chart_data():
         try:
             total_logs = traffic_logs.count_documents({})
@@ -2609,8 +5199,21 @@ def create_app(db_client=None):
             return jsonify({"error": f"Error fetching pie chart data: {str(e)}"}), 500
 
     @app.route('/api/line-chart-data', methods=['GET'])
+    @conditional_get(traffic_logs_version)
     def get_line_chart_data():
         try:  
+            ingestion_rollup_daily = rollup_collection('ingestion')
+            if ingestion_rollup_daily is not None:
+                days = list(ingestion_rollup_daily.find({}).sort('_id', 1))
+
+                return jsonify({
+                    "labels": [day["date"] for day in days],
+                    "datasets": [
+                        {"label": "Successful Calls", "data": [day.get("successful", 0) for day in days]},
+                        {"label": "Failed Calls", "data": [day.get("failed", 0) for day in days]},
+                        {"label": "Duplicate Calls", "data": [day.get("duplicates", 0) for day in days]},
+                    ]
+                }), 200
 
             pipeline = [
                 {
@@ -2686,6 +5289,18 @@ def create_app(db_client=None):
             return jsonify({"error": f"Error fetching line chart data: {str(e)}"}), 500
 
 
+    # 'csr' searches the full graph per query; 'cch' queries a contraction hierarchy
+    # that is customized with the new weights once per ingestion cycle
+    ROUTING_MODE = os.getenv('ROUTING_MODE', 'csr').lower()
+    ROUTE_ALTERNATIVE_PENALTY = float(os.getenv('ROUTE_ALTERNATIVE_PENALTY', 0.4))
+    ROUTE_ALTERNATIVE_MAX_OVERLAP = float(os.getenv('ROUTE_ALTERNATIVE_MAX_OVERLAP', 0.7))
+    ROUTE_ALTERNATIVE_MAX_STRETCH = float(os.getenv('ROUTE_ALTERNATIVE_MAX_STRETCH', 1.5))
+
+    def parse_departure_time(value):
+        """Aware departure time from an ISO 8601 string; times without an offset are Singapore time"""
+        departure = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+        return SGT.localize(departure) if departure.tzinfo is None else departure
+
     @app.route('/api/route', methods=['POST'])
     def calculate_route():
         try:
@@ -2711,16 +5326,33 @@ def create_app(db_client=None):
                     1.1 <= destination[0] <= 1.5 and 103.6 <= destination[1] <= 104.1):
                 return jsonify({'error': 'Coordinates outside Singapore bounds'}), 400
 
-            if not hasattr(app, 'routing_graph'):
-                print("Initializing routing graph...")
-                app.routing_graph = initialize_routing_graph()
-
-            route_result = calculate_route_with_alternatives(
-                app.routing_graph,
-                origin,
-                destination,
-                k=3
-            )
+            departure_time = None
+            if data.get('departureTime'):
+                try:
+                    departure_time = parse_departure_time(data['departureTime'])
+                except ValueError:
+                    return jsonify({'error': 'departureTime must be an ISO 8601 date and time'}), 400
+
+            if routing_state['status'] != 'ready':
+                return routing_not_ready()
+
+            if departure_time is not None:
+                if app.time_dependent_router is None:
+                    return jsonify({'error': 'Time-dependent routing needs historical speed profiles, '
+                                             'which are not available yet'}), 503
+                route_result = calculate_time_dependent_route(
+                    app.routing_csr,
+                    origin,
+                    destination,
+                    departure_time
+                )
+            else:
+                route_result = calculate_route_with_alternatives(
+                    app.routing_csr,
+                    origin,
+                    destination,
+                    k=3
+                )
 
             if not route_result:
                 return jsonify({'error': 'No route found'}), 404
@@ -2732,8 +5364,10 @@ def create_app(db_client=None):
             print(f"Error calculating route: {str(e)}")
             return jsonify({'error': str(e)}), 500
 
-    def initialize_routing_graph():
-        """Initialize the routing graph using OSMnx"""
+    ROUTING_GRAPH_CACHE = os.getenv('ROUTING_GRAPH_CACHE', './singapore_graph_cache')
+
+    def build_routing_graph():
+        """Build the routing graph from OSMnx, via the legacy pickle when one exists"""
         cache_file = './singapore_graph.pkl'
         
         if os.path.exists(cache_file):
@@ -2742,68 +5376,356 @@ def create_app(db_client=None):
         else:
             city = "Singapore"
             G_multi = ox.graph_from_place(city, network_type="drive")
-            with open(cache_file, 'wb') as f:
-                pickle.dump(G_multi, f)
         
         G = nx.DiGraph(G_multi)
         
-        for u, v, data in G.edges(data=True):
+        # 'eid' is the edge's position in RoutingWeights arrays, in G.edges() order
+        for eid, (u, v, data) in enumerate(G.edges(data=True)):
             if 'length' not in data:
                 data['length'] = 1000
+            data['eid'] = eid
         
-        return G
-
-    def get_road_congestion(current_speed, free_flow_speed):
-        """Calculate congestion factor based on current speed vs free flow speed"""
-        if free_flow_speed == 0:
-            return 1.0
-        ratio = current_speed / free_flow_speed
-        if ratio >= 0.8:
-            return 1.0
-        elif ratio >= 0.5:
-            return 2.0
-        else:
-            return 3.0
-        
-    def update_edge_weights(G):
-        """Update graph edge weights based on current traffic conditions"""
-        try:
-            traffic_data = list(current_traffic_data.find({}, {'_id': 0}))
-            
-            traffic_map = {}
-            for data in traffic_data:
-                coords = (data['coordinates']['lat'], data['coordinates']['lng'])
-                traffic_map[coords] = data
-
-            for u, v, data in G.edges(data=True):
-                edge_lat = (G.nodes[u]['y'] + G.nodes[v]['y']) / 2
-                edge_lng = (G.nodes[u]['x'] + G.nodes[v]['x']) / 2
-
-                nearest_traffic = None
-                min_distance = float('inf')
-                for coords, traffic in traffic_map.items():
-                    dist = ((edge_lat - coords[0])**2 + (edge_lng - coords[1])**2)**0.5
-                    if dist < min_distance:
-                        min_distance = dist
-                        nearest_traffic = traffic
-
-                if nearest_traffic and min_distance < 0.01:
-                    congestion_factor = get_road_congestion(
-                        nearest_traffic.get('currentSpeed', 0),
-                        nearest_traffic.get('freeFlowSpeed', 0)
-                    )
+        return CSRGraph.from_networkx(G)
+
+    def initialize_routing_graph():
+        """Load the routing graph from the memory-mapped array cache, building it on first use"""
+        try:
+            return CSRGraph.load(ROUTING_GRAPH_CACHE)
+        except FileNotFoundError:
+            print(f"[ROUTING] No graph cache at {ROUTING_GRAPH_CACHE}, building it")
+        except Exception as e:
+            print(f"[ROUTING] Ignoring unreadable graph cache at {ROUTING_GRAPH_CACHE}: {e}")
+
+        csr = build_routing_graph()
+        try:
+            csr.save(ROUTING_GRAPH_CACHE)
+            return CSRGraph.load(ROUTING_GRAPH_CACHE)
+        except Exception as e:
+            print(f"[ROUTING] Could not write graph cache: {e}")
+            return csr
+
+
+    ROUTING_RETRY_AFTER = int(os.getenv('ROUTING_RETRY_AFTER', 10))
+    ROUTE_BATCH_MAX_POINTS = int(os.getenv('ROUTE_BATCH_MAX_POINTS', 1000))
+    routing_state = {'status': 'cold', 'error': None, 'startedAt': None, 'readyAt': None}
+    routing_warmup_lock = threading.Lock()
+    # Loading the graph may download it from OSMnx, so apps given a client (tests) skip it
+    ROUTING_WARMUP = os.getenv('ROUTING_WARMUP', 'true' if db_client is None else 'false').lower() == 'true'
+
+    SPEED_PROFILE_DAYS = int(os.getenv('SPEED_PROFILE_DAYS', 28))
+    app.time_dependent_router = None
+
+    def build_time_dependent_router():
+        """Speed profiles from recent historical traffic and a router over them, or None without data"""
+        since = to_naive_utc(get_sgt_time() - timedelta(days=SPEED_PROFILE_DAYS))
+        # Mongo sums the window per road and slot, so at most roads x 672 groups reach Python
+        totals = historical_traffic_data.aggregate(speed_profile_pipeline(since, SGT), allowDiskUse=True)
+        profiles = SpeedProfiles.from_slot_totals(totals, SGT)
+        if not profiles.road_coords:
+            return None
+        return TimeDependentRouter(app.routing_csr, app.edge_sensor_index, profiles)
+
+    def refresh_speed_profiles():
+        """Rebuild the time-dependent router from the latest historical traffic"""
+        if getattr(app, 'edge_sensor_index', None) is None:
+            return
+        try:
+            started = time.time()
+            app.time_dependent_router = build_time_dependent_router()
+            if app.time_dependent_router is None:
+                print("[ROUTING] No historical traffic yet, time-dependent routing unavailable")
+            else:
+                print(f"[ROUTING] Speed profiles built for {len(app.time_dependent_router.profiles.road_coords)} roads "
+                      f"in {time.time() - started:.1f}s")
+        except Exception as e:
+            print(f"[ROUTING] Error building speed profiles: {e}")
+
+    scheduler.add_job(
+        func=refresh_speed_profiles,
+        trigger='cron',
+        hour=3,
+        minute=15,
+        id='refresh_speed_profiles',
+        name='Speed Profile Refresh',
+        misfire_grace_time=3600,
+        replace_existing=True
+    )
+
+    def calculate_time_dependent_route(csr, origin, destination, departure):
+        """Quickest route for a departure time, under historical speeds at each edge's arrival time"""
+        try:
+            router = app.time_dependent_router
+            origin_node = csr.nearest_node(float(origin[0]), float(origin[1]))
+            dest_node = csr.nearest_node(float(destination[0]), float(destination[1]))
+
+            result = router.earliest_arrival(origin_node, dest_node, departure)
+            if result is None:
+                print("No path exists between the given points")
+                return None
+            seconds, path, eids, entry_seconds = result
+
+            eids = np.asarray(eids, dtype=np.int64)
+            congestion = 0.0
+            if len(eids):
+                # Congestion along the way, judged at the slot each edge is entered
+                start = week_seconds(departure, SGT)
+                slots = ((start + np.asarray(entry_seconds)) // (PROFILE_SLOT_MINUTES * 60)).astype(np.int64)
+                sensors = router.edge_sensors[eids]
+                speeds = router.speed_table[sensors, slots % PROFILE_SLOTS_PER_WEEK] * 3.6
+                free_flow = np.append(router.profiles.free_flow, ROUTE_BASE_SPEED_KMH)[sensors]
+                congestion = (float(congestion_factors(speeds, free_flow).max()) - 1) / 2
+
+            arrival = departure + timedelta(seconds=seconds)
+            print(f"Time-dependent route: {len(eids)} edges, {seconds / 60:.1f} minutes, "
+                  f"departing {departure.isoformat()}")
+            return {
+                'coordinates': [[float(csr.lat[node]), float(csr.lng[node])] for node in path],
+                'distance': float(np.asarray(csr.lengths, dtype=float)[eids].sum()),
+                'time': seconds / 60,
+                'congestion': congestion,
+                'departureTime': departure.isoformat(),
+                'arrivalTime': arrival.isoformat(),
+                'alternatives': []
+            }
+
+        except Exception as e:
+            print(f"Error in time-dependent route calculation: {str(e)}")
+            return None
+
+    def warm_up_routing():
+        """Load the routing graph, its indexes and current weights, once per process"""
+        with routing_warmup_lock:
+            if routing_state['status'] == 'ready':
+                return
+            routing_state.update(status='warming', error=None, startedAt=datetime.now(pytz.utc))
+            try:
+                print("Initializing routing graph...")
+                routing_csr = initialize_routing_graph()
+                print(f"[ROUTING] Node snapping index built over {routing_csr.node_tree.n} nodes")
+                edge_sensor_index = EdgeSensorIndex(routing_csr)
+                if ROUTING_MODE == 'cch':
+                    started = time.time()
+                    app.routing_cch = ContractionHierarchy(routing_csr)
+                    print(f"[ROUTING] Contraction hierarchy built with {app.routing_cch.num_arcs} arcs "
+                          f"in {time.time() - started:.1f}s")
+                # Ingestion starts refreshing weights once the sensor index is set
+                app.edge_sensor_index = edge_sensor_index
+                app.routing_weights = None
+                app.routing_csr = routing_csr
+                get_routing_weights()
+                refresh_speed_profiles()
+                routing_state.update(status='ready', readyAt=datetime.now(pytz.utc))
+                print(f"[ROUTING] Routing graph ready with {routing_csr.num_nodes} nodes")
+            except Exception as e:
+                routing_state.update(status='failed', error=str(e))
+                print(f"[ROUTING] Warm-up failed: {e}")
+
+    def start_routing_warmup():
+        """Warm up routing in the background unless it is ready or already warming"""
+        if routing_state['status'] in ('cold', 'failed') and not routing_warmup_lock.locked():
+            threading.Thread(target=warm_up_routing, name='routing-warmup', daemon=True).start()
+
+    @app.route('/api/health/routing', methods=['GET'])
+    def routing_health():
+        """Readiness of the routing subsystem; 503 until the graph is loaded"""
+        health = {
+            'status': routing_state['status'],
+            'ready': routing_state['status'] == 'ready',
+            'mode': ROUTING_MODE,
+            'error': routing_state['error'],
+            'startedAt': routing_state['startedAt'].isoformat() if routing_state['startedAt'] else None,
+            'readyAt': routing_state['readyAt'].isoformat() if routing_state['readyAt'] else None
+        }
+        if health['ready']:
+            health.update(
+                nodes=app.routing_csr.num_nodes,
+                edges=len(app.routing_csr.lengths),
+                weightsVersion=app.routing_weights.version if app.routing_weights else None,
+                routeCache=route_cache.stats(),
+                speedProfiles=app.time_dependent_router.profiles.stats() if app.time_dependent_router else None
+            )
+            return jsonify(health), 200
+
+        response = jsonify(health)
+        response.headers['Retry-After'] = str(ROUTING_RETRY_AFTER)
+        return response, 503
+
+    def routing_not_ready():
+        if ROUTING_WARMUP:
+            start_routing_warmup()
+        response = jsonify({
+            'error': 'Routing is warming up, please retry shortly',
+            'status': routing_state['status']
+        })
+        response.headers['Retry-After'] = str(ROUTING_RETRY_AFTER)
+        return response, 503
+
+    @app.route('/api/route/snap', methods=['POST'])
+    def snap_to_road_network():
+        """Snap a list of [lat, lng] points to their nearest routing graph nodes in one query"""
+        try:
+            points = (request.json or {}).get('points')
+            if not points or not isinstance(points, list):
+                return jsonify({'error': 'A list of [lat, lng] points is required'}), 400
+            if len(points) > ROUTE_BATCH_MAX_POINTS:
+                return jsonify({'error': f'At most {ROUTE_BATCH_MAX_POINTS} points per request'}), 400
+            try:
+                coords = np.array(points, dtype=float).reshape(len(points), 2)
+            except (ValueError, TypeError):
+                return jsonify({'error': 'Invalid coordinate values'}), 400
+
+            if routing_state['status'] != 'ready':
+                return routing_not_ready()
+
+            csr = app.routing_csr
+            nodes, distances = csr.snap(coords[:, 0], coords[:, 1])
+            return jsonify({'snapped': [
+                {
+                    'node': int(csr.node_ids[node]),
+                    'coordinates': [float(csr.lat[node]), float(csr.lng[node])],
+                    'distance': float(distance)
+                }
+                for node, distance in zip(nodes, distances)
+            ]}), 200
+
+        except Exception as e:
+            print(f"Error snapping points: {str(e)}")
+            return jsonify({'error': str(e)}), 500
+
+    ROUTE_BATCH_MAX_CELLS = int(os.getenv('ROUTE_BATCH_MAX_CELLS', 20000))
+    ROUTE_BATCH_WORKERS = int(os.getenv('ROUTE_BATCH_WORKERS', min(4, os.cpu_count() or 1)))
+    ROUTE_BATCH_POOL_MIN_SOURCES = int(os.getenv('ROUTE_BATCH_POOL_MIN_SOURCES', 8))
+    route_pool_state = {'pool': None}
+    route_pool_lock = threading.Lock()
+
+    def get_route_pool():
+        """Process pool whose workers memory-map the routing graph cache, created on first use"""
+        with route_pool_lock:
+            if route_pool_state['pool'] is None:
+                route_pool_state['pool'] = ProcessPoolExecutor(
+                    max_workers=ROUTE_BATCH_WORKERS,
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=init_route_worker,
+                    initargs=(ROUTING_GRAPH_CACHE,)
+                )
+            return route_pool_state['pool']
+
+    def compute_route_searches(weights, searches):
+        """Run (source, targets) searches, spread over the process pool for large batches"""
+        use_pool = (ROUTE_BATCH_WORKERS > 1 and len(searches) >= ROUTE_BATCH_POOL_MIN_SOURCES
+                    and CSRGraph.is_cached(ROUTING_GRAPH_CACHE))
+        if use_pool:
+            try:
+                chunk_size = -(-len(searches) // ROUTE_BATCH_WORKERS)
+                futures = [
+                    get_route_pool().submit(route_search_worker, weights, searches[start:start + chunk_size])
+                    for start in range(0, len(searches), chunk_size)
+                ]
+                return [result for future in futures for result in future.result()]
+            except BrokenProcessPool as e:
+                print(f"[ROUTING] Route pool failed, computing inline: {e}")
+                with route_pool_lock:
+                    route_pool_state['pool'] = None
+        return run_route_searches(app.routing_csr, weights, searches)
+
+    def parse_route_points(points, label):
+        """(lats, lngs) arrays for a list of [lat, lng] points inside Singapore, or raise ValueError"""
+        if not isinstance(points, list) or not points:
+            raise ValueError(f"'{label}' must be a non-empty list of [lat, lng] points")
+        try:
+            coords = np.array(points, dtype=float).reshape(len(points), 2)
+        except (ValueError, TypeError):
+            raise ValueError(f"Invalid coordinate values in '{label}'")
+        inside = ((coords[:, 0] >= 1.1) & (coords[:, 0] <= 1.5) & (coords[:, 1] >= 103.6) & (coords[:, 1] <= 104.1))
+        if not inside.all():
+            raise ValueError(f"'{label}' point {int(np.argmin(inside))} is outside Singapore bounds")
+        return coords[:, 0], coords[:, 1]
+
+    def matrix_cell(value):
+        return float(value) if np.isfinite(value) else None
+
+    @app.route('/api/route/batch', methods=['POST'])
+    def calculate_route_batch():
+        """Travel times and distances under current congestion for many trips.
+
+        Accepts either {"pairs": [{"origin": [lat, lng], "destination": [lat, lng]}, ...]}
+        or a matrix request {"origins": [...], "destinations": [...]}.
+        """
+        try:
+            data = request.json or {}
+            try:
+                if 'pairs' in data:
+                    pairs = data['pairs']
+                    if not isinstance(pairs, list) or not pairs:
+                        raise ValueError("'pairs' must be a non-empty list")
+                    if not all(isinstance(pair, dict) for pair in pairs):
+                        raise ValueError("Each pair needs an 'origin' and a 'destination'")
+                    origin_lats, origin_lngs = parse_route_points([pair.get('origin') for pair in pairs], 'origin')
+                    dest_lats, dest_lngs = parse_route_points([pair.get('destination') for pair in pairs], 'destination')
+                    cells = len(pairs)
                 else:
-                    congestion_factor = 1.0
+                    origin_lats, origin_lngs = parse_route_points(data.get('origins'), 'origins')
+                    dest_lats, dest_lngs = parse_route_points(data.get('destinations'), 'destinations')
+                    cells = len(origin_lats) * len(dest_lats)
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+
+            if len(origin_lats) + len(dest_lats) > 2 * ROUTE_BATCH_MAX_POINTS or cells > ROUTE_BATCH_MAX_CELLS:
+                return jsonify({'error': f'At most {ROUTE_BATCH_MAX_CELLS} routes per request'}), 400
+
+            if routing_state['status'] != 'ready':
+                return routing_not_ready()
+
+            routing_weights = get_routing_weights()
+            csr = app.routing_csr
+            origin_nodes, _ = csr.snap(origin_lats, origin_lngs)
+            dest_nodes, _ = csr.snap(dest_lats, dest_lngs)
+
+            started = time.time()
+            if 'pairs' in data:
+                # Pairs sharing an origin share one search towards all of their destinations
+                targets_by_origin = {}
+                for origin_node, dest_node in zip(origin_nodes.tolist(), dest_nodes.tolist()):
+                    targets_by_origin.setdefault(origin_node, {})[dest_node] = None
+                searches = [(origin_node, list(targets)) for origin_node, targets in targets_by_origin.items()]
+                found = {}
+                for (origin_node, targets), (costs, lengths) in zip(
+                        searches, compute_route_searches(routing_weights.weights, searches)):
+                    for dest_node, cost, length in zip(targets, costs, lengths):
+                        found[(origin_node, dest_node)] = (cost, length)
+
+                results = []
+                for origin_node, dest_node in zip(origin_nodes.tolist(), dest_nodes.tolist()):
+                    cost, length = found[(origin_node, dest_node)]
+                    results.append({
+                        'time': matrix_cell(travel_minutes(cost)),
+                        'distance': matrix_cell(length),
+                        'reachable': bool(np.isfinite(cost))
+                    })
+                body = {'results': results}
+            else:
+                targets = dest_nodes.tolist()
+                sources = list(dict.fromkeys(origin_nodes.tolist()))
+                rows = dict(zip(sources, compute_route_searches(
+                    routing_weights.weights, [(source, targets) for source in sources])))
+                body = {
+                    'times': [[matrix_cell(value) for value in travel_minutes(rows[node][0])] for node in origin_nodes.tolist()],
+                    'distances': [[matrix_cell(value) for value in rows[node][1]] for node in origin_nodes.tolist()]
+                }
 
-                base_length = data.get('length', 1000)
-                data['weight'] = base_length * congestion_factor
+            print(f"[ROUTING] Batch of {cells} routes computed in {time.time() - started:.2f}s")
+            body['weightsVersion'] = routing_weights.version
+            return jsonify(body), 200
 
         except Exception as e:
-            print(f"Error updating edge weights: e")
+            print(f"Error calculating route batch: {str(e)}")
+            return jsonify({'error': str(e)}), 500
 
+    if ROUTING_WARMUP:
+        start_routing_warmup()
 
-    def calculate_route_with_alternatives(G, origin, destination, k=3):
-        """Calculate route with alternatives using networkx, considering both distance and congestion"""
+    def calculate_route_with_alternatives(csr, origin, destination, k=3):
+        """Calculate route with alternatives over the CSR routing graph, considering both distance and congestion"""
         try:
             if not all(isinstance(x, (int, float)) for x in origin + destination):
                 print("Invalid coordinates:", origin, destination)
@@ -2823,8 +5745,8 @@ def create_app(db_client=None):
 
             print(f"Finding route from ({origin_lat}, {origin_lng}) to ({dest_lat}, {dest_lng})")
 
-            origin_node = ox.nearest_nodes(G, origin_lng, origin_lat)
-            dest_node = ox.nearest_nodes(G, dest_lng, dest_lat)
+            origin_node = csr.nearest_node(origin_lat, origin_lng)
+            dest_node = csr.nearest_node(dest_lat, dest_lng)
 
             distance = ((origin_lat - dest_lat)**2 + (origin_lng - dest_lng)**2)**0.5
             
@@ -2837,99 +5759,120 @@ def create_app(db_client=None):
                     'warning': 'Points are very close together'
                 }
 
-            update_edge_weights(G)
+            routing_weights = get_routing_weights()
+            weights = routing_weights.weights
+
+            cache_key = (origin_node, dest_node, k, routing_weights.version)
+            cached = route_cache.get(cache_key)
+            if cached is not None:
+                print(f"Route served from cache for nodes {origin_node}->{dest_node}")
+                return cached
 
             routes = []
-            try:
-                print("\n=== Route Calculations ===")
-                route_counter = 1
-                
-                for path in nx.shortest_simple_paths(G, origin_node, dest_node, weight='weight'):
-                    if len(routes) >= k:
-                        break
+            print("\n=== Route Calculations ===")
+            route_counter = 1
+            
+            if routing_weights.cch_metric is not None:
+                engine, metric = app.routing_cch, routing_weights.cch_metric
+            else:
+                engine, metric = csr, weights
+            alternatives = engine.alternative_paths(
+                origin_node,
+                dest_node,
+                metric,
+                k=k,
+                penalty=ROUTE_ALTERNATIVE_PENALTY,
+                max_overlap=ROUTE_ALTERNATIVE_MAX_OVERLAP,
+                max_stretch=ROUTE_ALTERNATIVE_MAX_STRETCH
+            )
 
-                    coordinates = []
-                    path_length = 0
-                    total_time = 0
-                    congestion_level = 0
-                    total_weight = 0
-                    
-                    print(f"\nRoute {route_counter}:")
-                    print("-" * 50)
+            for alternative in alternatives:
+                path = alternative['nodes']
+                path_eids = alternative['eids']
+
+                coordinates = []
+                path_length = 0
+                total_time = 0
+                congestion_level = 0
+                total_weight = 0
+                
+                print(f"\nRoute {route_counter}:")
+                print("-" * 50)
+                
+                for u, v, eid in zip(path[:-1], path[1:], path_eids):
+                    source = csr.edge_sources[eid]
+                    lat = float(csr.lat[source])
+                    lng = float(csr.lng[source])
+                    coordinates.append([lat, lng])
                     
-                    for u, v in zip(path[:-1], path[1:]):
-                        lat = float(G.nodes[u]['y'])
-                        lng = float(G.nodes[u]['x'])
-                        coordinates.append([lat, lng])
-                        
-                        edge_data = G.get_edge_data(u, v)
-                        base_length = float(edge_data.get('length', 1000))  # in meters
-                        weight = float(edge_data.get('weight', base_length))
-                        
-                        # Print segment details
-                        print(f"Segment {u}->{v}:")
-                        print(f"  Base Length: {base_length:.2f}m")
-                        print(f"  Weight: {weight:.2f}")
-                        print(f"  Congestion Factor: {(weight/base_length):.2f}")
-                        
-                        path_length += base_length
-                        total_weight += weight
-                        congestion_factor = weight / base_length
-                        congestion_level = max(congestion_level, congestion_factor)
-                        
-                        # Calculate segment time:
-                        # base_length is in meters
-                        # Convert to km and calculate time in minutes
-                        # Assume base speed of 35 km/h adjusted by congestion
-                        speed_kmh = 35 * (1 / congestion_factor)  # speed in km/h
-                        segment_time = (base_length / 1000) / speed_kmh * 60  # Convert to minutes
-                        
-                        total_time += segment_time
-                        print(f"  Estimated Time: {segment_time:.2f} minutes")
+                    base_length = float(csr.lengths[eid])  # in meters
+                    weight = float(weights[eid])
                     
-                    # Add final node
-                    coordinates.append([float(G.nodes[path[-1]]['y']), float(G.nodes[path[-1]]['x'])])
+                    # Print segment details
+                    print(f"Segment {u}->{v}:")
+                    print(f"  Base Length: {base_length:.2f}m")
+                    print(f"  Weight: {weight:.2f}")
+                    print(f"  Congestion Factor: {(weight/base_length):.2f}")
                     
-                    # Print route summary
-                    print("\nRoute Summary:")
-                    print(f"Total Distance: {path_length/1000:.2f}km")
-                    print(f"Total Weight: {total_weight:.2f}")  
-                    print(f"Average Congestion: {congestion_level:.2f}")
-                    print(f"Estimated Time: {total_time:.2f} minutes")
-                    print("-" * 50)
+                    path_length += base_length
+                    total_weight += weight
+                    congestion_factor = weight / base_length
+                    congestion_level = max(congestion_level, congestion_factor)
                     
-                    routes.append({
-                        'coordinates': coordinates,
-                        'distance': path_length,
-                        'time': total_time,
-                        'congestion': (congestion_level - 1) / 2,
-                        'total_weight': total_weight
-                    })
+                    # Calculate segment time:
+                    # base_length is in meters
+                    # Convert to km and calculate time in minutes
+                    # Assume base speed of 35 km/h adjusted by congestion
+                    speed_kmh = 35 * (1 / congestion_factor)  # speed in km/h
+                    segment_time = (base_length / 1000) / speed_kmh * 60  # Convert to minutes
                     
-                    route_counter += 1
-
-                if not routes:
-                    print("No routes found")
-                    return None
-
-                print(f"\nFound {len(routes)} alternative routes")
-                return {
-                    'coordinates': routes[0]['coordinates'],
-                    'distance': routes[0]['distance'],
-                    'time': routes[0]['time'],
-                    'congestion': routes[0]['congestion'],
-                    'total_weight': routes[0]['total_weight'],
-                    'alternatives': routes[1:]
-                }
+                    total_time += segment_time
+                    print(f"  Estimated Time: {segment_time:.2f} minutes")
+                
+                # Add final node
+                coordinates.append([float(csr.lat[dest_node]), float(csr.lng[dest_node])])
+                
+                # Print route summary
+                print("\nRoute Summary:")
+                print(f"Total Distance: {path_length/1000:.2f}km")
+                print(f"Total Weight: {total_weight:.2f}")  
+                print(f"Average Congestion: {congestion_level:.2f}")
+                print(f"Estimated Time: {total_time:.2f} minutes")
+                print("-" * 50)
+                
+                routes.append({
+                    'coordinates': coordinates,
+                    'distance': path_length,
+                    'time': total_time,
+                    'congestion': (congestion_level - 1) / 2,
+                    'total_weight': total_weight
+                })
+                
+                route_counter += 1
 
-            except nx.NetworkXNoPath:
-                print("No path exists between the given points")
+            if not routes:
+                print("No routes found")
                 return None
 
+            print(f"\nFound {len(routes)} alternative routes")
+            result = {
+                'coordinates': routes[0]['coordinates'],
+                'distance': routes[0]['distance'],
+                'time': routes[0]['time'],
+                'congestion': routes[0]['congestion'],
+                'total_weight': routes[0]['total_weight'],
+                'alternatives': routes[1:]
+            }
+            route_cache.put(cache_key, result)
+            return result
+
         except Exception as e:
             print(f"Error in route calculation: {str(e)}")
             return None
 
+    # Sizes cover every collection, not just the versioned ones, so cache briefly instead of validating
+    STORAGE_METRICS_MAX_AGE = int(os.getenv('STORAGE_METRICS_MAX_AGE', 60))
+
     @app.route('/api/storage-metrics', methods=['GET'])
     def get_storage_metrics():
         try:
@@ -2971,7 +5914,7 @@ def create_app(db_client=None):
             print(f"Usage Percentage: {(total_size/TOTAL_SIZE)*100:.2f}%")
             print(f"Collections count: {len(collections)}")
             
-            return jsonify({
+            response = jsonify({
                 'totalSize': TOTAL_SIZE,
                 'usedSize': total_size,
                 'databases': database_stats,
@@ -2982,6 +5925,8 @@ def create_app(db_client=None):
                     'clusterName': cluster_stats.get('clustername', 'FlowX-Application')
                 }
             })
+            response.cache_control.max_age = STORAGE_METRICS_MAX_AGE
+            return response
 
         except Exception as e:
             print(f"Error fetching storage metrics: {str(e)}")
@@ -0,0 +1,120 @@
+"""Compare route alternatives from networkx (Yen's k-shortest simple paths), CSRGraph and ContractionHierarchy.
+
+Usage, from FYP-Code:
+    python benchmarks/benchmark_routing.py --graph ./singapore_graph_cache --queries 50
+
+--graph is the app's CSR graph cache (ROUTING_GRAPH_CACHE), which the app
+writes the first time it warms up routing.
+
+Reports per-query latency and the diversity of the k routes returned
+(mean pairwise overlap and cost stretch against the best route).
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from itertools import combinations, islice
+
+import networkx as nx
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from app import CSRGraph, ContractionHierarchy, RoutingWeights, route_overlap
+
+
+def congested_weights(csr, seed):
+    """Edge lengths scaled by a random congestion factor of 1, 2 or 3"""
+    rng = np.random.default_rng(seed)
+    lengths = np.asarray(csr.lengths, dtype=float)
+    return RoutingWeights(0, lengths * rng.choice([1.0, 2.0, 3.0], size=len(lengths), p=[0.7, 0.2, 0.1]))
+
+
+def eids_of(G, path):
+    return [G.edges[u, v]['eid'] for u, v in zip(path, path[1:])]
+
+
+def diversity(lengths, weights, routes):
+    """Mean pairwise overlap and mean cost stretch of the alternatives"""
+    overlaps = [route_overlap(lengths, a, b) for a, b in combinations(routes, 2)]
+    costs = [weights[eids].sum() for eids in routes]
+    stretches = [cost / costs[0] for cost in costs[1:]]
+    return (np.mean(overlaps) if overlaps else np.nan, np.mean(stretches) if stretches else np.nan)
+
+
+def run_networkx(G, weights, source, target, k):
+    paths = islice(nx.shortest_simple_paths(G, source, target, weight=weights.weight_function()), k)
+    return [eids_of(G, path) for path in paths]
+
+
+def run_csr(csr, weights, source, target, k):
+    routes = csr.alternative_paths(csr.node_index[source], csr.node_index[target], weights.weights, k=k)
+    return [route['eids'] for route in routes]
+
+
+def run_cch(cch, metric, csr, source, target, k):
+    routes = cch.alternative_paths(csr.node_index[source], csr.node_index[target], metric, k=k)
+    return [route['eids'] for route in routes]
+
+
+def summarise(name, timings, diversities, routes_found):
+    timings = np.array(timings) * 1000
+    overlaps = np.array([overlap for overlap, _ in diversities])
+    stretches = np.array([stretch for _, stretch in diversities])
+    print(f"{name:<10} median {np.median(timings):9.1f} ms   p95 {np.percentile(timings, 95):9.1f} ms   "
+          f"routes {np.mean(routes_found):.2f}   overlap {np.nanmean(overlaps):.2f}   "
+          f"stretch {np.nanmean(stretches):.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--graph', default=os.getenv('ROUTING_GRAPH_CACHE', './singapore_graph_cache'))
+    parser.add_argument('--queries', type=int, default=20)
+    parser.add_argument('--k', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--skip-networkx', action='store_true', help='do not time networkx')
+    parser.add_argument('--cch', action='store_true', help='also time the contraction hierarchy')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    csr = CSRGraph.load(args.graph)
+    weights = congested_weights(csr, args.seed)
+    print(f"Graph: {csr.num_nodes} nodes, {len(csr.lengths)} edges "
+          f"(CSR loaded in {time.perf_counter() - start:.2f}s)")
+
+    rng = random.Random(args.seed)
+    nodes = csr.node_ids.tolist()
+    queries = []
+    while len(queries) < args.queries:
+        source, target = rng.sample(nodes, 2)
+        if csr.shortest_path(csr.node_index[source], csr.node_index[target], weights.weights) is not None:
+            queries.append((source, target))
+
+    engines = [('csr', lambda s, t: run_csr(csr, weights, s, t, args.k))]
+    if args.cch:
+        start = time.perf_counter()
+        cch = ContractionHierarchy(csr)
+        print(f"CCH: {cch.num_arcs} arcs, {cch.num_triangles} triangles "
+              f"(preprocessed in {time.perf_counter() - start:.2f}s)")
+        start = time.perf_counter()
+        metric = cch.customize(weights.weights)
+        print(f"CCH customization: {(time.perf_counter() - start) * 1000:.1f} ms")
+        engines.append(('cch', lambda s, t: run_cch(cch, metric, csr, s, t, args.k)))
+    if not args.skip_networkx:
+        G = csr.to_networkx()
+        engines.append(('networkx', lambda s, t: run_networkx(G, weights, s, t, args.k)))
+
+    for name, run in engines:
+        timings, diversities, routes_found = [], [], []
+        for source, target in queries:
+            start = time.perf_counter()
+            routes = run(source, target)
+            timings.append(time.perf_counter() - start)
+            routes_found.append(len(routes))
+            diversities.append(diversity(csr.lengths, weights.weights, routes))
+        summarise(name, timings, diversities, routes_found)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,409 @@
+"""CSR routing graph, its cache format and the batch route worker entry points.
+
+Kept apart from app.py so /api/route/batch pool workers, which are spawned
+processes, only import NumPy and SciPy instead of the whole app with
+TensorFlow, PyTorch and OSMnx.
+"""
+import heapq
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+from scipy.spatial import cKDTree
+
+EARTH_RADIUS_M = 6371000
+
+def haversine_m(lat1, lng1, lat2, lng2):
+    """Great-circle distance in metres, vectorised over NumPy arrays"""
+    lat1, lng1, lat2, lng2 = map(np.radians, (lat1, lng1, lat2, lng2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+class CSRGraph:
+    """Compact forward and reverse adjacency arrays for the routing graph.
+
+    Nodes are renumbered 0..n-1 (node_ids maps back to OSM ids). Every CSR
+    slot keeps the edge's 'eid', so RoutingWeights arrays apply directly.
+    The arrays can be saved as .npy files and memory-mapped back, so workers
+    share one copy of the graph and never need NetworkX to route.
+    """
+
+    ARRAYS = ('node_ids', 'lat', 'lng', 'indptr', 'targets', 'eids', 'rindptr', 'rsources', 'reids',
+              'edge_sources', 'edge_targets', 'lengths')
+    CACHE_FORMAT = 1
+
+    def __init__(self, node_ids, lat, lng, indptr, targets, eids, rindptr, rsources, reids,
+                 edge_sources, edge_targets, lengths):
+        self.node_ids = node_ids
+        self.lat, self.lng = lat, lng
+        self.indptr, self.targets, self.eids = indptr, targets, eids
+        self.rindptr, self.rsources, self.reids = rindptr, rsources, reids
+        self.edge_sources, self.edge_targets = edge_sources, edge_targets
+        self.lengths = lengths
+        self._node_index = None
+        self._node_tree = None
+        self._adjacency = None
+        self._slot_lengths = None
+        self._slot_weights = (None, None, None)
+
+    @classmethod
+    def from_edges(cls, node_ids, lat, lng, sources, targets, eids, lengths):
+        """Build from per-edge source and target node indexes"""
+        n = len(node_ids)
+        sources = np.asarray(sources, dtype=np.int64)
+        targets = np.asarray(targets, dtype=np.int64)
+        eids = np.asarray(eids, dtype=np.int64)
+
+        order = np.argsort(sources, kind='stable')
+        reverse_order = np.argsort(targets, kind='stable')
+        edge_sources = np.zeros(len(eids), dtype=np.int64)
+        edge_targets = np.zeros(len(eids), dtype=np.int64)
+        edge_sources[eids] = sources
+        edge_targets[eids] = targets
+
+        return cls(
+            np.asarray(node_ids, dtype=np.int64),
+            np.asarray(lat, dtype=float),
+            np.asarray(lng, dtype=float),
+            np.concatenate([[0], np.cumsum(np.bincount(sources, minlength=n))]),
+            targets[order],
+            eids[order],
+            np.concatenate([[0], np.cumsum(np.bincount(targets, minlength=n))]),
+            sources[reverse_order],
+            eids[reverse_order],
+            edge_sources,
+            edge_targets,
+            np.asarray(lengths, dtype=np.float32)
+        )
+
+    @classmethod
+    def from_networkx(cls, G):
+        """Build from a DiGraph with integer node ids whose edges carry 'eid' and 'length'"""
+        node_ids = list(G.nodes())
+        index = {node: i for i, node in enumerate(node_ids)}
+        sources, targets, eids = [], [], []
+        lengths = np.full(G.number_of_edges(), 1000.0)
+        for position, (u, v, data) in enumerate(G.edges(data=True)):
+            eid = data.get('eid', position)
+            sources.append(index[u])
+            targets.append(index[v])
+            eids.append(eid)
+            lengths[eid] = data.get('length', 1000)
+        lat = [G.nodes[node]['y'] for node in node_ids]
+        lng = [G.nodes[node]['x'] for node in node_ids]
+        return cls.from_edges(node_ids, lat, lng, sources, targets, eids, lengths)
+
+    CACHE_POINTER = 'CURRENT'
+
+    def save(self, directory):
+        """Write the arrays as .npy files into a new version under directory and point the cache at it.
+
+        The switch is an os.replace of a small pointer file, so readers see
+        either the old or the new version. Versions older than the one
+        replaced are removed when the OS allows it; a version that is still
+        memory-mapped elsewhere (Windows refuses to delete those) is kept.
+        """
+        os.makedirs(directory, exist_ok=True)
+        version = f"v{time.time_ns()}-{os.getpid()}"
+        version_dir = os.path.join(directory, version)
+        os.makedirs(version_dir)
+        for name in self.ARRAYS:
+            np.save(os.path.join(version_dir, f"{name}.npy"), np.ascontiguousarray(getattr(self, name)))
+        with open(os.path.join(version_dir, 'meta.json'), 'w') as f:
+            json.dump({'format': self.CACHE_FORMAT, 'nodes': self.num_nodes, 'edges': len(self.lengths)}, f)
+
+        previous = self._current_version(directory)
+        pointer = os.path.join(directory, self.CACHE_POINTER)
+        staging = f"{pointer}.{version}.tmp"
+        with open(staging, 'w') as f:
+            f.write(version)
+        os.replace(staging, pointer)
+
+        # A reader may have read the old pointer but not mapped its arrays yet, so keep that version
+        for name in os.listdir(directory):
+            path = os.path.join(directory, name)
+            if name.startswith('v') and name not in (version, previous) and os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
+
+    @classmethod
+    def is_cached(cls, directory):
+        """Whether directory holds a saved graph, versioned or in the old flat layout"""
+        return (os.path.exists(os.path.join(directory, cls.CACHE_POINTER))
+                or os.path.exists(os.path.join(directory, 'meta.json')))
+
+    @classmethod
+    def _current_version(cls, directory):
+        try:
+            with open(os.path.join(directory, cls.CACHE_POINTER)) as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    @classmethod
+    def load(cls, directory, mmap_mode='r'):
+        """Load a saved graph, memory-mapping the arrays read-only by default"""
+        version = cls._current_version(directory)
+        # Caches written before versioning keep their arrays directly in directory
+        version_dir = os.path.join(directory, version) if version else directory
+        with open(os.path.join(version_dir, 'meta.json')) as f:
+            meta = json.load(f)
+        if meta.get('format') != cls.CACHE_FORMAT:
+            raise ValueError(f"Unsupported routing graph cache format: {meta.get('format')}")
+        arrays = {name: np.load(os.path.join(version_dir, f"{name}.npy"), mmap_mode=mmap_mode)
+                  for name in cls.ARRAYS}
+        return cls(**arrays)
+
+    def to_networkx(self):
+        """DiGraph with the same node ids, coordinates, 'length' and 'eid', for code that needs NetworkX"""
+        import networkx as nx
+
+        G = nx.DiGraph()
+        node_ids = self.node_ids.tolist()
+        for node, lat, lng in zip(node_ids, self.lat.tolist(), self.lng.tolist()):
+            G.add_node(node, y=lat, x=lng)
+        for eid, (u, v, length) in enumerate(zip(self.edge_sources.tolist(), self.edge_targets.tolist(),
+                                                 self.lengths.tolist())):
+            G.add_edge(node_ids[u], node_ids[v], length=length, eid=eid)
+        return G
+
+    @property
+    def num_nodes(self):
+        return len(self.node_ids)
+
+    @property
+    def node_index(self):
+        """Node index for each original node id"""
+        if self._node_index is None:
+            self._node_index = {node: i for i, node in enumerate(self.node_ids.tolist())}
+        return self._node_index
+
+    def _project(self, lats, lngs):
+        """Equirectangular projection in degrees of latitude, accurate at city scale"""
+        lng_scale = np.cos(np.radians(self._reference_lat))
+        return np.column_stack([np.asarray(lats, dtype=float), np.asarray(lngs, dtype=float) * lng_scale])
+
+    @property
+    def node_tree(self):
+        """KD-tree over node coordinates, built once and kept with the graph"""
+        if self._node_tree is None:
+            self._reference_lat = float(np.mean(self.lat)) if self.num_nodes else 0.0
+            self._node_tree = cKDTree(self._project(self.lat, self.lng))
+        return self._node_tree
+
+    def snap(self, lats, lngs):
+        """Nearest node index and distance in metres for each of many coordinates"""
+        tree = self.node_tree
+        distances, nodes = tree.query(self._project(np.atleast_1d(lats), np.atleast_1d(lngs)))
+        return nodes.astype(np.int64), distances * (np.pi / 180 * EARTH_RADIUS_M)
+
+    def nearest_node(self, lat, lng):
+        """Index of the node closest to a coordinate"""
+        nodes, _ = self.snap([lat], [lng])
+        return int(nodes[0])
+
+    def adjacency(self):
+        """Forward and reverse adjacency as Python lists, which are much faster than
+        NumPy scalars inside the search loops. Built on first use."""
+        if self._adjacency is None:
+            self._adjacency = (
+                (self.indptr.tolist(), self.targets.tolist()),
+                (self.rindptr.tolist(), self.rsources.tolist())
+            )
+        return self._adjacency
+
+    def slot_weights(self, weights, cache=True):
+        """Forward and reverse per-slot weight lists, cached for the last weights array.
+
+        cache=False converts one-off weights without evicting the cached pair.
+        """
+        cached_weights, forward, reverse = self._slot_weights
+        if cached_weights is not weights:
+            forward = weights[self.eids].tolist()
+            reverse = weights[self.reids].tolist()
+            if cache:
+                self._slot_weights = (weights, forward, reverse)
+        return forward, reverse
+
+    def distances_to(self, node, scale=1.0):
+        """Straight-line metres from every node to one node, as a lower bound on weight"""
+        return scale * haversine_m(self.lat, self.lng, self.lat[node], self.lng[node])
+
+    def shortest_path(self, source, target, weights, potentials=None, cache_weights=True):
+        """Bidirectional A* between node indexes under an eid-indexed weights array.
+
+        potentials defaults to the average of the haversine bounds to target and
+        from source, which keeps both searches consistent. Returns (cost, nodes,
+        eids) or None when target is unreachable.
+        """
+        if potentials is None:
+            potentials = self.potentials(source, target)
+        forward_weights, reverse_weights = self.slot_weights(weights, cache_weights)
+        return self._bidirectional_search(source, target, forward_weights, reverse_weights, potentials)
+
+    def one_to_many(self, source, targets, weights):
+        """Costs and lengths from one node to many, sharing a single Dijkstra search tree.
+
+        The search stops once every target is settled. Unreachable targets get
+        an infinite cost and a NaN length.
+        """
+        forward_weights, _ = self.slot_weights(weights)
+        (indptr, node_targets), _ = self.adjacency()
+        if self._slot_lengths is None:
+            self._slot_lengths = np.asarray(self.lengths, dtype=float)[self.eids].tolist()
+        slot_lengths = self._slot_lengths
+        inf = float('inf')
+
+        remaining = set(targets)
+        dist = {source: 0.0}
+        length = {source: 0.0}
+        heap = [(0.0, source)]
+        while heap and remaining:
+            d, u = heapq.heappop(heap)
+            if d > dist[u]:
+                continue
+            remaining.discard(u)
+            for slot in range(indptr[u], indptr[u + 1]):
+                v = node_targets[slot]
+                nd = d + forward_weights[slot]
+                if nd < dist.get(v, inf):
+                    dist[v] = nd
+                    length[v] = length[u] + slot_lengths[slot]
+                    heapq.heappush(heap, (nd, v))
+
+        costs = np.array([dist.get(target, inf) for target in targets], dtype=float)
+        lengths = np.array([length.get(target, np.nan) for target in targets], dtype=float)
+        return costs, lengths
+
+    def potentials(self, source, target, scale=0.99):
+        return ((self.distances_to(target, scale) - self.distances_to(source, scale)) / 2).tolist()
+
+    def _bidirectional_search(self, source, target, forward_weights, reverse_weights, potentials):
+        if source == target:
+            return 0.0, [source], []
+
+        (indptr, targets), (rindptr, rsources) = self.adjacency()
+        inf = float('inf')
+
+        dist_f, dist_r = {source: 0.0}, {target: 0.0}
+        pred_f, pred_r = {source: None}, {target: None}
+        heap_f, heap_r = [(potentials[source], source)], [(-potentials[target], target)]
+        best, meet = inf, None
+
+        while heap_f and heap_r:
+            if heap_f[0][0] + heap_r[0][0] >= best:
+                break
+
+            if heap_f[0][0] <= heap_r[0][0]:
+                key, u = heapq.heappop(heap_f)
+                du = dist_f[u]
+                if key > du + potentials[u]:
+                    continue
+                for slot in range(indptr[u], indptr[u + 1]):
+                    v = targets[slot]
+                    nd = du + forward_weights[slot]
+                    if nd < dist_f.get(v, inf):
+                        dist_f[v] = nd
+                        pred_f[v] = (u, slot)
+                        heapq.heappush(heap_f, (nd + potentials[v], v))
+                        if v in dist_r and nd + dist_r[v] < best:
+                            best, meet = nd + dist_r[v], v
+            else:
+                key, u = heapq.heappop(heap_r)
+                du = dist_r[u]
+                if key > du - potentials[u]:
+                    continue
+                for slot in range(rindptr[u], rindptr[u + 1]):
+                    v = rsources[slot]
+                    nd = du + reverse_weights[slot]
+                    if nd < dist_r.get(v, inf):
+                        dist_r[v] = nd
+                        pred_r[v] = (u, slot)
+                        heapq.heappush(heap_r, (nd - potentials[v], v))
+                        if v in dist_f and nd + dist_f[v] < best:
+                            best, meet = nd + dist_f[v], v
+
+        if meet is None:
+            return None
+
+        nodes, eids = [meet], []
+        node = meet
+        while pred_f[node] is not None:
+            node, slot = pred_f[node]
+            nodes.append(node)
+            eids.append(int(self.eids[slot]))
+        nodes.reverse()
+        eids.reverse()
+        node = meet
+        while pred_r[node] is not None:
+            node, slot = pred_r[node]
+            nodes.append(node)
+            eids.append(int(self.reids[slot]))
+        return best, nodes, eids
+
+    def alternative_paths(self, source, target, weights, k=3, penalty=0.4,
+                          max_overlap=0.7, max_stretch=1.5, max_iterations=None):
+        """Up to k routes from source to target by the penalty method.
+
+        After each search the edges of the path found are made (1 + penalty)
+        times more expensive. A candidate is kept only if its real cost is
+        within max_stretch of the best route and its route_overlap with every
+        route already kept is at most max_overlap. Returns dicts with
+        'nodes' (original node ids), 'eids' and 'cost', best first.
+        """
+        weights = np.asarray(weights, dtype=float)
+        potentials = self.potentials(source, target)
+        penalized = weights
+        routes = []
+
+        for _ in range(max_iterations or 3 * k):
+            # Penalized arrays are used once, so they must not evict the live weights' slot lists
+            result = self.shortest_path(source, target, penalized, potentials, cache_weights=penalized is weights)
+            if result is None:
+                break
+            _, nodes, eids = result
+            eid_array = np.asarray(eids, dtype=np.int64)
+            cost = float(weights[eid_array].sum())
+
+            if self._is_distinct(eid_array, cost, routes, max_overlap, max_stretch):
+                routes.append({'nodes': self.node_ids[nodes].tolist(), 'eids': eids, 'cost': cost})
+                if len(routes) >= k:
+                    break
+
+            if not len(eid_array):
+                break
+            penalized = penalized.copy()
+            penalized[eid_array] *= 1 + penalty
+
+        return routes
+
+    def _is_distinct(self, eid_array, cost, routes, max_overlap, max_stretch):
+        if not routes:
+            return True
+        if cost > max_stretch * routes[0]['cost']:
+            return False
+        return all(route_overlap(self.lengths, eid_array, route['eids']) <= max_overlap for route in routes)
+
+def route_overlap(lengths, eids_a, eids_b):
+    """Share of the shorter route's length that it has in common with the other route"""
+    eids_a, eids_b = np.unique(eids_a), np.unique(eids_b)
+    shorter = min(lengths[eids_a].sum(), lengths[eids_b].sum())
+    if not shorter:
+        return 1.0
+    return float(lengths[np.intersect1d(eids_a, eids_b)].sum() / shorter)
+
+def run_route_searches(csr, weights, searches):
+    """(costs, lengths) for each (source, targets) search, one search tree per source"""
+    return [csr.one_to_many(source, targets, weights) for source, targets in searches]
+
+_route_worker_graph = None
+
+def init_route_worker(cache_directory):
+    """Process pool initializer: memory-map the routing graph cache once per worker"""
+    global _route_worker_graph
+    _route_worker_graph = CSRGraph.load(cache_directory)
+
+def route_search_worker(weights, searches):
+    """Process pool task: run searches over this worker's graph"""
+    return run_route_searches(_route_worker_graph, weights, searches)
@@ -0,0 +1,140 @@
+import unittest
+from unittest.mock import MagicMock, Mock, patch
+import sys
+import os
+from datetime import datetime
+import threading
+import mongomock
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# Mock APScheduler
+sys.modules['apscheduler.schedulers.background'] = MagicMock()
+sys.modules['apscheduler'] = MagicMock()
+
+from app import BufferedLogSink, create_app
+
+class TestBufferedLogSink(unittest.TestCase):
+    def setUp(self):
+        # Mock MongoDB collection
+        self.mock_traffic_logs = mongomock.MongoClient().db.logs
+        self.sinks = []
+
+    def tearDown(self):
+        for sink in self.sinks:
+            sink.close()
+
+    def make_sink(self, collection=None, **kwargs):
+        kwargs.setdefault('flush_interval', 60)
+        sink = BufferedLogSink(collection or self.mock_traffic_logs, **kwargs)
+        self.sinks.append(sink)
+        return sink
+
+    def make_entry(self, road_name, status='success'):
+        return {
+            "timestamp": datetime.now(),
+            "roadName": road_name,
+            "status": status,
+            "message": f"{status.upper()} for {road_name}"
+        }
+
+    def test_write_does_not_touch_mongo(self):
+        """Test that writing a log only buffers it"""
+        collection = Mock()
+        sink = self.make_sink(collection, batch_size=100)
+
+        self.assertTrue(sink.write(self.make_entry("Orchard Road")))
+
+        collection.insert_many.assert_not_called()
+        self.assertEqual(sink.stats()['buffered'], 1)
+
+    def test_flush_uses_insert_many_batches(self):
+        """Test that a flush writes the buffer in insert_many batches"""
+        collection = Mock()
+        sink = self.make_sink(collection, batch_size=100)
+
+        for road in ["Orchard Road", "Marina Bay", "Bukit Timah Road"]:
+            sink.write(self.make_entry(road))
+
+        sink.batch_size = 2
+        self.assertEqual(sink.flush(), 3)
+        self.assertEqual(collection.insert_many.call_count, 2)
+        self.assertEqual(len(collection.insert_many.call_args_list[0][0][0]), 2)
+        self.assertEqual(sink.stats()['written'], 3)
+
+    def test_background_flush_by_size(self):
+        """Test that reaching the batch size wakes the writer thread"""
+        flushed = threading.Event()
+        sink = self.make_sink(batch_size=2, on_flush=lambda batch: flushed.set())
+
+        sink.write(self.make_entry("Orchard Road"))
+        sink.write(self.make_entry("Marina Bay", status='failure'))
+
+        self.assertTrue(flushed.wait(5))
+        self.assertEqual(self.mock_traffic_logs.count_documents({}), 2)
+        self.assertEqual(self.mock_traffic_logs.count_documents({'status': 'failure'}), 1)
+
+    def test_drop_policy_when_buffer_full(self):
+        """Test that entries are dropped once the buffer is full"""
+        sink = self.make_sink(Mock(), batch_size=100, max_buffer=2)
+
+        self.assertTrue(sink.write(self.make_entry("Orchard Road")))
+        self.assertTrue(sink.write(self.make_entry("Marina Bay")))
+        self.assertFalse(sink.write(self.make_entry("Bukit Timah Road")))
+
+        self.assertEqual(sink.stats()['dropped'], 1)
+
+    def test_failed_insert_is_counted(self):
+        """Test that a Mongo failure is counted and does not raise"""
+        collection = Mock()
+        collection.insert_many.side_effect = Exception("Database error")
+        sink = self.make_sink(collection, batch_size=100)
+
+        sink.write(self.make_entry("Orchard Road"))
+
+        self.assertEqual(sink.flush(), 0)
+        self.assertEqual(sink.stats()['failed'], 1)
+
+    def test_close_flushes_remaining_entries(self):
+        """Test that closing the sink writes what is still buffered"""
+        sink = self.make_sink(batch_size=100)
+
+        sink.write(self.make_entry("Orchard Road"))
+        sink.close()
+
+        self.assertEqual(self.mock_traffic_logs.count_documents({}), 1)
+        self.assertFalse(sink.thread.is_alive())
+
+    def test_thread_starts_on_first_write(self):
+        """Test that an unused sink runs no thread and registers no shutdown hook"""
+        with patch('atexit.register') as register:
+            sink = self.make_sink()
+            self.assertIsNone(sink.thread)
+            register.assert_not_called()
+
+            sink.write(self.make_entry("Orchard Road"))
+
+        self.assertTrue(sink.thread.is_alive())
+        register.assert_called_once_with(sink.close)
+
+    def test_close_unregisters_shutdown_hook(self):
+        """Test that a closed sink is not kept alive by its shutdown hook"""
+        sink = self.make_sink()
+        sink.write(self.make_entry("Orchard Road"))
+
+        with patch('atexit.unregister') as unregister:
+            sink.close()
+
+        unregister.assert_called_once_with(sink.close)
+
+    def test_app_sink_can_be_stopped(self):
+        """Test that an app's log sink is reachable so tests can stop its thread"""
+        with patch('gridfs.GridFS'):
+            app = create_app(db_client=mongomock.MongoClient())
+
+        sink = app.traffic_log_sink
+        sink.close()
+
+        self.assertTrue(sink.thread is None or not sink.thread.is_alive())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,52 @@
+import unittest
+from unittest.mock import MagicMock
+import sys
+import os
+from datetime import datetime
+import pytz
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# Mock APScheduler
+sys.modules['apscheduler.schedulers.background'] = MagicMock()
+sys.modules['apscheduler'] = MagicMock()
+
+from app import build_timestamp_range
+
+class TestBuildTimestampRange(unittest.TestCase):
+    def setUp(self):
+        # Set up Singapore timezone
+        self.SGT = pytz.timezone('Asia/Singapore')
+
+    def test_inclusive_day_range(self):
+        """Test that the range covers the whole end date"""
+        timestamp_range = build_timestamp_range('2025-02-08', '2025-02-10', self.SGT)
+
+        self.assertEqual(timestamp_range['$gte'], self.SGT.localize(datetime(2025, 2, 8)))
+        self.assertEqual(timestamp_range['$lt'], self.SGT.localize(datetime(2025, 2, 11)))
+
+    def test_range_across_month_and_year(self):
+        """Test that ranges crossing month and year boundaries stay ordered"""
+        timestamp_range = build_timestamp_range('2024-12-31', '2025-01-01', self.SGT)
+
+        self.assertLess(timestamp_range['$gte'], timestamp_range['$lt'])
+        self.assertEqual(timestamp_range['$lt'], self.SGT.localize(datetime(2025, 1, 2)))
+
+    def test_legacy_date_format(self):
+        """Test that DD-MM-YYYY dates are still accepted"""
+        timestamp_range = build_timestamp_range('08-02-2025', None, self.SGT)
+
+        self.assertEqual(timestamp_range, {'$gte': self.SGT.localize(datetime(2025, 2, 8))})
+
+    def test_open_ended_range(self):
+        """Test that only an end date produces an upper bound"""
+        timestamp_range = build_timestamp_range(None, '2025-02-08', self.SGT)
+
+        self.assertEqual(list(timestamp_range.keys()), ['$lt'])
+
+    def test_invalid_date(self):
+        """Test that an invalid date raises ValueError"""
+        with self.assertRaises(ValueError):
+            build_timestamp_range('2025/02/08', None, self.SGT)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,124 @@
+import unittest
+from unittest.mock import MagicMock, patch
+import sys
+import os
+import gzip
+import json
+import mongomock
+from werkzeug.http import parse_accept_header
+from werkzeug.datastructures import Accept
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# Mock APScheduler
+sys.modules['apscheduler.schedulers.background'] = MagicMock()
+sys.modules['apscheduler'] = MagicMock()
+
+from app import create_app, read_data_version, bump_data_version, compress_body
+
+class TestConditionalResponses(unittest.TestCase):
+    def setUp(self):
+        # Mock MongoDB meta collection
+        self.mock_traffic_meta = mongomock.MongoClient()['traffic-data'].traffic_meta
+        self.body = b'{"streetName": "Orchard Road", "intensity": "high"}' * 50
+
+    def accept(self, header):
+        return parse_accept_header(header, Accept)
+
+    def test_unknown_data_set_is_version_zero(self):
+        """Test that a data set that was never bumped reads as version 0"""
+        self.assertEqual(read_data_version(self.mock_traffic_meta, 'traffic_logs'), (0, None))
+
+    def test_bump_increments_version(self):
+        """Test that each bump increments the stored version"""
+        bump_data_version(self.mock_traffic_meta, 'traffic_logs')
+        version, updated_at = bump_data_version(self.mock_traffic_meta, 'traffic_logs')
+
+        self.assertEqual(version, 2)
+        self.assertIsNotNone(updated_at)
+        self.assertEqual(read_data_version(self.mock_traffic_meta, 'traffic_logs')[0], 2)
+
+    def test_gzip_when_accepted(self):
+        """Test that large bodies are gzipped for clients that accept it"""
+        with patch('app.brotli', None):
+            body, encoding = compress_body(self.body, self.accept('gzip, deflate'))
+
+        self.assertEqual(encoding, 'gzip')
+        self.assertEqual(gzip.decompress(body), self.body)
+
+    def test_small_body_left_uncompressed(self):
+        """Test that bodies under the size threshold are not compressed"""
+        body, encoding = compress_body(b'{}', self.accept('gzip'))
+
+        self.assertIsNone(encoding)
+        self.assertEqual(body, b'{}')
+
+    def test_no_accepted_encoding(self):
+        """Test that bodies are sent as is when the client accepts no known encoding"""
+        body, encoding = compress_body(self.body, self.accept('identity'))
+
+        self.assertIsNone(encoding)
+        self.assertEqual(body, self.body)
+
+class TestConditionalEndpoints(unittest.TestCase):
+    def setUp(self):
+        # Mock MongoDB client
+        self.mock_client = mongomock.MongoClient()
+        self.mock_client['traffic-data']['traffic_logs'].insert_many([
+            {'status': 'success', 'date': '08-02-2025'},
+            {'status': 'duplicate', 'date': '08-02-2025'}
+        ])
+
+        with patch('gridfs.GridFS'), patch.dict(os.environ, {'COMPRESS_MIN_BYTES': '0'}):
+            self.app = create_app(db_client=self.mock_client)
+            self.client = self.app.test_client()
+
+    def test_unchanged_data_returns_not_modified(self):
+        """Test that a poll with the current ETag gets an empty 304"""
+        first = self.client.get('/api/pie-chart-data')
+        self.assertEqual(first.status_code, 200)
+        self.assertTrue(first.headers['ETag'])
+
+        second = self.client.get('/api/pie-chart-data', headers={'If-None-Match': first.headers['ETag']})
+
+        self.assertEqual(second.status_code, 304)
+        self.assertEqual(second.data, b'')
+
+    def test_new_version_returns_fresh_body(self):
+        """Test that bumping the data version invalidates the previous ETag"""
+        first = self.client.get('/api/pie-chart-data')
+        bump_data_version(self.mock_client['traffic-data']['traffic_meta'], 'traffic_logs')
+
+        second = self.client.get('/api/pie-chart-data', headers={'If-None-Match': first.headers['ETag']})
+
+        self.assertEqual(second.status_code, 200)
+        self.assertNotEqual(second.headers['ETag'], first.headers['ETag'])
+
+    def test_metrics_follow_ingestion_version(self):
+        """Test that metrics polls get 304 between ingestion cycles and skip the counts"""
+        first = self.client.get('/api/metrics')
+        self.assertEqual(first.status_code, 200)
+        self.assertIn('latestLogAt', first.get_json())
+
+        with patch.object(mongomock.Collection, 'count_documents') as count_documents:
+            second = self.client.get('/api/metrics', headers={'If-None-Match': first.headers['ETag']})
+        self.assertEqual(second.status_code, 304)
+        count_documents.assert_not_called()
+
+        bump_data_version(self.mock_client['traffic-data']['traffic_meta'], 'traffic_logs')
+        third = self.client.get('/api/metrics', headers={'If-None-Match': first.headers['ETag']})
+        self.assertEqual(third.status_code, 200)
+
+    def test_json_responses_are_compressed(self):
+        """Test that JSON responses are gzipped for clients that accept it"""
+        plain = self.client.get('/api/pie-chart-data')
+        with patch('app.brotli', None):
+            response = self.client.get('/api/pie-chart-data', headers={'Accept-Encoding': 'gzip'})
+
+        self.assertNotIn('Content-Encoding', plain.headers)
+        self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response.headers['Vary'])
+        self.assertEqual(json.loads(gzip.decompress(response.data)), json.loads(plain.data))
+        self.assertEqual(json.loads(plain.data)['labels'], ['Unique Entries', 'Duplicate Entries'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+import unittest
+from unittest.mock import MagicMock
+import sys
+import os
+import random
+import networkx as nx
+import numpy as np
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# Mock APScheduler
+sys.modules['apscheduler.schedulers.background'] = MagicMock()
+sys.modules['apscheduler'] = MagicMock()
+
+from app import CSRGraph, ContractionHierarchy, route_overlap
+
+class TestContractionHierarchy(unittest.TestCase):
+    def setUp(self):
+        # Random road graph around central Singapore, with one-way streets
+        rng = random.Random(11)
+        self.G = nx.DiGraph()
+        for node in range(200):
+            self.G.add_node(node, y=1.28 + rng.random() * 0.05, x=103.80 + rng.random() * 0.05)
+        nodes = list(self.G.nodes())
+        for u in nodes:
+            for v in rng.sample(nodes, 3):
+                if u != v:
+                    self.G.add_edge(u, v, length=rng.uniform(100, 800))
+                    if rng.random() < 0.7:
+                        self.G.add_edge(v, u, length=rng.uniform(100, 800))
+        for eid, (u, v, data) in enumerate(self.G.edges(data=True)):
+            data['eid'] = eid
+
+        self.lengths = np.array([data['length'] for _, _, data in self.G.edges(data=True)])
+
+    def build(self):
+        csr = CSRGraph.from_networkx(self.G)
+        return csr, ContractionHierarchy(csr)
+
+    def nx_cost(self, source, target, weights):
+        return nx.dijkstra_path_length(self.G, source, target, weight=lambda u, v, data: weights[data['eid']])
+
+    def assert_matches_dijkstra(self, csr, cch, metric, weights, queries=60):
+        rng = random.Random(5)
+        for _ in range(queries):
+            source, target = rng.sample(list(self.G.nodes()), 2)
+            result = cch.shortest_path(csr.node_index[source], csr.node_index[target], metric)
+            if not nx.has_path(self.G, source, target):
+                self.assertIsNone(result)
+                continue
+
+            cost, path, eids = result
+            self.assertAlmostEqual(cost, self.nx_cost(source, target, weights), places=6)
+            self.assertAlmostEqual(weights[eids].sum(), cost, places=6)
+            path_ids = [csr.node_ids[node] for node in path]
+            self.assertEqual((path_ids[0], path_ids[-1]), (source, target))
+            self.assertEqual([self.G.edges[u, v]['eid'] for u, v in zip(path_ids, path_ids[1:])], eids)
+
+    def test_every_node_is_ranked(self):
+        """Test that the elimination order covers each node exactly once"""
+        csr, cch = self.build()
+
+        self.assertEqual(sorted(cch.rank.tolist()), list(range(csr.num_nodes)))
+
+    def test_queries_match_dijkstra(self):
+        """Test that unpacked shortest paths are optimal and made of original edges"""
+        csr, cch = self.build()
+
+        self.assert_matches_dijkstra(csr, cch, cch.customize(self.lengths), self.lengths)
+
+    def test_recustomization_follows_new_weights(self):
+        """Test that re-running customization on congested weights keeps queries optimal"""
+        csr, cch = self.build()
+        cch.customize(self.lengths)
+
+        congested = self.lengths * np.random.default_rng(3).choice([1.0, 2.0, 3.0], size=len(self.lengths))
+
+        self.assert_matches_dijkstra(csr, cch, cch.customize(congested), congested)
+
+    def test_via_node_alternatives(self):
+        """Test that alternatives are simple, bounded and start with the shortest path"""
+        csr, cch = self.build()
+        metric = cch.customize(self.lengths)
+        source, target = 0, 150
+
+        routes = cch.alternative_paths(csr.node_index[source], csr.node_index[target], metric,
+                                       k=3, max_overlap=0.7, max_stretch=1.5)
+
+        self.assertAlmostEqual(routes[0]['cost'], self.nx_cost(source, target, self.lengths), places=6)
+        for route in routes:
+            self.assertEqual(len(set(route['nodes'])), len(route['nodes']))
+            self.assertLessEqual(route['cost'], 1.5 * routes[0]['cost'] + 1e-6)
+        for i in range(len(routes)):
+            for j in range(i):
+                self.assertLessEqual(route_overlap(csr.lengths, routes[i]['eids'], routes[j]['eids']), 0.7 + 1e-9)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+import unittest
+from unittest.mock import MagicMock
+import sys
+import os
+from datetime import datetime, timedelta
+import numpy as np
+import pytz
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# Mock APScheduler
+sys.modules['apscheduler.schedulers.background'] = MagicMock()
+sys.modules['apscheduler'] = MagicMock()
+
+from app import count_events_in_windows, to_naive_utc
+
+class TestCountEventsInWindows(unittest.TestCase):
+    def setUp(self):
+        # Sample incident times around 08-02-2025 14:00
+        self.base = datetime(2025, 2, 8, 14, 0)
+        self.event_times = np.array([
+            self.base - timedelta(minutes=45),
+            self.base - timedelta(minutes=30),
+            self.base,
+            self.base + timedelta(minutes=30),
+            self.base + timedelta(minutes=90)
+        ], dtype='datetime64[ms]')
+
+    def windows(self, centres, minutes=30):
+        centres = np.array(centres, dtype='datetime64[ms]')
+        delta = np.timedelta64(minutes, 'm')
+        return centres - delta, centres + delta
+
+    def test_inclusive_windows(self):
+        """Test that events on both window edges are counted"""
+        starts, ends = self.windows([self.base, self.base + timedelta(hours=1)])
+        counts = count_events_in_windows(self.event_times, starts, ends)
+
+        self.assertEqual(counts.tolist(), [3, 2])
+
+    def test_half_open_windows(self):
+        """Test that the end edge is excluded for half-open windows"""
+        starts, ends = self.windows([self.base])
+        counts = count_events_in_windows(self.event_times, starts, ends, include_end=False)
+
+        self.assertEqual(counts.tolist(), [2])
+
+    def test_no_events(self):
+        """Test that empty event arrays give zero counts"""
+        starts, ends = self.windows([self.base])
+        counts = count_events_in_windows(np.array([], dtype='datetime64[ms]'), starts, ends)
+
+        self.assertEqual(counts.tolist(), [0])
+
+    def test_clipped_window_never_negative(self):
+        """Test that a window clipped to nothing counts zero"""
+        starts = np.array([self.base], dtype='datetime64[ms]')
+        ends = np.array([self.base - timedelta(hours=1)], dtype='datetime64[ms]')
+
+        self.assertEqual(count_events_in_windows(self.event_times, starts, ends).tolist(), [0])
+
+    def test_to_naive_utc(self):
+        """Test that aware timestamps are converted to naive UTC"""
+        SGT = pytz.timezone('Asia/Singapore')
+        aware = SGT.localize(datetime(2025, 2, 8, 14, 0))
+
+        self.assertEqual(to_naive_utc(aware), datetime(2025, 2, 8, 6, 0))
+        self.assertEqual(to_naive_utc(self.base), self.base)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,189 @@
+import unittest
+from unittest.mock import MagicMock
+import sys
+import random
+import tempfile
+import os
+import networkx as nx
+import numpy as np
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# Mock APScheduler
+sys.modules['apscheduler.schedulers.background'] = MagicMock()
+sys.modules['apscheduler'] = MagicMock()
+
+from app import haversine_m, CSRGraph, route_overlap
+
+class TestCSRGraph(unittest.TestCase):
+    def setUp(self):
+        # Random road graph around central Singapore, lengths never shorter than the straight line
+        rng = random.Random(7)
+        self.G = nx.DiGraph()
+        for node in range(150):
+            self.G.add_node(1000 + node, y=1.28 + rng.random() * 0.05, x=103.80 + rng.random() * 0.05)
+        nodes = list(self.G.nodes())
+        for u in nodes:
+            for v in rng.sample(nodes, 4):
+                if u != v:
+                    self.G.add_edge(u, v, length=self.straight_line(u, v) * rng.uniform(1.0, 1.4))
+                    self.G.add_edge(v, u, length=self.straight_line(u, v) * rng.uniform(1.0, 1.4))
+        for eid, (u, v, data) in enumerate(self.G.edges(data=True)):
+            data['eid'] = eid
+
+        self.weights = np.array([data['length'] * rng.choice([1.0, 2.0, 3.0])
+                                 for _, _, data in self.G.edges(data=True)])
+
+    def straight_line(self, u, v):
+        return float(haversine_m(self.G.nodes[u]['y'], self.G.nodes[u]['x'],
+                                 self.G.nodes[v]['y'], self.G.nodes[v]['x']))
+
+    def nx_cost(self, source, target):
+        return nx.dijkstra_path_length(self.G, source, target,
+                                       weight=lambda u, v, data: self.weights[data['eid']])
+
+    def test_shortest_path_matches_dijkstra(self):
+        """Test that bidirectional A* finds optimal costs and consistent paths"""
+        csr = CSRGraph.from_networkx(self.G)
+        rng = random.Random(3)
+        nodes = list(self.G.nodes())
+
+        for _ in range(40):
+            source, target = rng.sample(nodes, 2)
+            result = csr.shortest_path(csr.node_index[source], csr.node_index[target], self.weights)
+            if not nx.has_path(self.G, source, target):
+                self.assertIsNone(result)
+                continue
+
+            cost, path, eids = result
+            self.assertAlmostEqual(cost, self.nx_cost(source, target), places=6)
+            self.assertAlmostEqual(self.weights[eids].sum(), cost, places=6)
+            path_ids = [csr.node_ids[node] for node in path]
+            self.assertEqual(path_ids[0], source)
+            self.assertEqual(path_ids[-1], target)
+            self.assertEqual([self.G.edges[u, v]['eid'] for u, v in zip(path_ids, path_ids[1:])], eids)
+
+    def test_alternatives_are_bounded_and_distinct(self):
+        """Test that alternatives respect the stretch and overlap limits"""
+        csr = CSRGraph.from_networkx(self.G)
+        nodes = list(self.G.nodes())
+        source, target = nodes[0], nodes[-1]
+
+        routes = csr.alternative_paths(csr.node_index[source], csr.node_index[target], self.weights,
+                                       k=3, max_overlap=0.7, max_stretch=1.5)
+
+        self.assertGreaterEqual(len(routes), 1)
+        self.assertAlmostEqual(routes[0]['cost'], self.nx_cost(source, target), places=6)
+        for route in routes:
+            self.assertEqual(route['nodes'][0], source)
+            self.assertEqual(route['nodes'][-1], target)
+            self.assertLessEqual(route['cost'], 1.5 * routes[0]['cost'] + 1e-6)
+        for i in range(len(routes)):
+            for j in range(i):
+                self.assertLessEqual(route_overlap(csr.lengths, routes[i]['eids'], routes[j]['eids']), 0.7 + 1e-9)
+
+    def test_alternatives_keep_live_slot_weights(self):
+        """Test that penalized weights from an alternatives search do not replace the cached slot lists"""
+        csr = CSRGraph.from_networkx(self.G)
+        nodes = list(self.G.nodes())
+        forward, reverse = csr.slot_weights(self.weights)
+
+        csr.alternative_paths(csr.node_index[nodes[0]], csr.node_index[nodes[-1]], self.weights, k=3)
+
+        self.assertIs(csr.slot_weights(self.weights)[0], forward)
+
+    def test_same_source_and_target(self):
+        """Test that a zero-length query returns the single node"""
+        csr = CSRGraph.from_networkx(self.G)
+
+        self.assertEqual(csr.shortest_path(0, 0, self.weights), (0.0, [0], []))
+
+    def test_slot_weights_follow_eids(self):
+        """Test that CSR slots carry the weight of their own edge"""
+        csr = CSRGraph.from_networkx(self.G)
+        forward, reverse = csr.slot_weights(self.weights)
+
+        u = 5
+        for slot in range(csr.indptr[u], csr.indptr[u + 1]):
+            edge = self.G.edges[csr.node_ids[u], csr.node_ids[csr.targets[slot]]]
+            self.assertEqual(forward[slot], self.weights[edge['eid']])
+
+    def test_cache_round_trip_is_memory_mapped(self):
+        """Test that a saved graph loads read-only from disk and routes identically"""
+        csr = CSRGraph.from_networkx(self.G)
+        with tempfile.TemporaryDirectory() as directory:
+            cache = os.path.join(directory, 'graph_cache')
+            csr.save(cache)
+            loaded = CSRGraph.load(cache)
+
+            self.assertIsInstance(loaded.targets, np.memmap)
+            self.assertEqual(loaded.lengths.dtype, np.float32)
+            self.assertFalse(loaded.indptr.flags.writeable)
+            self.assertEqual(loaded.shortest_path(0, 40, self.weights), csr.shortest_path(0, 40, self.weights))
+
+            self.assertEqual(sorted(os.listdir(directory)), ['graph_cache'])
+
+    def test_saving_again_keeps_mapped_versions(self):
+        """Test that a new save switches the pointer without touching the version still in use"""
+        csr = CSRGraph.from_networkx(self.G)
+        with tempfile.TemporaryDirectory() as cache:
+            self.assertFalse(CSRGraph.is_cached(cache))
+            csr.save(cache)
+            self.assertTrue(CSRGraph.is_cached(cache))
+            first = CSRGraph.load(cache)
+            csr.save(cache)
+            second = CSRGraph.load(cache)
+
+            # The replaced version stays on disk for readers that already hold it
+            self.assertEqual(len([name for name in os.listdir(cache) if name.startswith('v')]), 2)
+            self.assertEqual(first.shortest_path(0, 40, self.weights), second.shortest_path(0, 40, self.weights))
+
+            csr.save(cache)
+            self.assertEqual(len([name for name in os.listdir(cache) if name.startswith('v')]), 2)
+            self.assertEqual(CSRGraph.load(cache).num_nodes, csr.num_nodes)
+
+    def test_unversioned_cache_still_loads(self):
+        """Test that a cache written before versioning is read from the directory itself"""
+        csr = CSRGraph.from_networkx(self.G)
+        with tempfile.TemporaryDirectory() as cache:
+            csr.save(cache)
+            version = os.path.join(cache, open(os.path.join(cache, CSRGraph.CACHE_POINTER)).read())
+            for name in os.listdir(version):
+                os.replace(os.path.join(version, name), os.path.join(cache, name))
+            os.remove(os.path.join(cache, CSRGraph.CACHE_POINTER))
+
+            self.assertTrue(CSRGraph.is_cached(cache))
+            self.assertEqual(CSRGraph.load(cache).num_nodes, csr.num_nodes)
+
+    def test_to_networkx_round_trip(self):
+        """Test that the NetworkX view keeps node ids, coordinates and edge ids"""
+        G = CSRGraph.from_networkx(self.G).to_networkx()
+
+        self.assertEqual(set(G.nodes()), set(self.G.nodes()))
+        self.assertEqual(G.nodes[1000]['y'], self.G.nodes[1000]['y'])
+        for u, v, data in self.G.edges(data=True):
+            self.assertEqual(G.edges[u, v]['eid'], data['eid'])
+
+    def test_nearest_node(self):
+        """Test that coordinates snap to the closest node"""
+        csr = CSRGraph.from_networkx(self.G)
+        node = csr.node_index[1042]
+
+        self.assertEqual(csr.nearest_node(self.G.nodes[1042]['y'] + 1e-6, self.G.nodes[1042]['x']), node)
+
+    def test_batch_snapping(self):
+        """Test that many coordinates snap at once to their closest nodes, with distances in metres"""
+        csr = CSRGraph.from_networkx(self.G)
+        rng = np.random.default_rng(9)
+        lats = 1.28 + rng.random(50) * 0.05
+        lngs = 103.80 + rng.random(50) * 0.05
+
+        nodes, distances = csr.snap(lats, lngs)
+
+        for lat, lng, node, distance in zip(lats, lngs, nodes, distances):
+            straight_line = haversine_m(csr.lat, csr.lng, lat, lng)
+            self.assertEqual(node, int(np.argmin(straight_line)))
+            self.assertAlmostEqual(distance, straight_line[node], delta=1.0)
+        self.assertIs(csr.node_tree, csr.node_tree)
+
+if __name__ == '__main__':
+    unittest.main()
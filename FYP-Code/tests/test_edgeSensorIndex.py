@@ -0,0 +1,77 @@
+import unittest
+from unittest.mock import MagicMock
+import sys
+import os
+import random
+import networkx as nx
+import numpy as np
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# Mock APScheduler
+sys.modules['apscheduler.schedulers.background'] = MagicMock()
+sys.modules['apscheduler'] = MagicMock()
+
+from app import CSRGraph, EdgeSensorIndex, congestion_factors
+
+class TestEdgeSensorIndex(unittest.TestCase):
+    def setUp(self):
+        # Random road graph around central Singapore
+        rng = random.Random(42)
+        self.G = nx.DiGraph()
+        for node in range(200):
+            self.G.add_node(node, y=1.28 + rng.random() * 0.06, x=103.80 + rng.random() * 0.06)
+        for _ in range(600):
+            u, v = rng.randrange(200), rng.randrange(200)
+            if u != v:
+                self.G.add_edge(u, v, length=rng.uniform(50, 500))
+
+        self.sensors = [(1.3048, 103.8318), (1.2847, 103.8610), (1.3294, 103.8066), (1.3100, 103.8400)]
+        self.factors = [2.0, 3.0, 1.0, 2.0]
+
+    def make_index(self):
+        return EdgeSensorIndex(CSRGraph.from_networkx(self.G))
+
+    def brute_force_weights(self, max_distance=0.01):
+        weights = {}
+        for u, v, data in self.G.edges(data=True):
+            edge_lat = (self.G.nodes[u]['y'] + self.G.nodes[v]['y']) / 2
+            edge_lng = (self.G.nodes[u]['x'] + self.G.nodes[v]['x']) / 2
+            distances = [((edge_lat - lat) ** 2 + (edge_lng - lng) ** 2) ** 0.5 for lat, lng in self.sensors]
+            nearest = int(np.argmin(distances))
+            factor = self.factors[nearest] if distances[nearest] < max_distance else 1.0
+            weights[(u, v)] = data['length'] * factor
+        return weights
+
+    def test_matches_linear_scan(self):
+        """Test that indexed weights equal the nearest-sensor linear scan"""
+        index = self.make_index()
+        weights = dict(zip(self.G.edges(), index.weights(self.sensors, self.factors)))
+
+        expected = self.brute_force_weights()
+        self.assertEqual(weights.keys(), expected.keys())
+        for edge, weight in expected.items():
+            # Cached edge lengths are float32
+            self.assertAlmostEqual(weights[edge], weight, places=3)
+
+    def test_assignment_is_cached_per_sensor_set(self):
+        """Test that the edge mapping is reused while sensor coordinates are unchanged"""
+        index = self.make_index()
+        assignment = index.assign(self.sensors)
+
+        self.assertIs(index.assign(list(self.sensors)), assignment)
+        self.assertIsNot(index.assign(self.sensors[:2]), assignment)
+
+    def test_no_sensors_keeps_base_lengths(self):
+        """Test that edges without a nearby sensor keep their length as weight"""
+        index = self.make_index()
+
+        np.testing.assert_allclose(index.weights([], []), index.lengths)
+
+    def test_congestion_factors(self):
+        """Test the speed ratio thresholds, including zero free flow speed"""
+        factors = congestion_factors([50, 40, 20, 10], [60, 60, 60, 0])
+
+        self.assertEqual(factors.tolist(), [1.0, 2.0, 3.0, 1.0])
+
+if __name__ == '__main__':
+    unittest.main()
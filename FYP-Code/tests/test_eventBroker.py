@@ -0,0 +1,133 @@
+import unittest
+from unittest.mock import MagicMock, patch, mock_open
+import sys
+import os
+import threading
+import json
+from datetime import datetime
+import mongomock
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# Mock APScheduler
+sys.modules['apscheduler.schedulers.background'] = MagicMock()
+sys.modules['apscheduler'] = MagicMock()
+
+from app import create_app, EventBroker, diff_traffic_records
+
+class TestEventBroker(unittest.TestCase):
+    def setUp(self):
+        # Sample current traffic records
+        self.old_records = [
+            {"road_id": "road_1", "streetName": "Orchard Road", "currentSpeed": 40, "freeFlowSpeed": 60,
+             "intensity": "medium", "time": "14:00"},
+            {"road_id": "road_2", "streetName": "Marina Bay", "currentSpeed": 50, "freeFlowSpeed": 60,
+             "intensity": "low", "time": "14:00"},
+            {"road_id": "road_3", "streetName": "Bukit Timah Road", "currentSpeed": 30, "freeFlowSpeed": 60,
+             "intensity": "medium", "time": "14:00"}
+        ]
+
+    def test_events_since_returns_newer_events(self):
+        """Test that only events after the given sequence are returned"""
+        broker = EventBroker()
+        broker.publish('logs', [{"roadName": "Orchard Road"}])
+        broker.publish('traffic', {"version": 1})
+
+        events, complete = broker.events_since(1, timeout=0)
+
+        self.assertTrue(complete)
+        self.assertEqual([(seq, event_type) for seq, event_type, _ in events], [(2, 'traffic')])
+
+    def test_resume_after_buffer_overflow_is_incomplete(self):
+        """Test that resuming from an evicted sequence is reported"""
+        broker = EventBroker(capacity=2)
+        for version in range(4):
+            broker.publish('traffic', {"version": version})
+
+        events, complete = broker.events_since(1, timeout=0)
+
+        self.assertFalse(complete)
+        self.assertEqual([seq for seq, _, _ in events], [3, 4])
+
+    def test_sequence_from_before_restart_is_incomplete(self):
+        """Test that a Last-Event-ID beyond the current sequence is reported"""
+        broker = EventBroker()
+
+        self.assertEqual(broker.events_since(50, timeout=0), ([], False))
+
+    def test_waiting_subscriber_is_woken(self):
+        """Test that a publish wakes subscribers waiting for events"""
+        broker = EventBroker()
+        received = []
+        waiter = threading.Thread(target=lambda: received.extend(broker.events_since(0, timeout=5)[0]))
+        waiter.start()
+
+        broker.publish('traffic', {"version": 1})
+        waiter.join(5)
+
+        self.assertEqual(len(received), 1)
+
+    def test_stream_formats_server_sent_events(self):
+        """Test that the stream resumes after last_seq and emits SSE messages"""
+        broker = EventBroker()
+        broker.publish('logs', [{"roadName": "Orchard Road"}])
+        broker.publish('traffic', {"version": 2, "roads": [], "removed": []})
+
+        stream = broker.stream(last_seq=1, heartbeat=0)
+        message = next(stream)
+
+        self.assertTrue(message.startswith("id: 2\nevent: traffic\ndata: "))
+        self.assertEqual(json.loads(message.split("data: ", 1)[1])["version"], 2)
+        self.assertEqual(next(stream), ": heartbeat\n\n")
+        self.assertEqual(broker.stats()['subscribers'], 1)
+
+        stream.close()
+        self.assertEqual(broker.stats()['subscribers'], 0)
+
+    def test_diff_only_reports_changed_roads(self):
+        """Test that roads whose speed or intensity are unchanged are left out of the delta"""
+        new_records = [dict(record, time="14:05") for record in self.old_records[:2]]
+        new_records[1].update(currentSpeed=20, intensity="high")
+        new_records.append({"road_id": "road_4", "streetName": "Pan Island Expressway",
+                            "currentSpeed": 70, "freeFlowSpeed": 90, "intensity": "low"})
+
+        changed, removed = diff_traffic_records(self.old_records, new_records)
+
+        self.assertEqual([record['road_id'] for record in changed], ["road_2", "road_4"])
+        self.assertEqual(removed, ["road_3"])
+
+class TestTrafficEvents(unittest.TestCase):
+    def setUp(self):
+        # Mock MongoDB client with an accident already recorded on the first road
+        self.mock_client = mongomock.MongoClient()
+        self.mock_client['traffic-data']['traffic_incidents'].insert_one({
+            'road_id': 'road_1', 'type': 'ACCIDENT', 'status': 'ACTIVE', 'start_time': datetime.utcnow()
+        })
+
+    def flow_response(self, road):
+        response = MagicMock(status_code=200)
+        response.json.return_value = {'flowSegmentData': {'currentSpeed': 20, 'freeFlowSpeed': 60}}
+        return road, response, None
+
+    def test_traffic_event_carries_incident_counts(self):
+        """Test that pushed roads have the same incident counts as /api/traffic/data"""
+        with patch('app.open', new_callable=mock_open, read_data="Road A,1.3,103.85\nRoad B,1.2,103.84\n"), \
+                patch('app.fetch_flow_segments', side_effect=lambda session, roads, *args, **kwargs:
+                      [self.flow_response(road) for road in roads]), \
+                patch('gridfs.GridFS'):
+            app = create_app(db_client=self.mock_client)
+        client = app.test_client()
+
+        response = client.get('/api/traffic/stream?lastEventId=0', buffered=False)
+        message = next(iter(response.response)).decode()
+        response.close()
+
+        self.assertTrue(message.startswith("id: 1\nevent: traffic\n"))
+        roads = {road['road_id']: road for road in json.loads(message.split("data: ", 1)[1])['roads']}
+        self.assertEqual((roads['road_1']['accidentCount'], roads['road_2']['accidentCount']), (1, 0))
+        pushed = {road_id: (road['accidentCount'], road['congestionCount']) for road_id, road in roads.items()}
+        listed = {road['road_id']: (road['accidentCount'], road['congestionCount'])
+                  for road in client.get('/api/traffic/data').get_json()}
+        self.assertEqual(pushed, listed)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+import unittest
+from unittest.mock import MagicMock, Mock
+import sys
+import os
+import requests
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# Mock APScheduler
+sys.modules['apscheduler.schedulers.background'] = MagicMock()
+sys.modules['apscheduler'] = MagicMock()
+
+from app import fetch_flow_segments, TOMTOM_FLOW_URL
+
+class TestFetchFlowSegments(unittest.TestCase):
+    def setUp(self):
+        # Sample road data
+        self.roads = [
+            {"name": "Orchard Road", "lat": 1.3048, "lng": 103.8318},
+            {"name": "Marina Bay", "lat": 1.2847, "lng": 103.8610},
+            {"name": "Bukit Timah Road", "lat": 1.3294, "lng": 103.8021}
+        ]
+
+    def make_response(self, status_code):
+        response = Mock()
+        response.status_code = status_code
+        return response
+
+    def test_results_keep_road_order(self):
+        """Test that results come back in the same order as the roads"""
+        session = Mock()
+        session.get.side_effect = lambda url, params, timeout: self.make_response(200)
+
+        results = fetch_flow_segments(session, self.roads, 'test-key', max_workers=3)
+
+        self.assertEqual([road['name'] for road, _, _ in results],
+                         [road['name'] for road in self.roads])
+        self.assertTrue(all(response.status_code == 200 for _, response, _ in results))
+        self.assertTrue(all(error is None for _, _, error in results))
+
+    def test_request_parameters_and_timeout(self):
+        """Test that each request carries the road point, key and timeout"""
+        session = Mock()
+        session.get.return_value = self.make_response(200)
+
+        fetch_flow_segments(session, self.roads[:1], 'test-key', timeout=2.5)
+
+        session.get.assert_called_once_with(
+            TOMTOM_FLOW_URL,
+            params={'point': '1.3048,103.8318', 'key': 'test-key'},
+            timeout=2.5
+        )
+
+    def test_request_errors_are_captured(self):
+        """Test that a failing road does not abort the other requests"""
+        def fake_get(url, params, timeout):
+            if params['point'].startswith('1.2847'):
+                raise requests.exceptions.Timeout("timed out")
+            return self.make_response(200)
+
+        session = Mock()
+        session.get.side_effect = fake_get
+
+        results = fetch_flow_segments(session, self.roads, 'test-key')
+
+        self.assertIsNone(results[1][1])
+        self.assertIsInstance(results[1][2], requests.exceptions.Timeout)
+        self.assertEqual(results[0][1].status_code, 200)
+        self.assertEqual(results[2][1].status_code, 200)
+
+    def test_empty_road_list(self):
+        """Test that an empty road list makes no requests"""
+        session = Mock()
+        self.assertEqual(fetch_flow_segments(session, [], 'test-key'), [])
+        session.get.assert_not_called()
+
+if __name__ == '__main__':
+    unittest.main()
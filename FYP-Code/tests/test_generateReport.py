@@ -7,6 +7,8 @@ import sys
 import os
 from datetime import datetime
 import pytz
+import time
+import mongomock
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 # Mock APScheduler
@@ -25,6 +27,9 @@ class TestGenerateReport(unittest.TestCase):
         cls.historical_traffic_data = MagicMock()
         cls.reports_collection = MagicMock()
         cls.traffic_incidents = MagicMock()
+        cls.traffic_meta = MagicMock()
+        # Report jobs need real queries to be shared and polled
+        cls.report_jobs = mongomock.MongoClient()['traffic-data']['report_jobs']
         cls.mock_reports = []
         cls.mock_traffic_data = []
 
@@ -37,13 +42,16 @@ class TestGenerateReport(unittest.TestCase):
         cls.db.__getitem__.side_effect = lambda x: {
             'historical_traffic_data': cls.historical_traffic_data,
             'reports': cls.reports_collection,
-            'traffic_incidents': cls.traffic_incidents
+            'traffic_incidents': cls.traffic_incidents,
+            'traffic_meta': cls.traffic_meta,
+            'report_jobs': cls.report_jobs
         }.get(x, MagicMock())
 
         # Mock historical traffic data methods
         def mock_traffic_find(query=None, projection=None):
             mock_cursor = MagicMock()
             mock_cursor.sort.return_value = mock_cursor
+            mock_cursor.batch_size.return_value = mock_cursor
             
             # Return empty results for "Nonexistent Road"
             if query and query.get('streetName', {}).get('$in', []) == ['Nonexistent Road']:
@@ -62,6 +70,18 @@ class TestGenerateReport(unittest.TestCase):
 
         cls.historical_traffic_data.find.side_effect = mock_traffic_find
 
+        def mock_traffic_find_one(query=None, projection=None):
+            if query and query.get('streetName', {}).get('$in', []) == ['Nonexistent Road']:
+                return None
+            return {'_id': 'record_1'}
+
+        cls.historical_traffic_data.find_one.side_effect = mock_traffic_find_one
+        cls.historical_traffic_data.count_documents.side_effect = \
+            lambda query=None: 0 if mock_traffic_find_one(query) is None else 1
+
+        # Historical data version used to deduplicate reports
+        cls.traffic_meta.find_one.return_value = {'_id': 'historical_traffic', 'version': 3}
+
         # Mock traffic incidents methods
         cls.traffic_incidents.count_documents.return_value = 2
 
@@ -78,8 +98,18 @@ class TestGenerateReport(unittest.TestCase):
         self.mock_gridfs = gridfs_patcher.start()
         self.addCleanup(gridfs_patcher.stop)
 
-        # Setup GridFS put method
-        self.mock_gridfs.return_value.put.return_value = 'mock_file_id'
+        # Setup GridFS put method, reading the streamed PDF like GridFS does
+        self.stored_pdfs = []
+
+        def mock_put(data, **kwargs):
+            self.stored_pdfs.append(data.read() if hasattr(data, 'read') else data)
+            return 'mock_file_id'
+
+        self.mock_gridfs.return_value.put.side_effect = mock_put
+
+        # No identical report stored yet
+        self.reports_collection.find_one.return_value = None
+        self.report_jobs.delete_many({})
 
         self.app = create_app(db_client=self.mock_client)
         self.client = self.app.test_client()
@@ -90,8 +120,19 @@ class TestGenerateReport(unittest.TestCase):
             sess['username'] = 'test_user'
             sess['role'] = 'traffic_analyst'
 
+    def wait_for_job(self, job_id, timeout=10):
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            response = self.client.get(f'/api/reports/jobs/{job_id}')
+            self.assertEqual(response.status_code, 200)
+            job = json.loads(response.data)
+            if job['status'] in ('done', 'failed'):
+                return job
+            time.sleep(0.05)
+        self.fail(f'Report job {job_id} did not finish')
+
     def test_generate_report_success(self):
-        """Test successful report generation"""
+        """Test that report generation is queued and finishes with a stored PDF"""
         response = self.client.post('/api/reports', json={
             "dataType": "traffic",
             "dateRange": {
@@ -108,9 +149,58 @@ class TestGenerateReport(unittest.TestCase):
             }
         })
 
+        self.assertEqual(response.status_code, 202)
+        data = json.loads(response.data)
+        self.assertTrue(response.headers['Location'].endswith(f"/api/reports/jobs/{data['jobId']}"))
+
+        job = self.wait_for_job(data['jobId'])
+        self.assertEqual(job['status'], 'done')
+        self.assertEqual(job['progress'], 1.0)
+        self.assertTrue(job['reportId'])
+
+        # Check if PDF data was stored
+        self.assertTrue(self.stored_pdfs[-1].startswith(b'%PDF'))
+        self.assertEqual(self.mock_reports[-1]['fileId'], 'mock_file_id')
+        self.assertEqual(self.mock_reports[-1]['dataVersion'], 3)
+
+    def test_identical_report_is_reused(self):
+        """Test that a stored report with the same filters and data version is reused"""
+        self.reports_collection.find_one.return_value = {'_id': 'existing_report_id'}
+
+        response = self.client.post('/api/reports', json={
+            "dataType": "traffic",
+            "dateRange": {
+                "start": "2024-01-01",
+                "end": "2024-01-02"
+            },
+            "selectedRoads": ["Test Road"]
+        })
+
         self.assertEqual(response.status_code, 200)
-        self.assertEqual(response.content_type, 'application/pdf')
-        self.assertTrue(response.data)  # Check if PDF data exists
+        data = json.loads(response.data)
+        self.assertTrue(data['reused'])
+        self.assertEqual(data['reportId'], 'existing_report_id')
+        self.mock_gridfs.return_value.put.assert_not_called()
+
+    def test_unknown_job(self):
+        """Test that polling an unknown job returns 404"""
+        response = self.client.get('/api/reports/jobs/unknown')
+
+        self.assertEqual(response.status_code, 404)
+
+    def test_other_users_cannot_poll_job(self):
+        """Test that a job queued by one user is not found for another"""
+        response = self.client.post('/api/reports', json={
+            "dataType": "traffic",
+            "selectedRoads": ["Test Road"]
+        })
+        job_id = json.loads(response.data)['jobId']
+
+        with self.client.session_transaction() as sess:
+            sess['username'] = 'other_user'
+        response = self.client.get(f'/api/reports/jobs/{job_id}')
+
+        self.assertEqual(response.status_code, 404)
 
     def test_generate_report_no_data(self):
         """Test report generation with no matching data"""
@@ -163,9 +253,10 @@ class TestGenerateReport(unittest.TestCase):
             }
         })
 
-        self.assertEqual(response.status_code, 200)
-        self.assertEqual(response.content_type, 'application/pdf')
-        self.assertTrue(response.data)  # Verify PDF data exists
+        self.assertEqual(response.status_code, 202)
+        job = self.wait_for_job(json.loads(response.data)['jobId'])
+        self.assertEqual(job['status'], 'done')
+        self.assertTrue(self.stored_pdfs[-1].startswith(b'%PDF'))
 
 if __name__ == '__main__':
     unittest.main()
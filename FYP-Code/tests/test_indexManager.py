@@ -0,0 +1,84 @@
+import unittest
+from unittest.mock import MagicMock, patch
+import sys
+import os
+import mongomock
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# Mock APScheduler
+sys.modules['apscheduler.schedulers.background'] = MagicMock()
+sys.modules['apscheduler'] = MagicMock()
+
+from app import ensure_indexes, index_report
+
+class TestIndexManager(unittest.TestCase):
+    def setUp(self):
+        # Mock MongoDB client
+        self.client = mongomock.MongoClient()
+
+        self.required_indexes = {
+            ('traffic-data', 'current_traffic_data'): [
+                {'name': 'road_id_unique', 'keys': [('road_id', 1)], 'unique': True},
+            ],
+            ('traffic-data', 'historical_traffic_data'): [
+                {'name': 'road_id_timestamp_unique', 'keys': [('road_id', 1), ('timestamp', 1)],
+                 'unique': True, 'timeseries': False},
+                {'name': 'streetName_timestamp', 'keys': [('streetName', 1), ('timestamp', 1)]},
+            ],
+        }
+
+    def index_names(self, collection_name):
+        return {index['name'] for index in self.client['traffic-data'][collection_name].list_indexes()}
+
+    def test_creates_missing_indexes(self):
+        """Test that every declared index is created"""
+        results = ensure_indexes(self.client, self.required_indexes)
+
+        self.assertEqual(results['traffic-data.current_traffic_data']['created'], ['road_id_unique'])
+        self.assertIn('road_id_timestamp_unique', self.index_names('historical_traffic_data'))
+        self.assertIn('streetName_timestamp', self.index_names('historical_traffic_data'))
+
+    def test_is_idempotent(self):
+        """Test that a second run creates nothing"""
+        ensure_indexes(self.client, self.required_indexes)
+        results = ensure_indexes(self.client, self.required_indexes)
+
+        for result in results.values():
+            self.assertEqual(result['created'], [])
+            self.assertEqual(result['errors'], {})
+
+    def test_existing_index_with_other_name_counts_as_present(self):
+        """Test that an index with the same keys under another name is not duplicated"""
+        self.client['traffic-data']['current_traffic_data'].create_index([('road_id', 1)], name='legacy_road_id')
+
+        results = ensure_indexes(self.client, self.required_indexes)
+
+        self.assertEqual(results['traffic-data.current_traffic_data']['created'], [])
+
+    def test_unique_index_skipped_on_timeseries(self):
+        """Test that unique indexes are not attempted on time-series collections"""
+        ensure_indexes(self.client, self.required_indexes,
+                       timeseries_collections={('traffic-data', 'historical_traffic_data')})
+
+        self.assertNotIn('road_id_timestamp_unique', self.index_names('historical_traffic_data'))
+        self.assertIn('streetName_timestamp', self.index_names('historical_traffic_data'))
+
+    def test_create_errors_are_reported(self):
+        """Test that a failing index build is reported instead of raised"""
+        collection = self.client['traffic-data']['current_traffic_data']
+        with patch.object(type(collection), 'create_index', side_effect=Exception("duplicate key")):
+            results = ensure_indexes(self.client, self.required_indexes)
+
+        self.assertIn('road_id_unique', results['traffic-data.current_traffic_data']['errors'])
+
+    def test_report_missing_and_undeclared(self):
+        """Test that the report lists missing and undeclared indexes"""
+        self.client['traffic-data']['current_traffic_data'].create_index([('streetName', 1)], name='streetName')
+
+        report = index_report(self.client, self.required_indexes)
+
+        self.assertEqual(report['traffic-data.current_traffic_data']['missing'], ['road_id_unique'])
+        self.assertEqual(report['traffic-data.current_traffic_data']['undeclared'], ['streetName'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+import unittest
+from unittest.mock import MagicMock, patch
+import sys
+import os
+from datetime import datetime, timedelta
+import mongomock
+import pytz
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# Mock APScheduler
+sys.modules['apscheduler.schedulers.background'] = MagicMock()
+sys.modules['apscheduler'] = MagicMock()
+
+from app import create_app, plan_historical_backfill, backfill_key
+
+class TestPlanHistoricalBackfill(unittest.TestCase):
+    def setUp(self):
+        # Set up Singapore timezone
+        self.SGT = pytz.timezone('Asia/Singapore')
+
+        # Sample road data
+        self.SINGAPORE_ROADS = [
+            {"name": "Orchard Road", "lat": 1.3048, "lng": 103.8318},
+            {"name": "Marina Bay", "lat": 1.2847, "lng": 103.8610}
+        ]
+
+        self.start_time = self.SGT.localize(datetime(2025, 2, 8, 10, 0))
+        self.end_time = self.SGT.localize(datetime(2025, 2, 8, 13, 0))
+
+    def test_empty_collection_plans_every_hour(self):
+        """Test that every road and hour is planned when nothing is stored"""
+        missing = plan_historical_backfill(self.SINGAPORE_ROADS, set(), self.start_time, self.end_time)
+
+        self.assertEqual(len(missing), 3 * len(self.SINGAPORE_ROADS))
+        self.assertEqual(missing[0], ('road_1', self.SINGAPORE_ROADS[0], self.start_time))
+        self.assertEqual(missing[-1][2], self.end_time - timedelta(hours=1))
+
+    def test_existing_samples_are_skipped(self):
+        """Test that stored samples, as returned naive UTC by Mongo, are not planned again"""
+        stored_time = self.SGT.localize(datetime(2025, 2, 8, 11, 0, 12))
+        stored_utc = stored_time.astimezone(pytz.utc).replace(tzinfo=None)
+        existing_keys = {('road_2', stored_utc.replace(second=0))}
+
+        missing = plan_historical_backfill(self.SINGAPORE_ROADS, existing_keys, self.start_time, self.end_time)
+
+        self.assertEqual(len(missing), 5)
+        self.assertNotIn(('road_2', self.SINGAPORE_ROADS[1], self.SGT.localize(datetime(2025, 2, 8, 11, 0))), missing)
+
+    def test_backfill_key_aligns_to_hour(self):
+        """Test that keys from aware and naive timestamps compare equal"""
+        aware = self.SGT.localize(datetime(2025, 2, 8, 11, 0, 42))
+        naive_utc = datetime(2025, 2, 8, 3, 0, 0)
+
+        self.assertEqual(backfill_key('road_1', aware), backfill_key('road_1', naive_utc))
+
+    def test_window_spanning_several_days(self):
+        """Test that windows longer than a day are planned hour by hour"""
+        end_time = self.start_time + timedelta(days=3)
+        missing = plan_historical_backfill(self.SINGAPORE_ROADS[:1], set(), self.start_time, end_time)
+
+        self.assertEqual(len(missing), 72)
+        self.assertEqual(len({timestamp for _, _, timestamp in missing}), 72)
+
+    def test_unaligned_start_is_rounded_up(self):
+        """Test that a start time inside an hour begins at the next whole hour"""
+        start_time = self.start_time + timedelta(minutes=20)
+        missing = plan_historical_backfill(self.SINGAPORE_ROADS[:1], set(), start_time, self.end_time)
+
+        self.assertEqual([timestamp.hour for _, _, timestamp in missing], [11, 12])
+
+class TestBackfilledRecords(unittest.TestCase):
+    def setUp(self):
+        # Mock MongoDB client
+        self.mock_client = mongomock.MongoClient()
+        with patch('gridfs.GridFS'):
+            self.app = create_app(db_client=self.mock_client)
+            self.client = self.app.test_client()
+
+        with self.client.session_transaction() as sess:
+            sess['username'] = 'test_user'
+
+    def test_reports_skip_backfilled_records(self):
+        """Test that rows copied from live speed by a backfill are left out of reports"""
+        self.mock_client['traffic-data']['historical_traffic_data'].insert_one({
+            'road_id': 'road_1',
+            'streetName': 'Orchard Road',
+            'date': '08-02-2025',
+            'time': '10:00',
+            'timestamp': datetime(2025, 2, 8, 2, 0),
+            'currentSpeed': 30,
+            'freeFlowSpeed': 50,
+            'intensity': 'medium',
+            'backfilled': True
+        })
+
+        response = self.client.post('/api/reports', json={
+            'dataType': 'traffic',
+            'selectedRoads': ['Orchard Road']
+        })
+
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.get_json()['message'], 'No data found for the selected criteria')
+
+if __name__ == '__main__':
+    unittest.main()
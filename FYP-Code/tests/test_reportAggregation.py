@@ -0,0 +1,125 @@
+import unittest
+from unittest.mock import MagicMock
+import sys
+import os
+from datetime import datetime
+import mongomock
+import pytz
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# Mock APScheduler
+sys.modules['apscheduler.schedulers.background'] = MagicMock()
+sys.modules['apscheduler'] = MagicMock()
+
+from app import (report_summary_pipeline, incident_summary_pipeline, incident_summary_period,
+                 build_timestamp_range, summary_report_columns, report_cache_key)
+
+class TestReportAggregation(unittest.TestCase):
+    def setUp(self):
+        # Mock MongoDB collections
+        self.client = mongomock.MongoClient()
+        self.historical_traffic_data = self.client['traffic-data']['historical_traffic_data']
+        self.traffic_incidents = self.client['traffic-data']['traffic_incidents']
+        self.SGT = pytz.timezone('Asia/Singapore')
+
+        samples = [
+            ('road_1', 'Orchard Road', '08-02-2025', '08:00', 20),
+            ('road_1', 'Orchard Road', '08-02-2025', '09:00', 40),
+            ('road_1', 'Orchard Road', '08-02-2025', '10:00', 30),
+            ('road_1', 'Orchard Road', '08-02-2025', '11:00', 50),
+            ('road_1', 'Orchard Road', '09-02-2025', '08:00', 24),
+            ('road_2', 'Marina Bay', '31-01-2025', '08:00', 45),
+        ]
+        for road_id, street_name, date, time, speed in samples:
+            self.historical_traffic_data.insert_one({
+                'road_id': road_id,
+                'streetName': street_name,
+                'date': date,
+                'time': time,
+                'currentSpeed': speed,
+                'freeFlowSpeed': 50,
+                'intensity': 'high' if speed / 50 <= 0.5 else 'low'
+            })
+
+        # Incidents stored as naive UTC, as Mongo returns them
+        for incident_type, local_time in [
+            ('ACCIDENT', datetime(2025, 2, 8, 9, 10)),
+            ('CONGESTION', datetime(2025, 2, 8, 8, 5)),
+            ('CONGESTION', datetime(2025, 2, 9, 8, 20)),
+            ('CONGESTION', datetime(2025, 2, 8, 22, 0)),
+            ('ROAD_CLOSURE', datetime(2025, 2, 8, 9, 0)),
+        ]:
+            self.traffic_incidents.insert_one({
+                'road_id': 'road_1',
+                'type': incident_type,
+                'start_time': self.SGT.localize(local_time).astimezone(pytz.utc).replace(tzinfo=None)
+            })
+
+    def test_daily_summary_per_road(self):
+        """Test that daily summaries average, rank and count per road and local date"""
+        summaries = list(self.historical_traffic_data.aggregate(report_summary_pipeline({}, 'daily')))
+
+        self.assertEqual([(row['streetName'], row['period']) for row in summaries], [
+            ('Marina Bay', '2025-01-31'),
+            ('Orchard Road', '2025-02-08'),
+            ('Orchard Road', '2025-02-09'),
+        ])
+        orchard = summaries[1]
+        self.assertEqual(orchard['date'], '08-02-2025')
+        self.assertEqual(orchard['samples'], 4)
+        self.assertEqual(orchard['avgSpeed'], 35)
+        self.assertEqual((orchard['minSpeed'], orchard['maxSpeed']), (20, 50))
+        self.assertEqual(orchard['p50Speed'], 30)
+        self.assertEqual(orchard['p85Speed'], 40)
+        self.assertEqual(orchard['congestionHours'], 1)
+
+    def test_hourly_summary_groups_hour_of_day(self):
+        """Test that hour-of-day summaries combine the same hour across days"""
+        query = {'streetName': {'$in': ['Orchard Road']}, 'time': {'$lte': '08:59'}}
+        summaries = list(self.historical_traffic_data.aggregate(report_summary_pipeline(query, 'hourly')))
+
+        self.assertEqual(len(summaries), 1)
+        self.assertEqual(summaries[0]['period'], '08:00')
+        self.assertEqual(summaries[0]['samples'], 2)
+        self.assertEqual(summaries[0]['congestionHours'], 2)
+
+    def test_incident_totals_by_local_day(self):
+        """Test that incidents are counted per road, type and Singapore date"""
+        buckets = {
+            (bucket['_id']['type'], incident_summary_period(bucket['_id'], 'daily')): bucket['count']
+            for bucket in self.traffic_incidents.aggregate(
+                incident_summary_pipeline({'road_1'}, None, 'daily'))
+        }
+
+        self.assertEqual(buckets, {
+            ('ACCIDENT', '2025-02-08'): 1,
+            ('CONGESTION', '2025-02-08'): 2,
+            ('CONGESTION', '2025-02-09'): 1,
+        })
+
+    def test_incident_totals_respect_filters(self):
+        """Test that the date bounds and time range limit the counted incidents"""
+        timestamp_range = build_timestamp_range('2025-02-08', '2025-02-08', self.SGT)
+        buckets = {
+            (bucket['_id']['type'], incident_summary_period(bucket['_id'], 'hourly')): bucket['count']
+            for bucket in self.traffic_incidents.aggregate(incident_summary_pipeline(
+                ['road_1'], timestamp_range, 'hourly', {'start': '08:00', 'end': '12:00'}))
+        }
+
+        self.assertEqual(buckets, {('ACCIDENT', '09:00'): 1, ('CONGESTION', '08:00'): 1})
+
+    def test_summary_columns(self):
+        """Test that summary columns follow the data type and period"""
+        self.assertEqual(summary_report_columns('traffic', 'daily')[:2], ['streetName', 'date'])
+        self.assertEqual(summary_report_columns('incidents', 'hourly')[:2], ['streetName', 'hour'])
+        self.assertIn('congestionHours', summary_report_columns('comprehensive', 'daily'))
+
+    def test_cache_key_includes_granularity(self):
+        """Test that summaries get their own cache key and raw keys are unchanged"""
+        filters = {'dataType': 'traffic', 'selectedRoads': ['Orchard Road']}
+
+        self.assertEqual(report_cache_key(filters, 1), report_cache_key(dict(filters, granularity='raw'), 1))
+        self.assertNotEqual(report_cache_key(filters, 1), report_cache_key(dict(filters, granularity='daily'), 1))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,148 @@
+import unittest
+from unittest.mock import MagicMock
+import sys
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+import mongomock
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# Mock APScheduler
+sys.modules['apscheduler.schedulers.background'] = MagicMock()
+sys.modules['apscheduler'] = MagicMock()
+
+from app import ReportJobQueue, ReportQueueFull, report_cache_key
+
+class TestReportJobQueue(unittest.TestCase):
+    def setUp(self):
+        # Mock MongoDB collection shared by every queue, as worker processes share it
+        self.mock_client = mongomock.MongoClient()
+        self.report_jobs = self.mock_client['traffic-data']['report_jobs']
+        self.queues = []
+
+    def tearDown(self):
+        for queue in self.queues:
+            queue.shutdown()
+
+    def make_queue(self, **kwargs):
+        queue = ReportJobQueue(self.report_jobs, **kwargs)
+        self.queues.append(queue)
+        return queue
+
+    def wait_for(self, queue, job_id, timeout=5):
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            job = queue.get(job_id)
+            if job['status'] in ('done', 'failed'):
+                return job
+            time.sleep(0.01)
+        self.fail(f'Job {job_id} did not finish')
+
+    def test_job_reports_progress_and_result(self):
+        """Test that a job moves from running to done with its result"""
+        queue = self.make_queue(max_workers=1)
+        release = threading.Event()
+        reached = threading.Event()
+
+        def build(progress):
+            progress(0.5, 'Halfway')
+            reached.set()
+            release.wait(5)
+            return 'report_1'
+
+        job, created = queue.submit('key', build)
+        self.assertTrue(created)
+        self.assertTrue(reached.wait(5))
+
+        running = queue.get(job['id'])
+        self.assertEqual((running['status'], running['progress'], running['message']), ('running', 0.5, 'Halfway'))
+
+        release.set()
+        finished = self.wait_for(queue, job['id'])
+        self.assertEqual((finished['status'], finished['result']), ('done', 'report_1'))
+        self.assertIsNotNone(finished['finishedAt'].tzinfo)
+
+    def test_identical_jobs_are_deduplicated(self):
+        """Test that a key already in flight returns the existing job"""
+        queue = self.make_queue(max_workers=1)
+        release = threading.Event()
+
+        first, _ = queue.submit('key', lambda progress: release.wait(5), owner='alice')
+        second, created = queue.submit('key', lambda progress: None, owner='bob')
+
+        self.assertFalse(created)
+        self.assertEqual(first['id'], second['id'])
+        self.assertEqual(second['owners'], ['alice', 'bob'])
+        release.set()
+        self.wait_for(queue, first['id'])
+
+        third, created = queue.submit('key', lambda progress: None)
+        self.assertTrue(created)
+        self.assertNotEqual(third['id'], first['id'])
+
+    def test_jobs_are_shared_between_processes(self):
+        """Test that another worker's queue sees and joins a job through Mongo"""
+        queue = self.make_queue(max_workers=1)
+        other = self.make_queue(max_workers=1)
+        release = threading.Event()
+
+        job, _ = queue.submit('key', lambda progress: release.wait(5) and 'report_1')
+        joined, created = other.submit('key', lambda progress: None)
+
+        self.assertFalse(created)
+        self.assertEqual(joined['id'], job['id'])
+        release.set()
+        self.assertEqual(self.wait_for(other, job['id'])['result'], 'report_1')
+
+    def test_queue_is_bounded(self):
+        """Test that submitting past max_pending raises ReportQueueFull"""
+        queue = self.make_queue(max_workers=1, max_pending=2)
+        release = threading.Event()
+        queue.submit('a', lambda progress: release.wait(5))
+        queue.submit('b', lambda progress: release.wait(5))
+
+        with self.assertRaises(ReportQueueFull):
+            queue.submit('c', lambda progress: None)
+        release.set()
+
+    def test_failure_is_recorded(self):
+        """Test that an exception marks the job failed with its message"""
+        queue = self.make_queue()
+
+        def build(progress):
+            raise ValueError('No data found for the selected criteria')
+
+        job, _ = queue.submit('key', build)
+        failed = self.wait_for(queue, job['id'])
+
+        self.assertEqual(failed['status'], 'failed')
+        self.assertEqual(failed['error'], 'No data found for the selected criteria')
+        self.assertEqual(queue.stats()['failed'], 1)
+
+    def test_jobs_of_a_stopped_process_fail(self):
+        """Test that a job nobody heartbeats is marked failed and frees its key"""
+        queue = self.make_queue(stale_seconds=60)
+        self.report_jobs.insert_one({
+            '_id': 'lost', 'key': 'key', 'owners': ['alice'], 'active': True, 'status': 'running',
+            'progress': 0.4, 'message': 'Rendering', 'result': None, 'error': None,
+            'createdAt': datetime.utcnow() - timedelta(minutes=5), 'startedAt': None, 'finishedAt': None,
+            'heartbeatAt': datetime.utcnow() - timedelta(minutes=2)
+        })
+
+        self.assertEqual(queue.get('lost')['status'], 'failed')
+        job, created = queue.submit('key', lambda progress: None)
+        self.assertTrue(created)
+        self.wait_for(queue, job['id'])
+
+    def test_cache_key_ignores_road_order(self):
+        """Test that report keys depend on filters and data version only"""
+        filters = {'dataType': 'traffic', 'selectedRoads': ['Orchard Road', 'Marina Bay']}
+        reordered = {'dataType': 'traffic', 'selectedRoads': ['Marina Bay', 'Orchard Road'],
+                     'metadata': {'generatedAt': '2025-02-08T10:00:00Z'}}
+
+        self.assertEqual(report_cache_key(filters, 3), report_cache_key(reordered, 3))
+        self.assertNotEqual(report_cache_key(filters, 3), report_cache_key(filters, 4))
+
+if __name__ == '__main__':
+    unittest.main()
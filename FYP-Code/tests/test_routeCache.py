@@ -0,0 +1,89 @@
+import unittest
+from unittest.mock import MagicMock
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# Mock APScheduler
+sys.modules['apscheduler.schedulers.background'] = MagicMock()
+sys.modules['apscheduler'] = MagicMock()
+
+from app import RouteCache
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+class TestRouteCache(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.route = {'coordinates': [[1.3048, 103.8318], [1.2847, 103.8610]], 'alternatives': []}
+
+    def make_cache(self, **kwargs):
+        kwargs.setdefault('clock', self.clock)
+        return RouteCache(**kwargs)
+
+    def test_hit_and_miss_are_counted(self):
+        """Test that lookups report hits and misses"""
+        cache = self.make_cache()
+
+        self.assertIsNone(cache.get((1, 2, 3, 7)))
+        cache.put((1, 2, 3, 7), self.route)
+
+        self.assertIs(cache.get((1, 2, 3, 7)), self.route)
+        stats = cache.stats()
+        self.assertEqual((stats['hits'], stats['misses']), (1, 1))
+        self.assertEqual(stats['hitRate'], 0.5)
+
+    def test_weights_version_is_part_of_the_key(self):
+        """Test that a route from older weights is not served for a newer version"""
+        cache = self.make_cache()
+        cache.put((1, 2, 3, 7), self.route)
+
+        self.assertIsNone(cache.get((1, 2, 3, 8)))
+
+    def test_least_recently_used_is_evicted(self):
+        """Test that the entry used longest ago is evicted first"""
+        cache = self.make_cache(capacity=2)
+        cache.put('a', 1)
+        cache.put('b', 2)
+        cache.get('a')
+        cache.put('c', 3)
+
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('a'), 1)
+        self.assertEqual(cache.stats()['evictions'], 1)
+
+    def test_entries_expire(self):
+        """Test that entries older than the TTL are dropped"""
+        cache = self.make_cache(ttl=300)
+        cache.put('a', 1)
+
+        self.clock.now = 299
+        self.assertEqual(cache.get('a'), 1)
+        self.clock.now = 301
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(cache.stats()['expirations'], 1)
+
+    def test_clear_invalidates(self):
+        """Test that clearing drops every entry"""
+        cache = self.make_cache()
+        cache.put('a', 1)
+        cache.clear()
+
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(cache.stats()['size'], 0)
+        self.assertEqual(cache.stats()['invalidations'], 1)
+
+    def test_zero_capacity_disables_cache(self):
+        """Test that a zero capacity stores nothing"""
+        cache = self.make_cache(capacity=0)
+        cache.put('a', 1)
+
+        self.assertIsNone(cache.get('a'))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,161 @@
+import unittest
+from unittest.mock import MagicMock, patch
+import sys
+import os
+import random
+import shutil
+import subprocess
+import tempfile
+import time
+import mongomock
+import networkx as nx
+import numpy as np
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# Mock APScheduler
+sys.modules['apscheduler.schedulers.background'] = MagicMock()
+sys.modules['apscheduler'] = MagicMock()
+
+from app import create_app, CSRGraph, run_route_searches, travel_minutes, ROUTE_BASE_SPEED_KMH
+
+class TestRouteMatrix(unittest.TestCase):
+    def setUp(self):
+        # Small random road graph with one node that cannot be reached
+        rng = random.Random(11)
+        self.G = nx.DiGraph()
+        for node in range(60):
+            self.G.add_node(node, y=1.28 + rng.random() * 0.05, x=103.80 + rng.random() * 0.05)
+        for u in range(59):
+            for v in rng.sample(range(59), 3):
+                if u != v:
+                    self.G.add_edge(u, v, length=rng.uniform(100, 900))
+                    self.G.add_edge(v, u, length=rng.uniform(100, 900))
+        self.G.add_edge(59, 0, length=250.0)
+        for eid, (u, v, data) in enumerate(self.G.edges(data=True)):
+            data['eid'] = eid
+
+        self.weights = np.array([data['length'] * rng.choice([1.0, 1.5, 2.0])
+                                 for _, _, data in self.G.edges(data=True)])
+
+    def nx_costs(self, source):
+        return nx.single_source_dijkstra_path_length(
+            self.G, source, weight=lambda u, v, data: self.weights[data['eid']])
+
+    def test_one_to_many_matches_dijkstra(self):
+        """Test that one search gives optimal costs and the lengths of those paths"""
+        csr = CSRGraph.from_networkx(self.G)
+        targets = [5, 17, 33, 0, 42]
+        costs, lengths = csr.one_to_many(csr.node_index[3], [csr.node_index[t] for t in targets], self.weights)
+
+        expected = self.nx_costs(3)
+        for target, cost, length in zip(targets, costs, lengths):
+            self.assertAlmostEqual(cost, expected[target], places=6)
+            path = nx.dijkstra_path(self.G, 3, target, weight=lambda u, v, data: self.weights[data['eid']])
+            path_length = sum(self.G.edges[u, v]['length'] for u, v in zip(path, path[1:]))
+            self.assertAlmostEqual(length, path_length, places=0)
+
+    def test_unreachable_target(self):
+        """Test that an unreachable target gets an infinite cost and no length"""
+        csr = CSRGraph.from_networkx(self.G)
+        costs, lengths = csr.one_to_many(csr.node_index[0], [csr.node_index[59], csr.node_index[0]], self.weights)
+
+        self.assertTrue(np.isinf(costs[0]))
+        self.assertTrue(np.isnan(lengths[0]))
+        self.assertEqual(costs[1], 0.0)
+
+    def test_run_route_searches(self):
+        """Test that each search returns one row per requested target"""
+        csr = CSRGraph.from_networkx(self.G)
+        searches = [(csr.node_index[1], [csr.node_index[2], csr.node_index[3]]),
+                    (csr.node_index[4], [csr.node_index[5]])]
+
+        results = run_route_searches(csr, self.weights, searches)
+
+        self.assertEqual([len(costs) for costs, _ in results], [2, 1])
+        self.assertAlmostEqual(results[1][0][0], self.nx_costs(4)[5], places=6)
+
+    def test_travel_minutes(self):
+        """Test that weighted metres convert to minutes at the base speed"""
+        self.assertAlmostEqual(travel_minutes(ROUTE_BASE_SPEED_KMH * 1000.0), 60.0)
+        self.assertTrue(np.isinf(travel_minutes(np.array([np.inf])))[0])
+
+class TestRouteBatchEndpoint(unittest.TestCase):
+    def setUp(self):
+        # Small grid of roads inside Singapore, cached on disk like the real graph
+        self.G = nx.DiGraph()
+        for row in range(4):
+            for col in range(4):
+                self.G.add_node(row * 4 + col, y=1.30 + row * 0.002, x=103.80 + col * 0.002)
+        for row in range(4):
+            for col in range(4):
+                node = row * 4 + col
+                for neighbour in ((node + 1) if col < 3 else None, (node + 4) if row < 3 else None):
+                    if neighbour is not None:
+                        self.G.add_edge(node, neighbour, length=220.0)
+                        self.G.add_edge(neighbour, node, length=220.0)
+        for eid, (u, v, data) in enumerate(self.G.edges(data=True)):
+            data['eid'] = eid
+
+        self.cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.cache_dir, ignore_errors=True)
+        CSRGraph.from_networkx(self.G).save(self.cache_dir)
+
+        self.request = {
+            'origins': [[1.300, 103.800], [1.306, 103.806]],
+            'destinations': [[1.306, 103.800], [1.300, 103.806], [1.302, 103.802]]
+        }
+
+    def make_client(self, **env):
+        env = dict(env, ROUTING_WARMUP='true', ROUTING_GRAPH_CACHE=self.cache_dir)
+        with patch('gridfs.GridFS'), patch.dict(os.environ, env):
+            app = create_app(db_client=mongomock.MongoClient())
+        client = app.test_client()
+
+        deadline = time.time() + 10
+        while client.get('/api/health/routing').status_code != 200:
+            if time.time() > deadline:
+                self.fail('Routing did not warm up')
+            time.sleep(0.05)
+        return client
+
+    def test_matrix_times_and_distances(self):
+        """Test that a matrix request returns shortest distances for every origin and destination"""
+        client = self.make_client(ROUTE_BATCH_WORKERS='1')
+
+        response = client.post('/api/route/batch', json=self.request)
+
+        self.assertEqual(response.status_code, 200)
+        body = response.get_json()
+        self.assertEqual(body['distances'], [[660.0, 660.0, 440.0], [660.0, 660.0, 880.0]])
+        self.assertEqual(len(body['times']), 2)
+        self.assertTrue(all(value > 0 for row in body['times'] for value in row))
+
+    def test_pool_workers_match_inline_searches(self):
+        """Test that searches spread over the process pool give the inline results"""
+        inline = self.make_client(ROUTE_BATCH_WORKERS='1').post('/api/route/batch', json=self.request)
+        pooled = self.make_client(ROUTE_BATCH_WORKERS='2', ROUTE_BATCH_POOL_MIN_SOURCES='1').post(
+            '/api/route/batch', json=self.request)
+
+        self.assertEqual(pooled.status_code, 200)
+        self.assertEqual(pooled.get_json(), inline.get_json())
+
+    def test_points_outside_singapore_are_rejected(self):
+        """Test that out of bounds points get a 400 before any routing"""
+        client = self.make_client()
+
+        response = client.post('/api/route/batch', json={'origins': [[40.7, -74.0]], 'destinations': [[1.3, 103.8]]})
+
+        self.assertEqual(response.status_code, 400)
+
+    def test_worker_module_has_no_heavy_imports(self):
+        """Test that the module pool workers import does not pull in the app's ML and OSM stack"""
+        loaded = subprocess.run(
+            [sys.executable, '-c', 'import sys, routing_graph; print(" ".join(sys.modules))'],
+            cwd=os.path.join(os.path.dirname(__file__), '..'), capture_output=True, text=True, check=True
+        ).stdout.split()
+
+        for module in ('app', 'tensorflow', 'torch', 'osmnx', 'networkx', 'flask'):
+            self.assertNotIn(module, loaded)
+
+if __name__ == '__main__':
+    unittest.main()
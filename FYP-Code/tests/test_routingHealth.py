@@ -0,0 +1,81 @@
+import unittest
+from unittest.mock import MagicMock, patch
+import sys
+import os
+import shutil
+import tempfile
+import threading
+import time
+import mongomock
+import networkx as nx
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# Mock APScheduler
+sys.modules['apscheduler.schedulers.background'] = MagicMock()
+sys.modules['apscheduler'] = MagicMock()
+
+from app import create_app, CSRGraph
+
+class TestRoutingHealth(unittest.TestCase):
+    def setUp(self):
+        # Mock MongoDB client
+        self.mock_client = mongomock.MongoClient()
+        self.cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.cache_dir, ignore_errors=True)
+
+    def make_app(self, **env):
+        with patch('gridfs.GridFS'), patch.dict(os.environ, env):
+            app = create_app(db_client=self.mock_client)
+        return app, app.test_client()
+
+    def test_injected_client_skips_warmup(self):
+        """Test that an app given a client does not load the routing graph"""
+        app, client = self.make_app()
+
+        self.assertNotIn('routing-warmup', [thread.name for thread in threading.enumerate()])
+        self.assertEqual(client.get('/api/health/routing').get_json()['status'], 'cold')
+
+    def test_health_is_unavailable_while_cold(self):
+        """Test that routing health is 503 with Retry-After before the graph is loaded"""
+        app, client = self.make_app(ROUTING_RETRY_AFTER='7')
+
+        response = client.get('/api/health/routing')
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.headers['Retry-After'], '7')
+        self.assertFalse(response.get_json()['ready'])
+
+    def test_routes_are_unavailable_while_cold(self):
+        """Test that route requests get 503 with Retry-After until routing is warm"""
+        app, client = self.make_app(ROUTING_RETRY_AFTER='7')
+
+        response = client.post('/api/route', json={'origin': [1.30, 103.80], 'destination': [1.31, 103.81]})
+
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.headers['Retry-After'], '7')
+        self.assertEqual(response.get_json()['status'], 'cold')
+
+    def test_health_reports_ready_graph(self):
+        """Test that warm-up from a graph cache makes routing healthy"""
+        G = nx.DiGraph()
+        G.add_node(0, x=103.80, y=1.30)
+        G.add_node(1, x=103.81, y=1.31)
+        G.add_edge(0, 1, eid=0, length=1500)
+        G.add_edge(1, 0, eid=1, length=1500)
+        cache = os.path.join(self.cache_dir, 'graph')
+        CSRGraph.from_networkx(G).save(cache)
+
+        app, client = self.make_app(ROUTING_WARMUP='true', ROUTING_GRAPH_CACHE=cache)
+
+        deadline = time.time() + 10
+        response = client.get('/api/health/routing')
+        while response.status_code != 200 and time.time() < deadline:
+            time.sleep(0.05)
+            response = client.get('/api/health/routing')
+
+        self.assertEqual(response.status_code, 200)
+        health = response.get_json()
+        self.assertTrue(health['ready'])
+        self.assertEqual((health['nodes'], health['edges']), (2, 2))
+
+if __name__ == '__main__':
+    unittest.main()
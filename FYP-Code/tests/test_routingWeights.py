@@ -0,0 +1,45 @@
+import unittest
+from unittest.mock import MagicMock
+import sys
+import os
+import networkx as nx
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# Mock APScheduler
+sys.modules['apscheduler.schedulers.background'] = MagicMock()
+sys.modules['apscheduler'] = MagicMock()
+
+from app import RoutingWeights
+
+class TestRoutingWeights(unittest.TestCase):
+    def setUp(self):
+        # Two routes between nodes 0 and 3, numbered like initialize_routing_graph
+        self.G = nx.DiGraph()
+        self.G.add_edge(0, 1, length=100)
+        self.G.add_edge(1, 3, length=100)
+        self.G.add_edge(0, 2, length=150)
+        self.G.add_edge(2, 3, length=150)
+        for eid, (u, v, data) in enumerate(self.G.edges(data=True)):
+            data['eid'] = eid
+
+    def test_weights_are_read_only(self):
+        """Test that published weights cannot be modified in place"""
+        lengths = [100, 150, 100, 150]
+        routing_weights = RoutingWeights(1, lengths)
+        lengths[0] = 999
+
+        self.assertEqual(routing_weights.weights[0], 100)
+        with self.assertRaises(ValueError):
+            routing_weights.weights[0] = 500
+
+    def test_weight_function_drives_path_search(self):
+        """Test that paths follow the weights of the version passed in, not edge attributes"""
+        free_flow = RoutingWeights(1, [100, 150, 100, 150])
+        congested = RoutingWeights(2, [300, 150, 300, 150])
+
+        self.assertEqual(nx.shortest_path(self.G, 0, 3, weight=free_flow.weight_function()), [0, 1, 3])
+        self.assertEqual(nx.shortest_path(self.G, 0, 3, weight=congested.weight_function()), [0, 2, 3])
+        self.assertNotIn('weight', self.G.edges[0, 1])
+
+if __name__ == '__main__':
+    unittest.main()
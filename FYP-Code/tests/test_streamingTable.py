@@ -0,0 +1,68 @@
+import unittest
+from unittest.mock import MagicMock
+import sys
+import os
+from io import BytesIO
+import re
+from reportlab.lib.pagesizes import letter, landscape
+from reportlab.platypus import SimpleDocTemplate, Paragraph, TableStyle
+from reportlab.lib.styles import getSampleStyleSheet
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# Mock APScheduler
+sys.modules['apscheduler.schedulers.background'] = MagicMock()
+sys.modules['apscheduler'] = MagicMock()
+
+from app import StreamingTable
+
+class TestStreamingTable(unittest.TestCase):
+    def setUp(self):
+        self.columns = ['streetName', 'date', 'time', 'currentSpeed']
+        self.pulled = 0
+        self.pulled_per_page = []
+
+    def rows(self, count):
+        for index in range(count):
+            self.pulled += 1
+            yield ['Orchard Road', '08-02-2025', f'{index % 24:02d}:00', index]
+
+    def render(self, row_count):
+        buffer = BytesIO()
+        doc = SimpleDocTemplate(buffer, pagesize=landscape(letter), leftMargin=50, rightMargin=50,
+                                topMargin=50, bottomMargin=50, pageCompression=0)
+        table = StreamingTable(self.columns, self.rows(row_count), TableStyle([]),
+                               [doc.width / len(self.columns)] * len(self.columns))
+        elements = [Paragraph('Traffic Report', getSampleStyleSheet()['Title']), table]
+        doc.build(elements, onFirstPage=self.record_page, onLaterPages=self.record_page)
+        self.rows_per_page = int((doc.height - table.header_height) // table.row_height)
+        return buffer.getvalue()
+
+    def record_page(self, canvas, doc):
+        self.pulled_per_page.append(self.pulled)
+
+    def test_every_row_is_rendered(self):
+        """Test that all rows are drawn, in order, across pages"""
+        pdf = self.render(100)
+
+        self.assertEqual(self.pulled, 100)
+        self.assertIn(b'(99)', pdf)
+        self.assertGreater(len(self.pulled_per_page), 1)
+        # The header is repeated on every page
+        self.assertEqual(len(re.findall(rb'\(currentSpeed\)', pdf)), len(self.pulled_per_page))
+
+    def test_rows_are_pulled_one_page_at_a_time(self):
+        """Test that rows are read from the iterator only as pages are laid out"""
+        self.render(300)
+
+        for page, pulled in enumerate(self.pulled_per_page):
+            self.assertLessEqual(pulled, (page + 1) * self.rows_per_page + 1)
+
+    def test_empty_iterator(self):
+        """Test that a table without rows renders nothing"""
+        pdf = self.render(0)
+
+        self.assertTrue(pdf.startswith(b'%PDF'))
+        self.assertNotIn(b'(currentSpeed)', pdf)
+
+if __name__ == '__main__':
+    unittest.main()
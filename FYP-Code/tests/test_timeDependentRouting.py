@@ -0,0 +1,255 @@
+import unittest
+from unittest.mock import MagicMock, patch
+import sys
+import os
+import heapq
+import random
+import shutil
+import tempfile
+import time
+from datetime import datetime, timedelta
+import mongomock
+import networkx as nx
+import numpy as np
+import pytz
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# Mock APScheduler
+sys.modules['apscheduler.schedulers.background'] = MagicMock()
+sys.modules['apscheduler'] = MagicMock()
+
+from app import (create_app, haversine_m, CSRGraph, EdgeSensorIndex, SpeedProfiles, TimeDependentRouter,
+                 week_seconds, PROFILE_SLOTS_PER_WEEK, profile_slot, speed_profile_pipeline)
+
+class TestTimeDependentRouting(unittest.TestCase):
+    def setUp(self):
+        # Set up Singapore timezone
+        self.SGT = pytz.timezone('Asia/Singapore')
+
+        # Random road graph around central Singapore, lengths never shorter than the straight line
+        rng = random.Random(5)
+        self.G = nx.DiGraph()
+        for node in range(120):
+            self.G.add_node(node, y=1.28 + rng.random() * 0.05, x=103.80 + rng.random() * 0.05)
+        for u in range(120):
+            for v in rng.sample(range(120), 4):
+                if u != v:
+                    self.G.add_edge(u, v, length=self.straight_line(u, v) * rng.uniform(1.0, 1.4))
+                    self.G.add_edge(v, u, length=self.straight_line(u, v) * rng.uniform(1.0, 1.4))
+
+        # Sensors that are fast at night and crawl in the Monday morning peak
+        self.sensors = [(1.29, 103.81), (1.31, 103.83), (1.32, 103.84)]
+        monday = self.SGT.localize(datetime(2025, 2, 3))
+        self.records = []
+        for lat, lng in self.sensors:
+            for hour in range(24):
+                timestamp = (monday + timedelta(hours=hour)).astimezone(pytz.utc).replace(tzinfo=None)
+                self.records.append({
+                    'coordinates': {'lat': lat, 'lng': lng},
+                    'timestamp': timestamp,
+                    'currentSpeed': 10 if 7 <= hour <= 9 else 60,
+                    'freeFlowSpeed': 60
+                })
+
+    def straight_line(self, u, v):
+        return float(haversine_m(self.G.nodes[u]['y'], self.G.nodes[u]['x'],
+                                 self.G.nodes[v]['y'], self.G.nodes[v]['x']))
+
+    def make_router(self):
+        csr = CSRGraph.from_networkx(self.G)
+        profiles = SpeedProfiles.from_records(self.records, self.SGT)
+        return csr, TimeDependentRouter(csr, EdgeSensorIndex(csr), profiles)
+
+    def reference_seconds(self, csr, router, source, target, departure):
+        """Plain time-dependent Dijkstra over eids, stepping through each 15-minute slot"""
+        start = week_seconds(departure, self.SGT)
+        rows = router.edge_sensors
+        arrival = {source: start}
+        heap = [(start, source)]
+        while heap:
+            t, u = heapq.heappop(heap)
+            if u == target:
+                return t - start
+            if t > arrival[u]:
+                continue
+            for slot in range(csr.indptr[u], csr.indptr[u + 1]):
+                eid = csr.eids[slot]
+                remaining, at = float(csr.lengths[eid]), t
+                while True:
+                    period = int(at // 900)
+                    speed = float(router.speed_table[rows[eid], period % PROFILE_SLOTS_PER_WEEK])
+                    if at + remaining / speed <= (period + 1) * 900:
+                        at += remaining / speed
+                        break
+                    remaining -= speed * ((period + 1) * 900 - at)
+                    at = (period + 1) * 900
+                v = int(csr.targets[slot])
+                if at < arrival.get(v, float('inf')):
+                    arrival[v] = at
+                    heapq.heappush(heap, (at, v))
+        return None
+
+    def test_profile_slots(self):
+        """Test that timestamps map to Monday-based 15-minute slots in local time"""
+        self.assertEqual(profile_slot(self.SGT.localize(datetime(2025, 2, 3, 0, 0)), self.SGT), 0)
+        self.assertEqual(profile_slot(self.SGT.localize(datetime(2025, 2, 4, 8, 20)), self.SGT), 96 + 33)
+        # Naive timestamps are UTC, as stored by Mongo
+        self.assertEqual(profile_slot(datetime(2025, 2, 3, 0, 20), self.SGT), 33)
+
+    def test_profiles_interpolate_missing_slots(self):
+        """Test that slots between hourly samples are interpolated around the week"""
+        profiles = SpeedProfiles.from_records(self.records, self.SGT)
+
+        self.assertEqual(profiles.speeds.shape, (3, 7 * 96))
+        self.assertAlmostEqual(float(profiles.speeds[0, 8 * 4]), 10.0)
+        self.assertAlmostEqual(float(profiles.speeds[0, 9 * 4 + 2]), 35.0)
+        self.assertAlmostEqual(float(profiles.speeds[0, 3 * 96]), 60.0)
+        self.assertAlmostEqual(float(profiles.free_flow[0]), 60.0)
+
+    def test_aggregated_profiles_match_records(self):
+        """Test that profiles summed in Mongo equal profiles built from the raw records"""
+        collection = mongomock.MongoClient()['traffic-data']['historical_traffic_data']
+        collection.insert_many([dict(record) for record in self.records])
+        collection.insert_one(dict(self.records[0], currentSpeed=99, backfilled=True))
+
+        expected = SpeedProfiles.from_records(self.records, self.SGT)
+        totals = collection.aggregate(speed_profile_pipeline(datetime(2025, 1, 1), self.SGT))
+        profiles = SpeedProfiles.from_slot_totals(totals, self.SGT)
+
+        self.assertEqual(sorted(profiles.road_coords), sorted(expected.road_coords))
+        for row, coords in enumerate(profiles.road_coords):
+            expected_row = expected.road_coords.index(coords)
+            np.testing.assert_allclose(profiles.speeds[row], expected.speeds[expected_row])
+            self.assertAlmostEqual(float(profiles.free_flow[row]), float(expected.free_flow[expected_row]))
+        self.assertEqual(profiles.samples, expected.samples)
+
+    def test_matches_reference_dijkstra(self):
+        """Test that the A* search finds the earliest arrival across slot boundaries"""
+        csr, router = self.make_router()
+        rng = random.Random(9)
+
+        for hour, minute in [(3, 0), (7, 50), (9, 55), (6, 58)]:
+            departure = self.SGT.localize(datetime(2025, 2, 10, hour, minute))
+            for _ in range(5):
+                source, target = rng.sample(range(csr.num_nodes), 2)
+                result = router.earliest_arrival(source, target, departure)
+                expected = self.reference_seconds(csr, router, source, target, departure)
+                if expected is None:
+                    self.assertIsNone(result)
+                    continue
+                seconds, nodes, eids, entry_seconds = result
+                self.assertAlmostEqual(seconds, expected, places=6)
+                self.assertEqual((nodes[0], nodes[-1]), (source, target))
+                self.assertEqual(len(eids), len(nodes) - 1)
+                self.assertEqual(entry_seconds[0], 0.0)
+
+    def test_peak_departure_is_slower(self):
+        """Test that the same trip takes longer when leaving in the morning peak"""
+        csr, router = self.make_router()
+        source = csr.nearest_node(1.29, 103.81)
+        target = csr.nearest_node(1.32, 103.84)
+
+        night = router.earliest_arrival(source, target, self.SGT.localize(datetime(2025, 2, 10, 3, 0)))
+        peak = router.earliest_arrival(source, target, self.SGT.localize(datetime(2025, 2, 10, 8, 0)))
+
+        self.assertGreater(peak[0], night[0])
+
+    def test_unreachable_target(self):
+        """Test that an unreachable node gives None"""
+        self.G.add_node(999, y=1.30, x=103.82)
+        csr, router = self.make_router()
+
+        departure = self.SGT.localize(datetime(2025, 2, 10, 8, 0))
+        self.assertIsNone(router.earliest_arrival(0, csr.node_index[999], departure))
+
+class TestTimeDependentRouteEndpoint(unittest.TestCase):
+    def setUp(self):
+        # Mock MongoDB client
+        self.mock_client = mongomock.MongoClient()
+        self.cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.cache_dir, ignore_errors=True)
+
+        # A chain of roads heading north-east, with a sensor on every node
+        G = nx.DiGraph()
+        for node in range(5):
+            G.add_node(node, y=1.30 + node * 0.005, x=103.80 + node * 0.005)
+        for eid, node in enumerate(range(4)):
+            G.add_edge(node, node + 1, eid=2 * eid, length=800)
+            G.add_edge(node + 1, node, eid=2 * eid + 1, length=800)
+        self.cache = os.path.join(self.cache_dir, 'graph')
+        CSRGraph.from_networkx(G).save(self.cache)
+        self.nodes = [(G.nodes[node]['y'], G.nodes[node]['x']) for node in G.nodes]
+
+    def add_history(self):
+        now = datetime.utcnow().replace(minute=0, second=0, microsecond=0)
+        self.mock_client['traffic-data']['historical_traffic_data'].insert_many([
+            {
+                'coordinates': {'lat': lat, 'lng': lng},
+                'timestamp': now - timedelta(hours=hour),
+                'currentSpeed': 30,
+                'freeFlowSpeed': 50
+            }
+            for lat, lng in self.nodes for hour in range(1, 48)
+        ])
+
+    def make_client(self):
+        with patch('gridfs.GridFS'), patch.dict(os.environ, {'ROUTING_WARMUP': 'true',
+                                                             'ROUTING_GRAPH_CACHE': self.cache}):
+            app = create_app(db_client=self.mock_client)
+        client = app.test_client()
+
+        deadline = time.time() + 10
+        while client.get('/api/health/routing').status_code != 200 and time.time() < deadline:
+            time.sleep(0.05)
+        self.assertEqual(client.get('/api/health/routing').status_code, 200)
+        return client
+
+    def route(self, client, **extra):
+        return client.post('/api/route', json=dict(origin=list(self.nodes[0]), destination=list(self.nodes[4]),
+                                                   **extra))
+
+    def test_invalid_departure_time(self):
+        """Test that a departure time that is not ISO 8601 is rejected"""
+        client = self.make_client()
+
+        response = self.route(client, departureTime='next tuesday')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('departureTime', response.get_json()['error'])
+
+    def test_unavailable_without_profiles(self):
+        """Test that departure-time routing is unavailable before any history is stored"""
+        client = self.make_client()
+
+        response = self.route(client, departureTime='2025-02-10T08:00:00')
+
+        self.assertEqual(response.status_code, 503)
+
+    def test_route_arrives_after_departure(self):
+        """Test that a departure-time route reports when it arrives"""
+        self.add_history()
+        client = self.make_client()
+
+        response = self.route(client, departureTime='2025-02-10T08:00:00+08:00')
+
+        self.assertEqual(response.status_code, 200)
+        route = response.get_json()
+        self.assertEqual(route['departureTime'], '2025-02-10T08:00:00+08:00')
+        arrival = datetime.fromisoformat(route['arrivalTime'])
+        departure = datetime.fromisoformat(route['departureTime'])
+        self.assertAlmostEqual((arrival - departure).total_seconds() / 60, route['time'], places=3)
+        self.assertAlmostEqual(route['distance'], 3200)
+
+    def test_departure_time_bypasses_route_cache(self):
+        """Test that departure-time routes neither read nor fill the route cache"""
+        self.add_history()
+        client = self.make_client()
+
+        for _ in range(2):
+            self.assertEqual(self.route(client, departureTime='2025-02-10T08:00:00').status_code, 200)
+
+        cache = client.get('/api/health/routing').get_json()['routeCache']
+        self.assertEqual((cache['size'], cache['hits'], cache['misses']), (0, 0, 0))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,129 @@
+import unittest
+from unittest.mock import MagicMock, Mock
+import sys
+import os
+from datetime import date
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# Mock APScheduler
+sys.modules['apscheduler.schedulers.background'] = MagicMock()
+sys.modules['apscheduler'] = MagicMock()
+
+from app import TomTomRateLimiter, request_flow_segment, TomTomQuotaExceeded
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+class TestTomTomRateLimiter(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.day = date(2025, 2, 8)
+        self.limiter = TomTomRateLimiter(
+            max_per_second=2,
+            daily_quota=5,
+            today=lambda: self.day,
+            forbidden_cooldown=60,
+            clock=self.clock
+        )
+
+    def make_response(self, status_code, description=''):
+        response = Mock()
+        response.status_code = status_code
+        response.json.return_value = {'error': {'description': description}}
+        response.text = description
+        return response
+
+    def test_calls_are_paced_per_second(self):
+        """Test that the token bucket refuses calls beyond the per-second rate"""
+        self.assertTrue(self.limiter.acquire(timeout=0))
+        self.assertTrue(self.limiter.acquire(timeout=0))
+        self.assertFalse(self.limiter.acquire(timeout=0))
+
+        self.clock.now += 0.5
+        self.assertTrue(self.limiter.acquire(timeout=0))
+        self.assertEqual(self.limiter.stats()['callsLastSecond'], 3)
+
+    def test_daily_quota_is_enforced_and_resets(self):
+        """Test that calls stop at the daily quota and resume the next day"""
+        for _ in range(5):
+            self.clock.now += 1
+            self.assertTrue(self.limiter.acquire(timeout=0))
+
+        self.clock.now += 1
+        self.assertFalse(self.limiter.acquire(timeout=0))
+        self.assertTrue(self.limiter.quota_exhausted())
+        self.assertEqual(self.limiter.stats()['remainingToday'], 0)
+
+        self.day = date(2025, 2, 9)
+        self.assertFalse(self.limiter.quota_exhausted())
+        self.assertTrue(self.limiter.acquire(timeout=0))
+
+    def test_backoff_on_throttling(self):
+        """Test that a 429 response delays further calls with a growing backoff"""
+        self.limiter.record_response(self.make_response(429))
+        self.assertFalse(self.limiter.acquire(timeout=0))
+        self.assertFalse(self.limiter.is_blocked())
+
+        self.clock.now += 1.1
+        self.assertTrue(self.limiter.acquire(timeout=0))
+
+        self.limiter.record_response(self.make_response(429))
+        self.assertEqual(self.limiter.stats()['backoffSeconds'], 2)
+
+        self.clock.now += 2.1
+        self.limiter.record_response(self.make_response(200))
+        self.assertEqual(self.limiter.backoff_seconds, 0)
+
+    def test_quota_error_blocks_until_next_day(self):
+        """Test that a 403 quota error blocks calls for the rest of the day"""
+        self.limiter.record_response(self.make_response(403, 'Developer Over Qps - quota exceeded'))
+
+        self.assertTrue(self.limiter.is_blocked())
+        self.assertFalse(self.limiter.acquire(timeout=0))
+        self.assertTrue(self.limiter.stats()['quotaExceeded'])
+
+        self.day = date(2025, 2, 9)
+        self.assertFalse(self.limiter.is_blocked())
+
+    def test_invalid_key_blocks_for_cooldown(self):
+        """Test that a non-quota 403 blocks calls for the cooldown period"""
+        self.limiter.record_response(self.make_response(403, 'Invalid key'))
+
+        self.assertTrue(self.limiter.is_blocked())
+        self.assertFalse(self.limiter.acquire(timeout=0))
+
+        self.clock.now += 61
+        self.assertFalse(self.limiter.is_blocked())
+        self.assertTrue(self.limiter.acquire(timeout=0))
+
+    def test_request_flow_segment_retries_after_throttling(self):
+        """Test that a throttled flow request is retried through the limiter"""
+        limiter = Mock()
+        limiter.acquire.return_value = True
+        session = Mock()
+        session.get.side_effect = [self.make_response(429), self.make_response(200)]
+
+        road = {"name": "Orchard Road", "lat": 1.3048, "lng": 103.8318}
+        response = request_flow_segment(session, road, 'test-key', rate_limiter=limiter)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(session.get.call_count, 2)
+        self.assertEqual(limiter.record_response.call_count, 2)
+
+    def test_request_flow_segment_refused(self):
+        """Test that no request is made when the limiter refuses the call"""
+        limiter = Mock()
+        limiter.acquire.return_value = False
+        session = Mock()
+
+        road = {"name": "Orchard Road", "lat": 1.3048, "lng": 103.8318}
+        with self.assertRaises(TomTomQuotaExceeded):
+            request_flow_segment(session, road, 'test-key', rate_limiter=limiter)
+        session.get.assert_not_called()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+import unittest
+from flask import json
+from unittest.mock import MagicMock, patch
+import sys
+import os
+from datetime import datetime
+import mongomock
+import pytz
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# Mock APScheduler
+sys.modules['apscheduler.schedulers.background'] = MagicMock()
+sys.modules['apscheduler'] = MagicMock()
+
+from app import create_app, whole_hour_bounds
+
+class TestTrafficAnalysis(unittest.TestCase):
+    def setUp(self):
+        # Mock MongoDB client
+        self.mock_client = mongomock.MongoClient()
+        SGT = pytz.timezone('Asia/Singapore')
+
+        samples = [
+            ('Orchard Road', '08:00', 30, 'medium'),
+            ('Orchard Road', '14:00', 40, 'low'),
+            # An off-hour sample, as uploaded or legacy data may contain
+            ('Orchard Road', '14:45', 50, 'low'),
+            ('Orchard Road', '15:00', 20, 'high'),
+            ('Marina Bay', '09:30', 25, 'high'),
+        ]
+        for street_name, time, speed, intensity in samples:
+            local_time = SGT.localize(datetime.strptime(f"08-02-2025 {time}", '%d-%m-%Y %H:%M'))
+            self.mock_client['traffic-data']['historical_traffic_data'].insert_one({
+                'road_id': 'road_1' if street_name == 'Orchard Road' else 'road_2',
+                'streetName': street_name,
+                'date': '08-02-2025',
+                'time': time,
+                'timestamp': local_time.astimezone(pytz.utc).replace(tzinfo=None),
+                'currentSpeed': speed,
+                'freeFlowSpeed': 50,
+                'intensity': intensity
+            })
+
+        with patch('gridfs.GridFS'), patch.dict(os.environ, {'ROLLUP_REBUILD_SETTLE_SECONDS': '0'}):
+            self.app = create_app(db_client=self.mock_client)
+            self.client = self.app.test_client()
+
+    def analysis(self, metric, start_time='08:00', end_time='14:30'):
+        response = self.client.get('/api/traffic/analysis', query_string={
+            'roads': ['Orchard Road', 'Marina Bay'],
+            'date': '2025-02-08',
+            'startTime': start_time,
+            'endTime': end_time,
+            'metric': metric
+        })
+        self.assertEqual(response.status_code, 200)
+        return json.loads(response.data)['data']
+
+    def test_raw_and_rollup_paths_agree(self):
+        """Test that the analysis is the same before and after the rollups are built"""
+        raw = {metric: self.analysis(metric) for metric in ('speed', 'congestion')}
+
+        result = self.app.test_cli_runner().invoke(args=['rebuild-rollups'])
+        self.assertIsNone(result.exception)
+
+        for metric in ('speed', 'congestion'):
+            self.assertEqual(self.analysis(metric), raw[metric])
+
+    def test_whole_hours_are_charted(self):
+        """Test that samples are averaged per hour and hours are kept by their HH:00"""
+        data = self.analysis('speed')
+
+        self.assertEqual(data['Orchard Road'], {'times': ['08:00', '14:00'], 'values': [30, 45]})
+        self.assertEqual(data['Marina Bay'], {'times': ['09:00'], 'values': [25]})
+
+    def test_whole_hour_bounds(self):
+        """Test that a start inside an hour skips that hour and an end keeps its whole hour"""
+        self.assertEqual(whole_hour_bounds('08:00', '14:30'), ('08:00', '14:59'))
+        self.assertEqual(whole_hour_bounds('08:15', '14:00'), ('09:00', '14:59'))
+
+if __name__ == '__main__':
+    unittest.main()
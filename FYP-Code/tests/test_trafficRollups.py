@@ -0,0 +1,169 @@
+import unittest
+from unittest.mock import MagicMock
+import sys
+import os
+from datetime import datetime, timedelta
+import mongomock
+import pytz
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# Mock APScheduler
+sys.modules['apscheduler.schedulers.background'] = MagicMock()
+sys.modules['apscheduler'] = MagicMock()
+
+from app import (traffic_rollup_updates, ingestion_rollup_updates, rollup_targets,
+                 rebuild_rollups)
+
+class TestTrafficRollups(unittest.TestCase):
+    def setUp(self):
+        # Mock MongoDB collections
+        self.db = mongomock.MongoClient()['traffic-data']
+        self.historical_traffic_data = self.db['historical_traffic_data']
+        self.traffic_logs = self.db['traffic_logs']
+        self.traffic_meta = self.db['traffic_meta']
+        self.SGT = pytz.timezone('Asia/Singapore')
+
+        self.records = [
+            self.make_record('road_1', 'Orchard Road', '08-02-2025', '08:00', 20, 'high'),
+            self.make_record('road_1', 'Orchard Road', '08-02-2025', '09:00', 35, 'medium'),
+            self.make_record('road_1', 'Orchard Road', '08-02-2025', '10:00', 45, 'low'),
+            self.make_record('road_1', 'Orchard Road', '09-02-2025', '08:00', 30, 'medium'),
+            self.make_record('road_2', 'Marina Bay', '08-02-2025', '08:00', 50, 'low'),
+        ]
+
+    def make_record(self, road_id, street_name, date, time, speed, intensity):
+        return {
+            'road_id': road_id,
+            'streetName': street_name,
+            'date': date,
+            'time': time,
+            'currentSpeed': speed,
+            'freeFlowSpeed': 50,
+            'intensity': intensity
+        }
+
+    def sources(self, make_traffic_updates=traffic_rollup_updates):
+        return {
+            'traffic': (self.historical_traffic_data, None, make_traffic_updates),
+            'ingestion': (self.traffic_logs, None, lambda entries: ingestion_rollup_updates(entries, self.SGT)),
+        }
+
+    def fold(self, collection, *batches):
+        for batch in batches:
+            collection.bulk_write(traffic_rollup_updates(batch))
+        return {rollup['_id']: rollup for rollup in collection.find()}
+
+    def live(self, kind):
+        return self.db[self.traffic_meta.find_one({'_id': 'rollups'})['collections'][kind]]
+
+    def ingest(self, records):
+        """Store records and fold them the way the ingestion path does"""
+        self.historical_traffic_data.insert_many(records)
+        for name, documents in rollup_targets(self.traffic_meta.find_one({'_id': 'rollups'}), 'traffic', records):
+            self.db[name].bulk_write(traffic_rollup_updates(documents))
+
+    def test_daily_rollup_totals_and_hours(self):
+        """Test that a road's day folds into totals, extremes and per-hour stats"""
+        rollups = self.fold(self.db['rollup'], self.records)
+
+        orchard = rollups['road_1:2025-02-08']
+        self.assertEqual(orchard['date'], '08-02-2025')
+        self.assertEqual(orchard['samples'], 3)
+        self.assertEqual(orchard['speedSum'], 100)
+        self.assertEqual((orchard['minSpeed'], orchard['maxSpeed']), (20, 45))
+        self.assertEqual((orchard['firstTime'], orchard['lastTime']), ('08:00', '10:00'))
+        self.assertEqual(orchard['congestionHours'], 1)
+        self.assertEqual(orchard['hours']['09'], {'samples': 1, 'speedSum': 35, 'medium': 1})
+        self.assertEqual(len(rollups), 3)
+
+    def test_incremental_batches_match_single_fold(self):
+        """Test that folding records one at a time gives the same rollups as one batch"""
+        single = self.fold(self.db['single'], self.records)
+        incremental = self.fold(self.db['incremental'], *[[record] for record in reversed(self.records)])
+
+        self.assertEqual(incremental, single)
+
+    def test_records_without_date_are_skipped(self):
+        """Test that legacy records missing local date or time are ignored"""
+        record = self.make_record('road_1', 'Orchard Road', None, '08:00', 20, 'high')
+
+        self.assertEqual(traffic_rollup_updates([record]), [])
+
+    def test_ingestion_counts_per_local_day(self):
+        """Test that log entries are counted per date, using Singapore time when a log has no date"""
+        ingestion_rollup_daily = self.db['ingestion_rollup_daily']
+        log_entries = [
+            {'status': 'success', 'date': '08-02-2025', 'timestamp': datetime(2025, 2, 8, 1, 0)},
+            {'status': 'failure', 'timestamp': datetime(2025, 2, 7, 17, 30)},
+            {'status': 'failure', 'timestamp': self.SGT.localize(datetime(2025, 2, 9, 0, 30))},
+            {'status': 'duplicate', 'date': '08-02-2025'},
+            {'status': 'retrying', 'date': '08-02-2025'},
+        ]
+
+        ingestion_rollup_daily.bulk_write(ingestion_rollup_updates(log_entries, self.SGT))
+        days = {day['_id']: day for day in ingestion_rollup_daily.find()}
+
+        self.assertEqual(days['2025-02-08']['date'], '08-02-2025')
+        self.assertEqual(days['2025-02-08']['successful'], 1)
+        self.assertEqual(days['2025-02-08']['failed'], 1)
+        self.assertEqual(days['2025-02-08']['duplicates'], 1)
+        self.assertEqual(days['2025-02-09'], {'_id': '2025-02-09', 'date': '09-02-2025', 'failed': 1})
+
+    def test_nothing_is_folded_before_the_first_build(self):
+        """Test that writers have no rollup to update until a rebuild has run"""
+        self.assertEqual(rollup_targets(None, 'traffic', self.records), [])
+
+    def test_rebuild_switches_to_new_collections(self):
+        """Test that a rebuild builds fresh collections, points the meta document at them and drops leftovers"""
+        self.historical_traffic_data.insert_many([dict(record) for record in self.records[:3]])
+        self.db['traffic_rollup_daily'].insert_one({'_id': 'road_9:2024-01-01', 'samples': 99})
+
+        counts = rebuild_rollups(self.db, self.traffic_meta, self.sources(), batch_size=2, settle_seconds=0)
+        first = self.live('traffic').name
+        self.historical_traffic_data.insert_many([dict(record) for record in self.records[3:]])
+        counts = rebuild_rollups(self.db, self.traffic_meta, self.sources(), batch_size=2, settle_seconds=0)
+
+        self.assertEqual(counts, {'traffic': 5, 'ingestion': 0})
+        self.assertEqual(self.fold(self.live('traffic')), self.fold(self.db['expected'], self.records))
+        self.assertNotIn('traffic_rollup_daily', self.db.list_collection_names())
+        # The previous generation stays until the next rebuild, in case a writer still holds its name
+        self.assertIn(first, self.db.list_collection_names())
+        self.assertNotIn('rebuild', self.traffic_meta.find_one({'_id': 'rollups'}))
+        self.assertEqual(self.traffic_meta.find_one({'_id': 'rollups'})['version'], 2)
+
+    def test_only_one_rebuild_runs_at_a_time(self):
+        """Test that a rebuild started while another holds the lock does nothing"""
+        self.traffic_meta.insert_one({'_id': 'rollups', 'rebuild': {
+            'run': 'other', 'lockedUntil': datetime.utcnow() + timedelta(minutes=5)
+        }})
+
+        self.assertIsNone(rebuild_rollups(self.db, self.traffic_meta, self.sources(), settle_seconds=0))
+        self.assertEqual(self.traffic_meta.find_one({'_id': 'rollups'})['rebuild']['run'], 'other')
+
+    def test_expired_lock_is_taken_over(self):
+        """Test that the lock of a rebuild that died is taken over"""
+        self.traffic_meta.insert_one({'_id': 'rollups', 'rebuild': {
+            'run': 'dead', 'lockedUntil': datetime.utcnow() - timedelta(minutes=1)
+        }})
+
+        self.assertIsNotNone(rebuild_rollups(self.db, self.traffic_meta, self.sources(), settle_seconds=0))
+
+    def test_rows_ingested_during_rebuild_are_counted_once(self):
+        """Test that rows stored while a rebuild runs land in the new rollups exactly once"""
+        self.historical_traffic_data.insert_many([dict(record) for record in self.records[:2]])
+        rebuild_rollups(self.db, self.traffic_meta, self.sources(), settle_seconds=0)
+        late_records = [dict(record) for record in self.records[2:]]
+
+        def make_updates_while_ingesting(batch):
+            if late_records:
+                self.ingest([late_records.pop()])
+            return traffic_rollup_updates(batch)
+
+        rebuild_rollups(self.db, self.traffic_meta, self.sources(make_updates_while_ingesting),
+                        batch_size=1, settle_seconds=0)
+        self.ingest(late_records)
+
+        self.assertEqual(self.fold(self.live('traffic')), self.fold(self.db['expected'], self.records))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+import unittest
+from unittest.mock import MagicMock
+import sys
+import os
+import mongomock
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# Mock APScheduler
+sys.modules['apscheduler.schedulers.background'] = MagicMock()
+sys.modules['apscheduler'] = MagicMock()
+
+from app import TrafficSnapshotCache
+
+class TestTrafficSnapshot(unittest.TestCase):
+    def setUp(self):
+        # Mock MongoDB collections
+        db = mongomock.MongoClient()['traffic-data']
+        self.mock_current_traffic = db.current_traffic_data
+        self.mock_traffic_meta = db.traffic_meta
+
+        self.mock_current_traffic.insert_many([
+            {"road_id": "road_1", "streetName": "Orchard Road", "date": "08-02-2025",
+             "time": "14:00", "intensity": "Low", "currentSpeed": 40},
+            {"road_id": "road_2", "streetName": "Marina Bay", "date": "08-02-2025",
+             "time": "14:05", "intensity": "High", "currentSpeed": 10},
+            {"road_id": "road_3", "streetName": "Bukit Timah Road", "date": "09-03-2025",
+             "time": "09:00", "intensity": "Medium", "currentSpeed": 25}
+        ])
+
+        self.now = [0]
+
+    def make_cache(self, poll_interval=5):
+        return TrafficSnapshotCache(self.mock_current_traffic, self.mock_traffic_meta,
+                                    poll_interval=poll_interval, clock=lambda: self.now[0])
+
+    def street_names(self, records):
+        return [record['streetName'] for record in records]
+
+    def test_cold_start_loads_from_mongo(self):
+        """Test that the first read loads every record at version 0"""
+        snapshot = self.make_cache().get()
+
+        self.assertEqual(len(snapshot.records), 3)
+        self.assertEqual(snapshot.version, 0)
+        self.assertNotIn('_id', snapshot.records[0])
+
+    def test_publish_bumps_version_and_etag(self):
+        """Test that publishing rebuilds the snapshot under a new version"""
+        cache = self.make_cache()
+        old_snapshot = cache.get()
+
+        self.mock_current_traffic.update_one({"road_id": "road_1"}, {"$set": {"intensity": "High"}})
+        snapshot = cache.publish()
+
+        self.assertEqual(snapshot.version, 1)
+        self.assertNotEqual(snapshot.etag, old_snapshot.etag)
+        self.assertEqual(old_snapshot.records[0]['intensity'], "Low")
+        self.assertEqual(snapshot.records[0]['intensity'], "High")
+
+    def test_other_worker_sees_publish_after_poll_interval(self):
+        """Test that a second cache picks up a published version once it polls"""
+        writer = self.make_cache()
+        reader = self.make_cache(poll_interval=5)
+        reader.get()
+
+        writer.publish()
+        self.assertEqual(reader.get().version, 0)
+
+        self.now[0] = 6
+        self.assertEqual(reader.get().version, 1)
+
+    def test_unchanged_version_is_not_reloaded(self):
+        """Test that polling an unchanged version keeps the same snapshot"""
+        cache = self.make_cache(poll_interval=0)
+        snapshot = cache.get()
+
+        self.assertIs(cache.get(), snapshot)
+
+    def test_filter_by_search_and_conditions(self):
+        """Test case-insensitive search and intensity filters"""
+        snapshot = self.make_cache().get()
+
+        self.assertEqual(self.street_names(snapshot.filter(search_term="road")),
+                         ["Orchard Road", "Bukit Timah Road"])
+        self.assertEqual(self.street_names(snapshot.filter(conditions=["High", "Medium"])),
+                         ["Marina Bay", "Bukit Timah Road"])
+
+    def test_filter_by_date_and_time(self):
+        """Test that date filters compare real dates rather than DD-MM-YYYY strings"""
+        snapshot = self.make_cache().get()
+
+        self.assertEqual(self.street_names(snapshot.filter(start_date="2025-03-01")), ["Bukit Timah Road"])
+        self.assertEqual(self.street_names(snapshot.filter(end_date="2025-02-08", start_time="14:01")),
+                         ["Marina Bay"])
+
+    def test_filter_returns_copies(self):
+        """Test that callers cannot mutate the shared snapshot"""
+        snapshot = self.make_cache().get()
+
+        snapshot.filter()[0]['incidents'] = {'ACCIDENT': 1}
+
+        self.assertNotIn('incidents', snapshot.records[0])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -47,7 +47,8 @@ class TestMetrics(unittest.TestCase):
         # Mock finding recent log
         cls.traffic_logs.find_one = MagicMock(return_value={
             "date": "01-01-2025",
-            "time": "12:00"
+            "time": "12:00",
+            "timestamp": datetime(2025, 1, 1, 4, 0)
         })
 
     def setUp(self):
@@ -68,7 +69,17 @@ class TestMetrics(unittest.TestCase):
         self.assertEqual(data['successfulCalls'], 80)
         self.assertEqual(data['failedCalls'], 10)
         self.assertEqual(data['duplicates'], 5)
-        self.assertIsInstance(data['ingestionLatency'], (int, float))
+        self.assertEqual(data['latestLogAt'], '2025-01-01T12:00:00+08:00')
+        self.assertNotIn('apiQuota', data)
+
+    def test_get_live_metrics(self):
+        """Test that live counters are served separately and never cached"""
+        response = self.client.get('/api/metrics/live')
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.data)
+        for key in ('apiQuota', 'logBuffer', 'stream', 'routeCache', 'reportJobs'):
+            self.assertIn(key, data)
+        self.assertTrue(response.cache_control.no_store)
 
     # Test the /api/recent-log endpoint
     @patch("app.open", new_callable=mock_open, read_data="Road A,1.3,103.85\nRoad B,1.2,103.84\n")